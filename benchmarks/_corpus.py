@@ -0,0 +1,43 @@
+# benchmarks/_corpus.py - Generator layout sintetis (format _compact_layout) untuk benchmark
+import random
+from typing import Any, Dict
+
+_WORDS = (
+    "prosedur kebijakan karyawan persetujuan dokumen laporan anggaran proyek approval "
+    "manager level limit vendor kontrak pembayaran invoice audit risiko kontrol "
+    "procedure policy employee request review finance budget department sign-off"
+).split()
+
+_HEADINGS = [
+    "1. PENDAHULUAN", "2. TUJUAN", "3. RUANG LINGKUP", "4. PROSEDUR", "5. KEBIJAKAN",
+    "BAB 1 KETENTUAN UMUM", "LAMPIRAN A", "DAFTAR ISI", "6. APPROVAL MATRIX",
+]
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words)).capitalize() + "."
+
+
+def synthetic_layout(paragraphs: int = 1000, tables: int = 5, table_rows: int = 40,
+                     table_cols: int = 5, seed: int = 42) -> Dict[str, Any]:
+    """Layout ringkas deterministik: paragraf (dengan heading tiap ~12 paragraf) + tabel."""
+    rng = random.Random(seed)
+    layout_paragraphs = []
+    for i in range(paragraphs):
+        if i % 12 == 0:
+            layout_paragraphs.append([rng.choice(_HEADINGS), "sectionHeading"])
+        else:
+            text = " ".join(_sentence(rng, rng.randint(8, 40)) for _ in range(rng.randint(1, 4)))
+            if i % 17 == 0:
+                text = "•  " + text + "    1.2.Detail"
+            layout_paragraphs.append([text, None])
+
+    layout_tables = []
+    for _ in range(tables):
+        cells = []
+        for r in range(table_rows):
+            for c in range(table_cols):
+                cells.append([r, c, f"Kolom {c}" if r == 0 else _sentence(rng, rng.randint(1, 6))])
+        layout_tables.append(cells)
+
+    return {"page_count": max(1, paragraphs // 25), "paragraphs": layout_paragraphs, "tables": layout_tables}
@@ -0,0 +1,284 @@
+# benchmarks/_fakes.py - Fake lokal deterministik untuk Blob Storage, Document Intelligence,
+# Azure OpenAI embeddings dan Azure AI Search (latency & throttling bisa diatur)
+import ast
+import os
+import random
+import re
+import sys
+import threading
+import time
+import types
+import zlib
+from typing import Any, Dict, List, Optional
+
+from benchmarks._corpus import synthetic_layout
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NS = types.SimpleNamespace
+
+_FAKE_PDF_RE = re.compile(rb"/Count (\d+) >>\n%doc (\d+)")
+
+
+class FakeThrottled(Exception):
+    """Response 429 dengan header retry-after-ms, seperti yang dilihat rate limiter."""
+
+    status_code = 429
+
+    def __init__(self, retry_after_ms: int):
+        super().__init__(f"429 Too Many Requests (retry after {retry_after_ms} ms)")
+        self.response = NS(status_code=429, headers={"retry-after-ms": str(retry_after_ms)})
+
+
+class _Latency:
+    """Hitung waktu tunggu fake per service (untuk melihat porsi waktu 'di Azure')."""
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            time.sleep(seconds)
+        self.record(seconds)
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.calls += 1
+            self.seconds += seconds
+
+    def stats(self) -> Dict[str, Any]:
+        return {"calls": self.calls, "latency_seconds": round(self.seconds, 3), "throttled": self.throttled}
+
+
+# ---------- Blob Storage ----------
+def fake_pdf(doc: int, pages: int) -> bytes:
+    """PDF palsu: cukup untuk _detect_page_count dan untuk FakeDocClient tahu dokumen mana."""
+    return b"%PDF-1.7\n<< /Type /Pages /Count " + str(pages).encode() + b" >>\n%doc " + str(doc).encode() + b"\n%%EOF\n"
+
+
+class _Downloader:
+    def __init__(self, data: bytes):
+        self._data = data
+
+    def readall(self) -> bytes:
+        return self._data
+
+    def readinto(self, stream) -> int:
+        stream.write(self._data)
+        return len(self._data)
+
+
+class FakeBlobContainer:
+    def __init__(self, documents: int, pages: int, prefix: str = "sop/", latency: float = 0.0):
+        self.latency = _Latency()
+        self.download_latency = latency
+        self.blobs = {}
+        for doc in range(documents):
+            name = f"{prefix}bench-{doc:05d}.pdf"
+            data = fake_pdf(doc, pages)
+            self.blobs[name] = NS(name=name, size=len(data), etag=f"0x{doc:08X}", data=data,
+                                  content_settings=NS(content_md5=None, content_type="application/pdf"))
+
+    def list_blobs(self, name_starts_with: Optional[str] = None, **kwargs):
+        return [b for name, b in sorted(self.blobs.items()) if not name_starts_with or name.startswith(name_starts_with)]
+
+    def get_blob_client(self, name: str):
+        container = self
+
+        class _Client:
+            def download_blob(self, **kwargs):
+                container.latency.sleep(container.download_latency)
+                return _Downloader(container.blobs[name].data)
+
+            def get_blob_properties(self):
+                return container.blobs[name]
+
+        return _Client()
+
+
+# ---------- Document Intelligence ----------
+class FakeDocClient:
+    """prebuilt-layout palsu: layout per halaman dibuat deterministik dari (dokumen, halaman)."""
+
+    def __init__(self, paragraphs_per_page: int = 20, tables_per_page: float = 0.2, table_rows: int = 15,
+                 latency: float = 0.0, page_latency: float = 0.0):
+        self.paragraphs_per_page = paragraphs_per_page
+        self.tables_per_page = tables_per_page
+        self.table_rows = table_rows
+        self.call_latency = latency
+        self.page_latency = page_latency
+        self.latency = _Latency()
+
+    def _tables_on(self, page: int) -> int:
+        # Kepadatan pecahan (mis. 0.2 = 1 tabel tiap 5 halaman) dibagi rata
+        return int(page * self.tables_per_page) - int((page - 1) * self.tables_per_page)
+
+    def begin_analyze_document(self, model: str, document=None, pages: Optional[str] = None, **kwargs):
+        data = document.read() if hasattr(document, "read") else bytes(document)
+        match = _FAKE_PDF_RE.search(data)
+        total_pages, doc = (int(match.group(1)), int(match.group(2))) if match else (1, 0)
+        first, last = 1, total_pages
+        if pages:
+            start, _, end = pages.partition("-")
+            first, last = int(start), min(int(end or start), total_pages)
+
+        paragraphs, tables, page_numbers = [], [], []
+        for page in range(first, last + 1):
+            layout = synthetic_layout(paragraphs=self.paragraphs_per_page, tables=self._tables_on(page),
+                                      table_rows=self.table_rows, seed=doc * 100_003 + page)
+            region = [NS(page_number=page)]
+            paragraphs.extend(NS(content=content, role=role, bounding_regions=region)
+                              for content, role in layout["paragraphs"])
+            tables.extend(NS(cells=[NS(row_index=r, column_index=c, content=content, bounding_regions=region)
+                                    for r, c, content in cells], bounding_regions=region)
+                          for cells in layout["tables"])
+            page_numbers.append(page)
+
+        result = NS(pages=page_numbers, paragraphs=paragraphs, tables=tables)
+        delay = self.call_latency + self.page_latency * len(page_numbers)
+        self.latency.record(delay)
+        ready_at = time.perf_counter() + delay
+
+        class _Poller:
+            # Analisis "berjalan di server": selesai setelah delay sejak submit, tanpa memblok caller
+            def done(self):
+                return time.perf_counter() >= ready_at
+
+            def result(self):
+                remaining = ready_at - time.perf_counter()
+                if remaining > 0:
+                    time.sleep(remaining)
+                return result
+
+        return _Poller()
+
+
+# ---------- Azure OpenAI embeddings ----------
+class FakeEmbeddings:
+    """Embedding palsu dengan latency per request + per 1K token dan 429 acak (seeded)."""
+
+    def __init__(self, dimensions: int = 1536, latency: float = 0.0, latency_per_1k_tokens: float = 0.0,
+                 throttle_rate: float = 0.0, retry_after_ms: int = 200, seed: int = 7, chunk_size: int = 2048):
+        self.dimensions = dimensions
+        self.call_latency = latency
+        self.latency_per_1k_tokens = latency_per_1k_tokens
+        self.throttle_rate = throttle_rate
+        self.retry_after_ms = retry_after_ms
+        self.chunk_size = chunk_size
+        self.latency = _Latency()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _vector(self, text: str) -> List[float]:
+        base = (zlib.crc32(text.encode("utf-8")) % 1000) / 1000.0
+        return [base + i * 1e-4 for i in range(self.dimensions)]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with self._lock:
+            throttled = self._rng.random() < self.throttle_rate
+            if throttled:
+                self.latency.throttled += 1
+        if throttled:
+            raise FakeThrottled(self.retry_after_ms)
+        tokens = sum(len(t) for t in texts) / 4
+        self.latency.sleep(self.call_latency + self.latency_per_1k_tokens * tokens / 1000)
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+# ---------- Azure AI Search ----------
+class FakeSearchClient:
+    """SearchClient palsu: latency per request + per dokumen, 503 per dokumen secara acak (seeded)."""
+
+    def __init__(self, latency: float = 0.0, latency_per_doc: float = 0.0, throttle_rate: float = 0.0, seed: int = 11):
+        self.call_latency = latency
+        self.latency_per_doc = latency_per_doc
+        self.throttle_rate = throttle_rate
+        self.documents: Dict[str, Dict[str, Any]] = {}
+        self.latency = _Latency()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def upload_documents(self, documents: List[Dict[str, Any]]):
+        self.latency.sleep(self.call_latency + self.latency_per_doc * len(documents))
+        results = []
+        with self._lock:
+            for doc in documents:
+                if self._rng.random() < self.throttle_rate:
+                    self.latency.throttled += 1
+                    results.append(NS(key=doc["id"], succeeded=False, status_code=503, error_message="throttled"))
+                    continue
+                self.documents[doc["id"]] = doc
+                results.append(NS(key=doc["id"], succeeded=True, status_code=201, error_message=None))
+        return results
+
+    def delete_documents(self, documents: List[Dict[str, Any]]):
+        with self._lock:
+            for doc in documents:
+                self.documents.pop(doc["id"], None)
+        return [NS(key=doc["id"], succeeded=True, status_code=200) for doc in documents]
+
+    def get_document(self, key: str, selected_fields=None):
+        with self._lock:
+            if key not in self.documents:
+                raise KeyError(key)
+            return self.documents[key]
+
+
+# ---------- fake internal_assistant_core ----------
+def load_settings():
+    """Instance Settings asli dari internal_assistant_core.py tanpa membuat client Azure.
+
+    Hanya definisi class Settings yang dieksekusi, jadi default & env var sama
+    persis dengan aplikasi.
+    """
+    path = os.path.join(ROOT, "internal_assistant_core.py")
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+    node = next(n for n in tree.body if isinstance(n, ast.ClassDef) and n.name == "Settings")
+    from pydantic import BaseModel
+
+    namespace = {"os": os, "BaseModel": BaseModel}
+    exec(compile(ast.Module(body=[node], type_ignores=[]), path, "exec"), namespace)
+    return namespace["Settings"]()
+
+
+def install_fake_core(settings, blob_container: FakeBlobContainer, doc_client: FakeDocClient,
+                      embeddings: FakeEmbeddings, search_client: FakeSearchClient) -> types.ModuleType:
+    """Daftarkan modul `internal_assistant_core` palsu; harus dipanggil sebelum import rag_modul."""
+    from embedding_cache import CachedEmbeddings
+    from rate_limiter import AdaptiveRateLimiter
+
+    core = types.ModuleType("internal_assistant_core")
+    core.settings = settings
+    core.embed_rate_limiter = AdaptiveRateLimiter(
+        "embeddings",
+        requests_per_minute=settings.embed_requests_per_minute,
+        tokens_per_minute=settings.embed_tokens_per_minute,
+        max_retries=settings.rate_limit_max_retries,
+    )
+    core.search_upload_limiter = AdaptiveRateLimiter(
+        "search_upload",
+        requests_per_minute=settings.search_upload_requests_per_minute,
+        max_retries=settings.rate_limit_max_retries,
+    )
+    core.embeddings = CachedEmbeddings(
+        embeddings,
+        deployment=settings.openai_embed_deployment,
+        path=os.path.join(settings.index_state_dir, "embeddings.sqlite"),
+        memory_items=settings.embed_cache_memory_items,
+        limiter=core.embed_rate_limiter,
+    )
+    core.vectorstore = NS(client=search_client, fields=[])
+    core.search_index_field_names = lambda: None
+    core.retriever = None
+    core.llm = None
+    core.blob_container = blob_container
+    core.doc_client = doc_client
+    sys.modules["internal_assistant_core"] = core
+    return core
+
@@ -0,0 +1,73 @@
+"""Micro-benchmark token accounting chunker.
+
+Bandingkan waktu layout -> sections -> chunks per 1.000 paragraf antara token
+accounting lama (encode per string, header tanpa memo) dan yang baru
+(encode_batch per dokumen + memo header). Tidak butuh koneksi Azure.
+
+    python benchmarks/bench_chunking.py --paragraphs 5000 --repeat 5
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import doc_chunking  # noqa: E402
+from benchmarks._corpus import synthetic_layout  # noqa: E402
+
+
+def _chunk(layout):
+    return doc_chunking._create_intelligent_chunks(doc_chunking._layout_to_doc_data(layout))
+
+
+def _legacy_accounting():
+    """Patch helper token ke perilaku lama: satu encode per string, header tidak di-cache."""
+    originals = (doc_chunking._count_tokens_batch, doc_chunking._header_tokens)
+    doc_chunking._count_tokens_batch = lambda texts: [doc_chunking.tiktoken_len(t) for t in texts]
+    doc_chunking._header_tokens = lambda header: doc_chunking.tiktoken_len(f"=== {header} ===\n")
+    return originals
+
+
+def _restore(originals):
+    doc_chunking._count_tokens_batch, doc_chunking._header_tokens = originals
+
+
+def _time(layout, repeat):
+    best = float("inf")
+    chunks = None
+    for _ in range(repeat):
+        if hasattr(doc_chunking._header_tokens, "cache_clear"):
+            doc_chunking._header_tokens.cache_clear()
+        started = time.perf_counter()
+        chunks = _chunk(layout)
+        best = min(best, time.perf_counter() - started)
+    return best, chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--paragraphs", type=int, default=5000)
+    parser.add_argument("--tables", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    layout = synthetic_layout(paragraphs=args.paragraphs, tables=args.tables)
+    per_1k = 1000 / args.paragraphs
+
+    originals = _legacy_accounting()
+    try:
+        before, legacy_chunks = _time(layout, args.repeat)
+    finally:
+        _restore(originals)
+    after, chunks = _time(layout, args.repeat)
+
+    assert chunks == legacy_chunks, "token accounting changed chunk output"
+    print(f"paragraphs={args.paragraphs} tables={args.tables} chunks={len(chunks)}")
+    print(f"before (per-string encode): {before * per_1k * 1000:8.2f} ms / 1000 paragraphs")
+    print(f"after  (encode_batch+memo): {after * per_1k * 1000:8.2f} ms / 1000 paragraphs")
+    print(f"speedup: {before / after:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
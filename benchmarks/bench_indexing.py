@@ -0,0 +1,238 @@
+"""Benchmark throughput indexing end-to-end tanpa Azure.
+
+`blob_container`, `doc_client`, embeddings dan `vectorstore` diganti fake lokal
+deterministik (latency & throttling bisa diatur), lalu corpus sintetis
+(N dokumen x M halaman, kepadatan tabel per halaman) dijalankan lewat
+`rag_modul.process_and_index_docs`. Hasil: dokumen/s, chunk/s, peak RSS, dan
+pembagian waktu (thread-seconds) antara download, extraction, chunking,
+embedding dan upload. Simpan JSON dengan --output lalu bandingkan antar commit
+dengan --compare. Rate limit RPM/TPM dimatikan kecuali di-set lewat --set.
+
+    python benchmarks/bench_indexing.py --documents 200 --pages 12 --output before.json
+    python benchmarks/bench_indexing.py --documents 200 --pages 12 --compare before.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks._fakes import (  # noqa: E402
+    ROOT,
+    FakeBlobContainer,
+    FakeDocClient,
+    FakeEmbeddings,
+    FakeSearchClient,
+    install_fake_core,
+    load_settings,
+)
+
+# Metrik yang dibandingkan dengan --compare (lebih besar = lebih baik, kecuali ditandai)
+_COMPARED = (
+    ("documents_per_second", True),
+    ("chunks_per_second", True),
+    ("elapsed_seconds", False),
+    ("peak_rss_mb", False),
+)
+
+
+class _Profile:
+    """Waktu eksklusif per kategori: waktu generator luar tidak termasuk generator di dalamnya."""
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def measure(self, category, func, *args):
+        stack = self._local.__dict__.setdefault("stack", [])
+        stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            elapsed = time.perf_counter() - started
+            nested = stack.pop()
+            with self._lock:
+                self.seconds[category] += elapsed - nested
+            if stack:
+                stack[-1] += elapsed
+
+    def wrap_iterator(self, category, factory):
+        def wrapper(*args, **kwargs):
+            it = iter(factory(*args, **kwargs))
+            try:
+                while True:
+                    try:
+                        item = self.measure(category, next, it)
+                    except StopIteration:
+                        return
+                    yield item
+            finally:
+                if hasattr(it, "close"):
+                    it.close()
+        return wrapper
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux melaporkan KB, macOS byte
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _apply_overrides(settings, overrides):
+    for override in overrides:
+        key, _, value = override.partition("=")
+        if not hasattr(settings, key):
+            raise SystemExit(f"unknown setting: {key}")
+        current = getattr(settings, key)
+        setattr(settings, key, type(current)(value) if current is not None else value)
+
+
+def _compare(result, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\ncompare with {baseline_path} (commit {baseline.get('commit')}):")
+    for key, higher_is_better in _COMPARED:
+        before, after = baseline.get(key), result.get(key)
+        if not before or after is None:
+            continue
+        ratio = after / before
+        better = ratio > 1 if higher_is_better else ratio < 1
+        print(f"  {key:22s} {before:12,.2f} -> {after:12,.2f}  ({ratio:.2f}x, {'better' if better else 'worse'})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=100)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--paragraphs-per-page", type=int, default=20)
+    parser.add_argument("--tables-per-page", type=float, default=0.2)
+    parser.add_argument("--table-rows", type=int, default=15)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--download-latency", type=float, default=0.005, help="detik per download blob")
+    parser.add_argument("--docint-latency", type=float, default=0.05, help="detik per request analyze")
+    parser.add_argument("--docint-page-latency", type=float, default=0.01, help="detik per halaman")
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="detik per request embedding")
+    parser.add_argument("--embed-latency-per-1k", type=float, default=0.002, help="detik per 1K token")
+    parser.add_argument("--upload-latency", type=float, default=0.03, help="detik per request upload")
+    parser.add_argument("--upload-latency-per-doc", type=float, default=0.0002, help="detik per dokumen Search")
+    parser.add_argument("--throttle-rate", type=float, default=0.0,
+                        help="peluang 429 per request embedding dan 503 per dokumen Search")
+    parser.add_argument("--set", action="append", default=[], metavar="SETTING=VALUE",
+                        help="override Settings, mis. --set index_extract_workers=8")
+    parser.add_argument("--output", help="tulis hasil JSON ke file ini")
+    parser.add_argument("--compare", help="JSON hasil sebelumnya untuk dibandingkan")
+    parser.add_argument("--verbose", action="store_true", help="tampilkan log pipeline")
+    args = parser.parse_args()
+
+    state_dir = tempfile.mkdtemp(prefix="bench-index-")
+    settings = load_settings()
+    settings.index_state_dir = state_dir
+    # Kuota RPM/TPM asli akan mendominasi hasil; default tanpa limit (throttling disimulasikan fake)
+    settings.embed_requests_per_minute = 0
+    settings.embed_tokens_per_minute = 0
+    settings.search_upload_requests_per_minute = 0
+    _apply_overrides(settings, args.set)
+
+    blobs = FakeBlobContainer(args.documents, args.pages, latency=args.download_latency)
+    doc_client = FakeDocClient(args.paragraphs_per_page, args.tables_per_page, args.table_rows,
+                               latency=args.docint_latency, page_latency=args.docint_page_latency)
+    embeddings = FakeEmbeddings(args.dimensions, latency=args.embed_latency,
+                                latency_per_1k_tokens=args.embed_latency_per_1k, throttle_rate=args.throttle_rate)
+    search = FakeSearchClient(args.upload_latency, args.upload_latency_per_doc, throttle_rate=args.throttle_rate)
+    install_fake_core(settings, blobs, doc_client, embeddings, search)
+
+    import rag_modul
+
+    profile = _Profile()
+    rag_modul._iter_source_layouts = profile.wrap_iterator("extraction", rag_modul._iter_source_layouts)
+    rag_modul._iter_chunks_from_layouts = profile.wrap_iterator("chunking", rag_modul._iter_chunks_from_layouts)
+
+    log = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    try:
+        started = time.perf_counter()
+        with log:
+            report = rag_modul.process_and_index_docs(prefix="sop/", force=True)
+        elapsed = time.perf_counter() - started
+    finally:
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+    split = {
+        "download": report["stages"]["download"]["busy_seconds"],
+        "extraction": profile.seconds["extraction"],
+        "chunking": profile.seconds["chunking"],
+        "embedding": report["embed_seconds"],
+        "upload": report["upload_seconds"],
+    }
+    split_total = sum(split.values()) or 1.0
+    result = {
+        "commit": _git_commit(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare", "verbose")},
+        "documents": args.documents,
+        "indexed": report["indexed"],
+        "chunks": report["total_chunks"],
+        "errors": len(report["errors"]),
+        "failed_chunks": len(report["failed_chunks"]),
+        "elapsed_seconds": round(elapsed, 3),
+        "documents_per_second": round(report["indexed"] / elapsed, 2),
+        "chunks_per_second": round(report["total_chunks"] / elapsed, 2),
+        "peak_rss_mb": _peak_rss_mb(),
+        "time_split": {
+            name: {"thread_seconds": round(seconds, 3), "share": round(seconds / split_total, 3)}
+            for name, seconds in split.items()
+        },
+        "stages": report["stages"],
+        "requests": {
+            "embedding": report["embedding_requests"],
+            "search_write": report["search_write_requests"],
+        },
+        "rate_limits": report["rate_limits"],
+        "docint_scheduler": report["docint_scheduler"],
+        "fakes": {
+            "blob": blobs.latency.stats(),
+            "docint": doc_client.latency.stats(),
+            "embeddings": embeddings.latency.stats(),
+            "search": search.latency.stats(),
+        },
+    }
+
+    print(f"documents={args.documents} pages={args.pages} chunks={result['chunks']} "
+          f"errors={result['errors']} failed_chunks={result['failed_chunks']}")
+    print(f"elapsed: {result['elapsed_seconds']:.2f}s  "
+          f"{result['documents_per_second']:,.2f} docs/s  {result['chunks_per_second']:,.2f} chunks/s  "
+          f"peak RSS: {result['peak_rss_mb']} MB")
+    for name, part in result["time_split"].items():
+        print(f"  {name:10s} {part['thread_seconds']:9.2f} thread-s  {part['share'] * 100:5.1f}%")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"wrote {args.output}")
+    if args.compare:
+        _compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""Benchmark dimensi embedding & kuantisasi vektor di Azure AI Search (side-by-side).
+
+Untuk setiap setting (dimensi:kompresi, mis. 0:none = dimensi penuh float32,
+1024:scalar = 1024 dimensi int8) chunk sampel dari index produksi di-embed ulang
+dengan parameter `dimensions` model, di-upload ke index sementara, lalu diukur:
+ukuran index (storage & vector index), latency query vektor (p50/p95) dan
+recall@10 terhadap ground truth exhaustive KNN pada setting pertama (baseline,
+sebaiknya 0:none). Butuh kredensial Azure asli (.env yang sama dengan aplikasi);
+index sementara dihapus di akhir kecuali --keep.
+
+    python benchmarks/bench_vectors.py --chunks 2000 --queries 100 \\
+        --config 0:none --config 0:scalar --config 1024:scalar --config 256:binary --output vectors.json
+"""
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv  # noqa: E402
+from azure.core.credentials import AzureKeyCredential  # noqa: E402
+from azure.search.documents import SearchClient  # noqa: E402
+from azure.search.documents.indexes import SearchIndexClient  # noqa: E402
+from azure.search.documents.indexes.models import SearchIndex  # noqa: E402
+from azure.search.documents.models import VectorizedQuery  # noqa: E402
+from langchain_openai import AzureOpenAIEmbeddings  # noqa: E402
+
+from benchmarks._fakes import load_settings  # noqa: E402
+from search_schema import (  # noqa: E402
+    FIELDS_CONTENT, FIELDS_CONTENT_VECTOR, FIELDS_ID, FIELDS_METADATA,
+    VECTOR_COMPRESSIONS, embedding_dimensions, index_fields, vector_search_config,
+)
+
+DEFAULT_CONFIGS = ["0:none", "0:scalar", "1024:none", "1024:scalar", "256:scalar"]
+UPLOAD_BATCH = 500
+
+
+def _parse_config(value):
+    dims, _, compression = value.partition(":")
+    compression = compression or "none"
+    if compression not in VECTOR_COMPRESSIONS:
+        raise SystemExit(f"unknown compression in --config {value}: expected one of {VECTOR_COMPRESSIONS}")
+    return int(dims), compression
+
+
+def _sample_chunks(settings, count, seed):
+    """Ambil chunk (id, content, metadata) dari index produksi lalu sampel acak deterministik."""
+    client = SearchClient(settings.search_endpoint, settings.search_index, AzureKeyCredential(settings.search_key))
+    chunks = [
+        {FIELDS_ID: doc[FIELDS_ID], FIELDS_CONTENT: doc[FIELDS_CONTENT], FIELDS_METADATA: doc.get(FIELDS_METADATA)}
+        for doc in client.search(search_text="*", select=[FIELDS_ID, FIELDS_CONTENT, FIELDS_METADATA])
+        if doc.get(FIELDS_CONTENT)
+    ]
+    random.Random(seed).shuffle(chunks)
+    return chunks[:count]
+
+
+def _make_queries(chunks, count, seed, path=None):
+    """Query dari file (satu per baris) atau kalimat awal chunk acak (tanpa header chunk)."""
+    if path:
+        with open(path, encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()][:count]
+    queries = []
+    for chunk in random.Random(seed + 1).sample(chunks, min(count, len(chunks))):
+        text = re.sub(r"=== .*? ===\s*", " ", chunk[FIELDS_CONTENT])
+        queries.append(" ".join(text.split()[:16]))
+    return queries
+
+
+class _Embedder:
+    """Embedding per dimensi (parameter native `dimensions`), di-memoize selama benchmark."""
+
+    def __init__(self, settings):
+        self.settings = settings
+        self._clients = {}
+        self._cache = {}
+
+    def embed(self, texts, dims):
+        client = self._clients.get(dims)
+        if client is None:
+            client = self._clients[dims] = AzureOpenAIEmbeddings(
+                azure_endpoint=self.settings.openai_endpoint,
+                api_key=self.settings.openai_key,
+                api_version=self.settings.openai_api_version,
+                deployment=self.settings.openai_embed_deployment,
+                dimensions=dims or None,
+            )
+        missing = [t for t in dict.fromkeys(texts) if (dims, t) not in self._cache]
+        for i in range(0, len(missing), 256):
+            part = missing[i:i + 256]
+            for text, vector in zip(part, client.embed_documents(part)):
+                self._cache[(dims, text)] = vector
+        return [self._cache[(dims, t)] for t in texts]
+
+
+def _wait_for_stats(index_client, name, expected, timeout):
+    """Statistik index di-update asinkron; tunggu sampai semua dokumen terhitung."""
+    deadline = time.monotonic() + timeout
+    while True:
+        stats = index_client.get_index_statistics(name)
+        if stats.get("document_count", 0) >= expected or time.monotonic() > deadline:
+            return stats
+        time.sleep(5)
+
+
+def _build_index(settings, index_client, name, dims, compression, chunks, vectors, timeout):
+    index_client.create_or_update_index(SearchIndex(
+        name=name,
+        fields=index_fields(dims),
+        vector_search=vector_search_config(compression, settings.search_vector_oversampling),
+    ))
+    client = SearchClient(settings.search_endpoint, name, AzureKeyCredential(settings.search_key))
+    docs = [dict(chunk, **{FIELDS_CONTENT_VECTOR: vector}) for chunk, vector in zip(chunks, vectors)]
+    started = time.perf_counter()
+    for i in range(0, len(docs), UPLOAD_BATCH):
+        failed = [r.key for r in client.upload_documents(documents=docs[i:i + UPLOAD_BATCH]) if not r.succeeded]
+        if failed:
+            raise RuntimeError(f"{len(failed)} documents failed to upload to {name}")
+    upload_seconds = time.perf_counter() - started
+    stats = _wait_for_stats(index_client, name, len(docs), timeout)
+    return client, stats, upload_seconds
+
+
+def _search(client, vector, exhaustive=False):
+    query = VectorizedQuery(vector=vector, k_nearest_neighbors=10, fields=FIELDS_CONTENT_VECTOR, exhaustive=exhaustive)
+    return [doc[FIELDS_ID] for doc in client.search(search_text=None, vector_queries=[query], select=[FIELDS_ID], top=10)]
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", action="append", metavar="DIMS:COMPRESSION",
+                        help="setting yang dibandingkan (DIMS 0 = dimensi penuh model); yang pertama jadi baseline")
+    parser.add_argument("--chunks", type=int, default=2000, help="jumlah chunk sampel dari index produksi")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--queries-file", help="query (satu per baris); default kalimat awal chunk acak")
+    parser.add_argument("--repeat", type=int, default=3, help="pengulangan setiap query untuk latency")
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--stats-timeout", type=float, default=300, help="detik menunggu statistik index")
+    parser.add_argument("--index-prefix", help="prefix nama index sementara (default <index>-vbench)")
+    parser.add_argument("--keep", action="store_true", help="jangan hapus index sementara")
+    parser.add_argument("--output", help="tulis hasil JSON ke file ini")
+    args = parser.parse_args()
+
+    load_dotenv()
+    settings = load_settings()
+    configs = [_parse_config(c) for c in (args.config or DEFAULT_CONFIGS)]
+    native = embedding_dimensions(settings.openai_embed_deployment)
+    index_prefix = args.index_prefix or f"{settings.search_index}-vbench"
+    index_client = SearchIndexClient(settings.search_endpoint, AzureKeyCredential(settings.search_key))
+
+    chunks = _sample_chunks(settings, args.chunks, args.seed)
+    if not chunks:
+        raise SystemExit(f"no chunks found in index {settings.search_index}")
+    queries = _make_queries(chunks, args.queries, args.seed, args.queries_file)
+    print(f"{len(chunks)} chunks, {len(queries)} queries from {settings.search_index}")
+
+    embedder = _Embedder(settings)
+    texts = [chunk[FIELDS_CONTENT] for chunk in chunks]
+    created = []
+    results = []
+    truth = None
+    try:
+        for dims, compression in configs:
+            label = f"{dims or native or 'native'}:{compression}"
+            name = f"{index_prefix}-{dims or 'full'}-{compression}".lower()
+            vectors = embedder.embed(texts, dims)
+            query_vectors = embedder.embed(queries, dims)
+            created.append(name)
+            client, stats, upload_seconds = _build_index(settings, index_client, name, len(vectors[0]), compression,
+                                                         chunks, vectors, args.stats_timeout)
+
+            if truth is None:
+                # Ground truth: KNN exhaustive (exact) pada baseline
+                truth = [_search(client, vector, exhaustive=True) for vector in query_vectors]
+
+            latencies, hits = [], 0
+            for vector, expected in zip(query_vectors, truth):
+                for attempt in range(args.repeat):
+                    started = time.perf_counter()
+                    found = _search(client, vector)
+                    latencies.append((time.perf_counter() - started) * 1000)
+                hits += len(set(found) & set(expected))
+            possible = sum(len(expected) for expected in truth) or 1
+
+            result = {
+                "config": label,
+                "dimensions": len(vectors[0]),
+                "compression": compression,
+                "index": name,
+                "documents": stats.get("document_count"),
+                "storage_size_mb": round(stats.get("storage_size", 0) / 1024 / 1024, 2),
+                "vector_index_size_mb": round(stats.get("vector_index_size", 0) / 1024 / 1024, 2),
+                "upload_seconds": round(upload_seconds, 2),
+                "query_p50_ms": round(statistics.median(latencies), 1),
+                "query_p95_ms": round(_percentile(latencies, 0.95), 1),
+                "recall_at_10": round(hits / possible, 4),
+            }
+            results.append(result)
+            print(f"  {label:16s} storage {result['storage_size_mb']:9.2f} MB  vector {result['vector_index_size_mb']:9.2f} MB  "
+                  f"p50 {result['query_p50_ms']:7.1f} ms  p95 {result['query_p95_ms']:7.1f} ms  "
+                  f"recall@10 {result['recall_at_10']:.3f}")
+    finally:
+        if not args.keep:
+            for name in created:
+                try:
+                    index_client.delete_index(name)
+                except Exception as e:
+                    print(f"could not delete {name}: {e}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "index": settings.search_index,
+                "deployment": settings.openai_embed_deployment,
+                "chunks": len(chunks),
+                "queries": len(queries),
+                "repeat": args.repeat,
+                "baseline": results[0]["config"] if results else None,
+                "results": results,
+            }, f, indent=2)
+        print(f"wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
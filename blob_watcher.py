@@ -0,0 +1,254 @@
+# blob_watcher.py - Watcher prefix Blob Storage untuk indexing kontinu (near-real-time)
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+
+def _timestamp(value: Any) -> Optional[str]:
+    """last_modified listing (datetime) -> ISO string UTC yang bisa dibandingkan."""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        return value.isoformat()
+    return str(value)
+
+
+class WatchState:
+    """Watermark persisten per prefix: ETag & last_modified setiap blob yang sudah diproses,
+    plus last_modified terbaru yang pernah terlihat dan waktu scan terakhir (SQLite)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS watched_blobs (
+                    prefix        TEXT NOT NULL,
+                    blob_name     TEXT NOT NULL,
+                    etag          TEXT,
+                    last_modified TEXT,
+                    PRIMARY KEY (prefix, blob_name)
+                );
+                CREATE TABLE IF NOT EXISTS watched_prefixes (
+                    prefix       TEXT PRIMARY KEY,
+                    watermark    TEXT,
+                    last_scan_at TEXT,
+                    last_scan    TEXT
+                );
+                """
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def load(self, prefix: str) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+        """{blob_name: (etag, last_modified)} yang sudah diproses untuk prefix ini."""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT blob_name, etag, last_modified FROM watched_blobs WHERE prefix = ?", (prefix,)
+            ).fetchall()
+        return {name: (etag, modified) for name, etag, modified in rows}
+
+    def mark_seen(self, prefix: str, blobs: List[Tuple[str, Optional[str], Optional[str]]]):
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO watched_blobs (prefix, blob_name, etag, last_modified) VALUES (?, ?, ?, ?)",
+                [(prefix, name, etag, modified) for name, etag, modified in blobs],
+            )
+            conn.commit()
+
+    def forget(self, prefix: str, names: List[str]):
+        with self._lock:
+            conn = self._connect()
+            conn.executemany("DELETE FROM watched_blobs WHERE prefix = ? AND blob_name = ?",
+                             [(prefix, name) for name in names])
+            conn.commit()
+
+    def watermark(self, prefix: str) -> Optional[str]:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT watermark FROM watched_prefixes WHERE prefix = ?", (prefix,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def record_scan(self, prefix: str, watermark: Optional[str], summary: str):
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO watched_prefixes (prefix, watermark, last_scan_at, last_scan) VALUES (?, ?, ?, ?)",
+                (prefix, watermark, datetime.now(timezone.utc).isoformat(), summary),
+            )
+            conn.commit()
+
+
+class BlobWatcher:
+    """Daemon yang secara berkala me-list prefix yang dikonfigurasi dan hanya meneruskan
+    blob baru/berubah/terhapus ke indexer.
+
+    Listing dipaginasi (`results_per_page`) dan hanya memakai properti dari listing
+    (ETag, last_modified) tanpa request properti per blob, jadi satu scan 100k blob
+    hanya ~20 request list. Blob yang berbeda dari watermark dikirim ke
+    `index_blobs(prefix, blobs)` yang mengembalikan nama blob yang selesai diproses;
+    hanya blob itu yang masuk watermark, sehingga blob yang error dicoba lagi pada scan
+    berikutnya. Blob yang hilang dari listing dikirim ke `remove_blob(name)`.
+    Scan pertama menganggap semua blob baru; yang sudah ter-index di-skip indexer
+    lewat manifest (unchanged) lalu masuk watermark.
+    """
+
+    def __init__(self, container, state: WatchState, prefixes: List[str], interval: float,
+                 index_blobs: Callable[[str, List[Any]], Set[str]],
+                 remove_blob: Callable[[str], bool], page_size: int = 5000):
+        self.container = container
+        self.state = state
+        self.prefixes = prefixes
+        self.interval = max(1.0, interval)
+        self.index_blobs = index_blobs
+        self.remove_blob = remove_blob
+        self.page_size = page_size
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._scan_lock = threading.Lock()
+        self.last_scans: Dict[str, Dict[str, Any]] = {}
+        self.scans = 0
+
+    def _list(self, prefix: str) -> Iterator[Any]:
+        listing = self.container.list_blobs(name_starts_with=prefix or None, results_per_page=self.page_size)
+        by_page = getattr(listing, "by_page", None)
+        if by_page is None:
+            yield from listing
+            return
+        for page in by_page():
+            yield from page
+
+    def scan_prefix(self, prefix: str) -> Dict[str, Any]:
+        """Satu scan: bandingkan listing dengan watermark, index perubahan, hapus blob yang hilang."""
+        started = time.perf_counter()
+        seen = self.state.load(prefix)
+        watermark = self.state.watermark(prefix)
+        listed: Set[str] = set()
+        changed: List[Any] = []
+        new = 0
+        for blob in self._list(prefix):
+            listed.add(blob.name)
+            modified = _timestamp(getattr(blob, "last_modified", None))
+            if modified and (watermark is None or modified > watermark):
+                watermark = modified
+            previous = seen.get(blob.name)
+            if previous is None:
+                new += 1
+                changed.append(blob)
+            elif previous != (getattr(blob, "etag", None), modified):
+                changed.append(blob)
+        deleted = [name for name in seen if name not in listed]
+
+        result = {
+            "prefix": prefix,
+            "listed": len(listed),
+            "new": new,
+            "changed": len(changed) - new,
+            "deleted": len(deleted),
+            "indexed": 0,
+            "removed": 0,
+            "errors": [],
+            "watermark": watermark,
+        }
+        list_seconds = time.perf_counter() - started
+
+        if changed:
+            try:
+                done = self.index_blobs(prefix, changed)
+            except Exception as e:
+                print(f"Blob watcher: indexing {prefix} failed: {e}")
+                result["errors"].append(str(e))
+                done = set()
+            self.state.mark_seen(prefix, [
+                (b.name, getattr(b, "etag", None), _timestamp(getattr(b, "last_modified", None)))
+                for b in changed if b.name in done
+            ])
+            result["indexed"] = len(done)
+
+        removed = []
+        for name in deleted:
+            try:
+                if self.remove_blob(name):
+                    removed.append(name)
+            except Exception as e:
+                print(f"Blob watcher: removing {name} failed: {e}")
+                result["errors"].append(f"{name}: {e}")
+        self.state.forget(prefix, removed)
+        result["removed"] = len(removed)
+
+        result["list_seconds"] = round(list_seconds, 3)
+        result["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+        result["scanned_at"] = datetime.now(timezone.utc).isoformat()
+        self.state.record_scan(prefix, watermark,
+                               f"{result['new']} new, {result['changed']} changed, {result['deleted']} deleted")
+        if changed or deleted:
+            print(f"Blob watcher: {prefix} {result['new']} new, {result['changed']} changed, "
+                  f"{result['deleted']} deleted ({len(listed)} listed in {list_seconds:.1f}s)")
+        return result
+
+    def scan_once(self) -> List[Dict[str, Any]]:
+        """Scan semua prefix sekali (scan bersamaan diserialisasi)."""
+        with self._scan_lock:
+            results = []
+            for prefix in self.prefixes:
+                try:
+                    result = self.scan_prefix(prefix)
+                except Exception as e:
+                    print(f"Blob watcher: scanning {prefix} failed: {e}")
+                    result = {"prefix": prefix, "errors": [str(e)],
+                              "scanned_at": datetime.now(timezone.utc).isoformat()}
+                self.last_scans[prefix] = result
+                results.append(result)
+            self.scans += 1
+            return results
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.scan_once()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            self._stop.clear()  # stop yang belum sempat berlaku dibatalkan
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="blob-watcher", daemon=True)
+        self._thread.start()
+        print(f"Blob watcher started: {', '.join(self.prefixes)} every {self.interval:.0f}s")
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def trigger(self):
+        """Bangunkan watcher untuk scan sekarang (tanpa menunggu interval)."""
+        self._wake.set()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "running": self._thread is not None and self._thread.is_alive() and not self._stop.is_set(),
+            "prefixes": self.prefixes,
+            "interval_seconds": self.interval,
+            "page_size": self.page_size,
+            "scans": self.scans,
+            "last_scans": dict(self.last_scans),
+            "watermarks": {prefix: self.state.watermark(prefix) for prefix in self.prefixes},
+        }
@@ -0,0 +1,52 @@
+from types import SimpleNamespace as NS
+
+from blob_watcher import BlobWatcher, WatchState
+from index_checkpoint import IndexRunLog
+
+
+class _Container:
+    def __init__(self, blobs):
+        self.blobs = blobs
+
+    def list_blobs(self, name_starts_with=None, results_per_page=None):
+        return [b for b in self.blobs if b.name.startswith(name_starts_with or "")]
+
+
+def _blob(name, etag="1"):
+    return NS(name=name, etag=etag, last_modified=None)
+
+
+def test_failed_extraction_is_retried_on_next_scan(tmp_path):
+    run_log = IndexRunLog(str(tmp_path / "runs.sqlite"))
+    offered = []
+
+    def index_blobs(prefix, blobs):
+        # Sama seperti _watch_index_blobs: hanya blob dengan status selesai di run log
+        offered.append(sorted(b.name for b in blobs))
+        run_id = run_log.start(prefix, False)["run_id"]
+        for blob in blobs:
+            if blob.name.endswith("timeout.pdf"):
+                run_log.record_blob(run_id, blob.name, "error", error="Document Intelligence timeout")
+            else:
+                run_log.record_blob(run_id, blob.name, "indexed", 3)
+        return run_log.completed_blobs(run_id)
+
+    container = _Container([_blob("sop/a.pdf"), _blob("sop/timeout.pdf")])
+    watcher = BlobWatcher(container, WatchState(str(tmp_path / "watch.sqlite")), ["sop/"], 60,
+                          index_blobs=index_blobs, remove_blob=lambda name: True)
+
+    first = watcher.scan_prefix("sop/")
+    second = watcher.scan_prefix("sop/")
+
+    assert first["indexed"] == 1
+    assert offered == [["sop/a.pdf", "sop/timeout.pdf"], ["sop/timeout.pdf"]]
+    assert second["new"] == 1
+
+
+def test_skipped_blob_enters_watermark(tmp_path):
+    run_log = IndexRunLog(str(tmp_path / "runs.sqlite"))
+    run_id = run_log.start("sop/", False)["run_id"]
+    run_log.record_blob(run_id, "sop/empty.pdf", "skipped", error="No content extracted")
+    run_log.record_blob(run_id, "sop/broken.pdf", "error", error="503 Service Unavailable")
+
+    assert run_log.completed_blobs(run_id) == {"sop/empty.pdf"}
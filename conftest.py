@@ -0,0 +1,2 @@
+# to_do_modul_test.py adalah modul aplikasi (Microsoft To Do), bukan test; jangan di-collect pytest
+collect_ignore = ["to_do_modul_test.py"]
@@ -0,0 +1,339 @@
+# dead_letter.py - Dead-letter store + retry worker untuk chunk yang gagal ditulis ke index (SQLite)
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Set
+
+
+class DeadLetterStore:
+    """Chunk yang gagal di-embed/di-upload, lengkap dengan payload (konten, metadata,
+    vektor jika sudah ada), error terakhir dan jumlah attempt.
+
+    Chunk `pending` dijadwalkan ulang dengan exponential backoff; setelah
+    `max_attempts` attempt statusnya jadi `failed` (permanen) sampai di-requeue manual
+    atau dokumennya di-index ulang.
+    """
+
+    def __init__(self, path: str, max_attempts: int = 6, backoff_seconds: float = 30.0,
+                 max_backoff_seconds: float = 3600.0):
+        self.path = path
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS dead_letters (
+                    chunk_id        TEXT PRIMARY KEY,
+                    source          TEXT NOT NULL,
+                    content         TEXT NOT NULL,
+                    metadata        TEXT NOT NULL,
+                    tokens          INTEGER NOT NULL,
+                    vector          TEXT,
+                    error           TEXT,
+                    attempts        INTEGER NOT NULL,
+                    status          TEXT NOT NULL,
+                    first_failed_at TEXT NOT NULL,
+                    last_failed_at  TEXT NOT NULL,
+                    next_attempt_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS dead_letters_source ON dead_letters (source);
+                CREATE INDEX IF NOT EXISTS dead_letters_due ON dead_letters (status, next_attempt_at);
+                """
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    def _backoff(self, attempts: int) -> float:
+        return min(self.max_backoff_seconds, self.backoff_seconds * 2 ** max(attempts - 1, 0))
+
+    def add(self, items: List[Dict[str, Any]], error: str):
+        """Simpan chunk gagal dari pipeline indexing (attempt pertama).
+
+        `items`: dict chunk IndexWriter (id, content, metadata, tokens) dengan `vector`
+        opsional; chunk yang sudah punya vektor tidak perlu di-embed ulang saat retry.
+        """
+        now = self._now()
+        next_attempt = time.time() + self._backoff(1)
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO dead_letters (chunk_id, source, content, metadata, tokens, vector, error, "
+                "attempts, status, first_failed_at, last_failed_at, next_attempt_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, 1, 'pending', ?, ?, ?)",
+                [
+                    (item["id"], item["metadata"].get("source") or "", item["content"], json.dumps(item["metadata"]),
+                     item.get("tokens") or 0, json.dumps(item["vector"]) if item.get("vector") is not None else None,
+                     error, now, now, next_attempt)
+                    for item in items
+                ],
+            )
+            conn.commit()
+
+    def due(self, limit: int = 500, until: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Chunk pending yang jadwal retry-nya sudah lewat `until` (default sekarang), paling lama dulu."""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT chunk_id, content, metadata, tokens, vector, attempts FROM dead_letters "
+                "WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?",
+                (time.time() if until is None else until, limit),
+            ).fetchall()
+        return [
+            {
+                "id": chunk_id,
+                "content": content,
+                "metadata": json.loads(metadata),
+                "tokens": tokens,
+                "vector": json.loads(vector) if vector else None,
+                "attempts": attempts,
+            }
+            for chunk_id, content, metadata, tokens, vector, attempts in rows
+        ]
+
+    def resolve(self, chunk_ids: List[str]) -> Set[str]:
+        """Hapus chunk yang berhasil di-retry. Return dokumen yang tidak punya dead letter lagi."""
+        if not chunk_ids:
+            return set()
+        with self._lock:
+            conn = self._connect()
+            sources = set()
+            for i in range(0, len(chunk_ids), 500):
+                part = chunk_ids[i:i + 500]
+                marks = ",".join("?" * len(part))
+                sources.update(r[0] for r in conn.execute(
+                    f"SELECT DISTINCT source FROM dead_letters WHERE chunk_id IN ({marks})", part))
+                conn.execute(f"DELETE FROM dead_letters WHERE chunk_id IN ({marks})", part)
+            conn.commit()
+            remaining = {r[0] for r in conn.execute(
+                f"SELECT DISTINCT source FROM dead_letters WHERE source IN ({','.join('?' * len(sources))})",
+                list(sources),
+            )} if sources else set()
+        return sources - remaining
+
+    def reschedule(self, errors: Dict[str, str]) -> Set[str]:
+        """Catat attempt yang gagal lagi; jadwal berikutnya mundur eksponensial.
+        Return dokumen yang chunk-nya baru saja kehabisan attempt (status `failed`)."""
+        exhausted = set()
+        now = self._now()
+        with self._lock:
+            conn = self._connect()
+            for chunk_id, error in errors.items():
+                row = conn.execute("SELECT source, attempts FROM dead_letters WHERE chunk_id = ?",
+                                   (chunk_id,)).fetchone()
+                if row is None:
+                    continue
+                source, attempts = row[0], row[1] + 1
+                status = "failed" if attempts >= self.max_attempts else "pending"
+                if status == "failed":
+                    exhausted.add(source)
+                conn.execute(
+                    "UPDATE dead_letters SET attempts = ?, status = ?, error = ?, last_failed_at = ?, "
+                    "next_attempt_at = ? WHERE chunk_id = ?",
+                    (attempts, status, error, now, time.time() + self._backoff(attempts), chunk_id),
+                )
+            conn.commit()
+        return exhausted
+
+    def requeue(self, source: Optional[str] = None) -> int:
+        """Jadwalkan ulang chunk `failed` (semua atau satu dokumen) untuk segera di-retry."""
+        query = ("UPDATE dead_letters SET status = 'pending', attempts = 0, next_attempt_at = ? "
+                 "WHERE status = 'failed'")
+        params: List[Any] = [time.time()]
+        if source is not None:
+            query += " AND source = ?"
+            params.append(source)
+        with self._lock:
+            conn = self._connect()
+            count = conn.execute(query, params).rowcount
+            conn.commit()
+        return count
+
+    def remove_source(self, source: str) -> int:
+        """Buang dead letter dokumen (di-index ulang dari awal atau blob-nya dihapus)."""
+        with self._lock:
+            conn = self._connect()
+            count = conn.execute("DELETE FROM dead_letters WHERE source = ?", (source,)).rowcount
+            conn.commit()
+        return count
+
+    def pending_count(self, source: Optional[str] = None) -> int:
+        query = "SELECT COUNT(*) FROM dead_letters WHERE status = 'pending'"
+        params: List[Any] = []
+        if source is not None:
+            query += " AND source = ?"
+            params.append(source)
+        with self._lock:
+            return self._connect().execute(query, params).fetchone()[0]
+
+    def summary(self, source: Optional[str] = None, limit: int = 100) -> Dict[str, Any]:
+        """Jumlah chunk pending / gagal permanen per dokumen, error terakhir & jadwal retry."""
+        query = (
+            "SELECT source, SUM(status = 'pending'), SUM(status = 'failed'), MAX(attempts), "
+            "MIN(CASE WHEN status = 'pending' THEN next_attempt_at END), MAX(last_failed_at) "
+            "FROM dead_letters"
+        )
+        params: List[Any] = []
+        if source is not None:
+            query += " WHERE source = ?"
+            params.append(source)
+        query += " GROUP BY source ORDER BY MAX(last_failed_at) DESC"
+        with self._lock:
+            conn = self._connect()
+            rows = conn.execute(query, params).fetchall()
+            errors = dict(conn.execute(
+                "SELECT source, error FROM dead_letters d WHERE last_failed_at = "
+                "(SELECT MAX(last_failed_at) FROM dead_letters WHERE source = d.source)"
+            ).fetchall())
+        documents = [
+            {
+                "source": name,
+                "pending": pending,
+                "failed": failed,
+                "max_attempts_used": attempts,
+                "next_retry_at": (datetime.fromtimestamp(next_at, timezone.utc).isoformat()
+                                  if next_at is not None else None),
+                "last_failed_at": last_failed,
+                "last_error": errors.get(name),
+            }
+            for name, pending, failed, attempts, next_at, last_failed in rows
+        ]
+        return {
+            "documents_affected": len(documents),
+            "pending_chunks": sum(d["pending"] for d in documents),
+            "failed_chunks": sum(d["failed"] for d in documents),
+            "max_attempts": self.max_attempts,
+            "documents": documents[:limit],
+        }
+
+
+class DeadLetterRetryWorker:
+    """Daemon yang menguras dead-letter store: ambil chunk yang jatuh tempo, tulis ulang
+    lewat `write(items)` (return {chunk_id: error} untuk chunk yang masih gagal),
+    lalu hapus yang berhasil atau jadwalkan ulang dengan backoff.
+
+    `on_resolved(source)` dipanggil saat semua dead letter dokumen sudah tertulis,
+    `on_exhausted(source)` saat chunk dokumen kehabisan attempt.
+    """
+
+    def __init__(self, store: DeadLetterStore, write: Callable[[List[Dict[str, Any]]], Dict[str, str]],
+                 interval: float = 30.0, batch_size: int = 500,
+                 on_resolved: Optional[Callable[[str], None]] = None,
+                 on_exhausted: Optional[Callable[[str], None]] = None):
+        self.store = store
+        self.write = write
+        self.interval = max(1.0, interval)
+        self.batch_size = max(1, batch_size)
+        self.on_resolved = on_resolved
+        self.on_exhausted = on_exhausted
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._drain_lock = threading.Lock()
+
+        self.attempted = 0
+        self.recovered = 0
+        self.exhausted = 0
+        self.last_drain: Optional[Dict[str, Any]] = None
+
+    def drain_once(self) -> Dict[str, Any]:
+        """Retry semua chunk yang jatuh tempo (per batch) sampai tidak ada lagi."""
+        with self._drain_lock:
+            started = time.perf_counter()
+            # Chunk yang gagal lagi dijadwalkan setelah cutoff ini, jadi tidak diulang dalam drain yang sama
+            cutoff = time.time()
+            result = {"attempted": 0, "recovered": 0, "still_failing": 0, "exhausted_documents": [],
+                      "resolved_documents": []}
+            while True:
+                items = self.store.due(self.batch_size, until=cutoff)
+                if not items:
+                    break
+                try:
+                    errors = self.write(items)
+                except Exception as e:
+                    errors = {item["id"]: f"retry failed: {e}" for item in items}
+                succeeded = [item["id"] for item in items if item["id"] not in errors]
+                resolved = self.store.resolve(succeeded)
+                exhausted = self.store.reschedule(errors)
+                result["attempted"] += len(items)
+                result["recovered"] += len(succeeded)
+                result["still_failing"] += len(errors)
+                result["resolved_documents"].extend(sorted(resolved))
+                result["exhausted_documents"].extend(sorted(exhausted))
+                self._notify(self.on_resolved, resolved)
+                self._notify(self.on_exhausted, exhausted)
+                if self._stop.is_set():
+                    break
+
+            self.attempted += result["attempted"]
+            self.recovered += result["recovered"]
+            self.exhausted += len(result["exhausted_documents"])
+            result["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+            result["drained_at"] = datetime.now(timezone.utc).isoformat()
+            if result["attempted"]:
+                print(f"Dead-letter retry: {result['recovered']}/{result['attempted']} chunks recovered, "
+                      f"{len(result['exhausted_documents'])} documents out of attempts")
+            self.last_drain = result
+            return result
+
+    @staticmethod
+    def _notify(callback: Optional[Callable[[str], None]], sources: Set[str]):
+        if callback is None:
+            return
+        for source in sources:
+            try:
+                callback(source)
+            except Exception as e:
+                print(f"Dead-letter callback failed for {source}: {e}")
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.drain_once()
+            except Exception as e:
+                print(f"Dead-letter retry failed: {e}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            self._stop.clear()
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="dead-letter-retry", daemon=True)
+        self._thread.start()
+        print(f"Dead-letter retry worker started: every {self.interval:.0f}s")
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def trigger(self):
+        """Bangunkan worker untuk mengecek dead letter sekarang."""
+        self._wake.set()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "running": self._thread is not None and self._thread.is_alive() and not self._stop.is_set(),
+            "interval_seconds": self.interval,
+            "batch_size": self.batch_size,
+            "attempted": self.attempted,
+            "recovered": self.recovered,
+            "exhausted_documents": self.exhausted,
+            "last_drain": self.last_drain,
+        }
@@ -0,0 +1,89 @@
+import time
+
+from dead_letter import DeadLetterRetryWorker, DeadLetterStore
+
+
+def _chunk(chunk_id, source="sop/a.pdf", vector=None):
+    return {"id": chunk_id, "content": f"isi {chunk_id}", "metadata": {"source": source},
+            "tokens": 3, "vector": vector}
+
+
+def _store(tmp_path, **kwargs):
+    kwargs.setdefault("backoff_seconds", 0)
+    return DeadLetterStore(str(tmp_path / "dead_letters.sqlite"), **kwargs)
+
+
+def test_backoff_doubles_up_to_max(tmp_path):
+    store = _store(tmp_path, backoff_seconds=30, max_backoff_seconds=100)
+
+    assert [store._backoff(attempt) for attempt in (1, 2, 3, 4)] == [30, 60, 100, 100]
+
+
+def test_chunk_is_not_due_before_backoff(tmp_path):
+    store = _store(tmp_path, backoff_seconds=30)
+    store.add([_chunk("a_0")], "503 Service Unavailable")
+
+    assert store.due() == []
+    assert [item["id"] for item in store.due(until=time.time() + 31)] == ["a_0"]
+
+
+def test_retry_keeps_stored_vector_and_resolves_document(tmp_path):
+    store = _store(tmp_path)
+    store.add([_chunk("a_0", vector=[0.1, 0.2]), _chunk("a_1")], "upload failed")
+    written, resolved = [], []
+
+    def write(items):
+        written.extend(items)
+        return {}
+
+    worker = DeadLetterRetryWorker(store, write, on_resolved=resolved.append)
+    result = worker.drain_once()
+
+    assert result["recovered"] == 2
+    assert {item["id"]: item["vector"] for item in written} == {"a_0": [0.1, 0.2], "a_1": None}
+    assert resolved == ["sop/a.pdf"]
+    assert store.pending_count() == 0
+
+
+def test_failing_chunk_is_exhausted_after_max_attempts(tmp_path):
+    store = _store(tmp_path, max_attempts=3)
+    store.add([_chunk("a_0")], "upload failed")
+    exhausted = []
+    worker = DeadLetterRetryWorker(store, lambda items: {item["id"]: "still failing" for item in items},
+                                   on_exhausted=exhausted.append)
+
+    drains = [worker.drain_once() for _ in range(3)]
+
+    # Satu attempt per drain: chunk yang gagal lagi dijadwalkan setelah cutoff drain
+    assert [drain["attempted"] for drain in drains] == [1, 1, 0]
+    assert exhausted == ["sop/a.pdf"]
+    summary = store.summary()
+    assert summary["pending_chunks"] == 0
+    assert summary["failed_chunks"] == 1
+    assert summary["documents"][0]["last_error"] == "still failing"
+
+
+def test_requeue_and_remove_source(tmp_path):
+    store = _store(tmp_path, max_attempts=1)
+    store.add([_chunk("a_0"), _chunk("b_0", source="sop/b.pdf")], "upload failed")
+    store.reschedule({"a_0": "still failing", "b_0": "still failing"})
+
+    assert store.pending_count() == 0
+    assert store.requeue("sop/a.pdf") == 1
+    assert [item["id"] for item in store.due()] == ["a_0"]
+    assert store.remove_source("sop/b.pdf") == 1
+    assert store.summary()["documents_affected"] == 1
+
+
+def test_write_exception_reschedules_whole_batch(tmp_path):
+    store = _store(tmp_path)
+    store.add([_chunk("a_0"), _chunk("a_1")], "upload failed")
+
+    def write(items):
+        raise ConnectionError("search unavailable")
+
+    result = DeadLetterRetryWorker(store, write).drain_once()
+
+    assert result["still_failing"] == 2
+    assert store.pending_count("sop/a.pdf") == 2
+    assert all(item["attempts"] == 2 for item in store.due())
@@ -0,0 +1,478 @@
+# doc_chunking.py - Pembersihan teks, klasifikasi konten & chunking dokumen (CPU only)
+# Tidak bergantung pada client Azure sehingga bisa dipakai/di-benchmark secara terpisah.
+import hashlib
+import json
+import os
+import re
+import zlib
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import tiktoken
+
+tokenizer = tiktoken.get_encoding("cl100k_base")
+def tiktoken_len(text):
+    return len(tokenizer.encode(text))
+
+# === Token accounting: encode sekali per dokumen, header di-memoize ===
+def _count_tokens_batch(texts: List[str]) -> List[int]:
+    """Hitung token banyak teks sekaligus lewat encode_batch (satu pass per dokumen)."""
+    if not texts:
+        return []
+    return [len(tokens) for tokens in tokenizer.encode_batch(texts)]
+
+@lru_cache(maxsize=4096)
+def _header_tokens(header: str) -> int:
+    """Token cost header chunk `=== header ===\n` (dipakai berulang per split)."""
+    return tiktoken_len(f"=== {header} ===\n")
+
+# === Advanced text cleaning dengan preserve struktur ===
+# Pola di-compile sekali. Bullet, spasi/tab dan newline dinormalisasi dalam satu
+# pass gabungan, yang di-skip jika pengecekan substring (C, sangat murah)
+# menunjukkan tidak ada yang perlu diubah. Setelah langkah numbering, normalisasi
+# sub-numbering lama tidak pernah match lagi, jadi tidak perlu pass sendiri.
+_BULLETS = "•●▪∙◦"
+_WHITESPACE_PATTERN = re.compile(
+    r"(?P<bullet>[•●▪∙◦])[ \t]*"          # Bullet points dengan spasi
+    r"|(?P<space>[ \t]{2,}|\t)"           # Multiple spaces jadi single space
+    r"|(?P<newlines>\n{4,})"              # Max 3 newlines berturut-turut
+)
+_WHITESPACE_REPLACEMENTS = {"bullet": "- ", "space": " ", "newlines": "\n\n\n"}
+_NUMBERING_PATTERN = re.compile(r"(\d+)\.\s*")
+
+def _whitespace_replacement(match: "re.Match") -> str:
+    return _WHITESPACE_REPLACEMENTS[match.lastgroup]
+
+def _numbering_replacement(match: "re.Match") -> str:
+    return match.group(1) + ". "
+
+def _needs_whitespace_pass(txt: str) -> bool:
+    return ("  " in txt or "\t" in txt or "\n\n\n\n" in txt
+            or any(bullet in txt for bullet in _BULLETS))
+
+def _clean_text(text: str) -> str:
+    if not text:
+        return ""
+    
+    # Preserve struktur dokumen yang penting
+    txt = text.replace("\u00a0", " ") if "\u00a0" in text else text  # Non-breaking space
+    if _needs_whitespace_pass(txt):
+        txt = _WHITESPACE_PATTERN.sub(_whitespace_replacement, txt)
+    
+    # Preserve numbering dan struktur hierarki
+    txt = _NUMBERING_PATTERN.sub(_numbering_replacement, txt)  # Normalize numbering
+    
+    return txt.strip()
+
+# === Struktur dokumen dari layout Document Intelligence ===
+_SECTION_START_TYPES = ["title", "heading", "section_header", "chapter", "subsection"]
+
+def _finish_section(section: Dict[str, Any]) -> Dict[str, Any]:
+    """Hitung token semua paragraf section sekaligus (encode_batch) saat section ditutup."""
+    counts = _count_tokens_batch([part["content"] for part in section["content_parts"]])
+    for part, tokens in zip(section["content_parts"], counts):
+        part["tokens"] = tokens
+    section["total_tokens"] = sum(counts)
+    return section
+
+def _iter_sections(paragraphs: Iterable[Tuple[str, Optional[str]]]) -> Iterator[Dict[str, Any]]:
+    """Konsumsi paragraf (content, role) dan yield setiap section begitu section tersebut
+    tertutup (heading berikutnya / akhir dokumen). Memory dibatasi section terbesar."""
+    current_section = None
+    section_counter = 0
+
+    # Process paragraphs dengan context dan posisi - GENERAL approach
+    for idx, (content, role) in enumerate(paragraphs):
+        text = _clean_text(content)
+        if not text or len(text) < 10:  # Skip very short content
+            continue
+
+        content_type = _classify_content_type(text, role)
+        
+        section_data = {
+            "content": text,
+            "type": content_type,
+            "role": role,
+            "position": idx,
+        }
+
+        # Jika heading, mulai section baru
+        if content_type in _SECTION_START_TYPES:
+            if current_section:
+                yield _finish_section(current_section)
+            
+            current_section = {
+                "header": text,
+                "type": content_type,
+                "content_parts": [section_data],
+                "section_id": section_counter,
+            }
+            section_counter += 1
+        else:
+            if current_section:
+                current_section["content_parts"].append(section_data)
+            else:
+                current_section = {
+                    "header": "Document Content",
+                    "type": "content",
+                    "content_parts": [section_data],
+                    "section_id": section_counter,
+                }
+                section_counter += 1
+
+    if current_section:
+        yield _finish_section(current_section)
+
+def _iter_tables(tables: Iterable[List[List[Any]]], start: int = 0) -> Iterator[Dict[str, Any]]:
+    """Yield tabel (teks `a | b` per baris + headers) dari sel layout, satu per satu.
+    `start` = table_id tabel pertama (untuk tabel yang di-stream per window)."""
+    # Process tables dengan context yang lebih baik
+    for table_idx, cells in enumerate(tables, start):
+        rows = {}
+        headers = []
+        
+        for row_index, column_index, cell_content in cells:
+            content = _clean_text(cell_content)
+            if row_index not in rows:
+                rows[row_index] = {}
+            rows[row_index][column_index] = content
+            
+            if row_index == 0:
+                headers.append(content)
+
+        table_rows = []
+        for r in sorted(rows.keys()):
+            row_data = [rows[r].get(c, "") for c in sorted(rows[r].keys())]
+            table_rows.append(" | ".join(row_data))
+        
+        table_text = "\n".join(table_rows)
+        
+        yield {
+            "content": table_text,
+            "headers": headers,
+            "table_id": table_idx,
+            "tokens": tiktoken_len(table_text)
+        }
+
+def _layout_to_doc_data(layout: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    """Bangun sections/tables/document_structure dari layout ringkas (versi non-streaming)."""
+    sections = list(_iter_sections(layout["paragraphs"]))
+    return {
+        "sections": sections,  # Semua bagian dengan metadata
+        "raw_tables": list(_iter_tables(layout["tables"])),
+        # Struktur hierarki dokumen (paragraf yang sama, urut posisi)
+        "document_structure": [part for section in sections for part in section["content_parts"]],
+    }
+
+# Pattern umum untuk berbagai bahasa dan jenis dokumen (di-compile sekali)
+# Table of Contents patterns
+_TOC_KEYWORDS = ("DAFTAR ISI", "TABLE OF CONTENTS", "CONTENTS", "INDEX", "INDEKS")
+# Chapter/Section patterns
+_CHAPTER_PATTERN = re.compile(r"(BAB|CHAPTER|SECTION|BAGIAN)\s*\d+")
+_SECTION_NUMBER_PATTERN = re.compile(r"\d+\.")
+_SUBSECTION_NUMBER_PATTERN = re.compile(r"\d+\.\d+")
+# Keyword setelah pengecekan numbering, urut sesuai prioritas
+_CONTENT_KEYWORDS = (
+    # Appendix patterns
+    ("appendix", ("APPENDIX", "LAMPIRAN", "ANNEX", "ATTACHMENT")),
+    # General important sections
+    ("purpose_statement", ("PURPOSE", "TUJUAN", "VISION", "VISI", "MISSION", "MISI",
+                           "OBJECTIVE", "SASARAN", "GOAL", "TARGET", "INTRODUCTION",
+                           "PENDAHULUAN", "OVERVIEW", "RINGKASAN", "SUMMARY",
+                           "CONCLUSION", "KESIMPULAN", "RECOMMENDATION", "REKOMENDASI")),
+    # Procedure/Process + Policy/Rule patterns
+    ("detailed_content", ("PROCEDURE", "PROSEDUR", "PROCESS", "PROSES", "WORKFLOW",
+                          "LANGKAH", "TAHAP", "STEPS", "CARA",
+                          "POLICY", "KEBIJAKAN", "RULE", "ATURAN", "REGULATION",
+                          "REGULASI", "GUIDELINE", "PANDUAN")),
+)
+_TABLE_CHARS = ("|", ":", "─", "┌", "└")
+
+def _contains_any(text: str, keywords: Tuple[str, ...]) -> bool:
+    for keyword in keywords:
+        if keyword in text:
+            return True
+    return False
+
+def _classify_content_type(text: str, role: Optional[str] = None) -> str:
+    """Klasifikasi jenis konten GENERAL untuk semua jenis dokumen."""
+    # Deteksi berdasarkan role
+    if role:
+        role_lower = role.lower()
+        if "title" in role_lower:
+            return "title"
+        if "heading" in role_lower:
+            return "heading"
+    
+    text_upper = text.upper()
+    if _contains_any(text_upper, _TOC_KEYWORDS):
+        return "table_of_contents"
+    
+    if _CHAPTER_PATTERN.match(text_upper):
+        return "chapter"
+    
+    stripped = text.strip()
+    if _SECTION_NUMBER_PATTERN.match(stripped):  # Dimulai dengan nomor
+        return "section_header"
+    
+    if _SUBSECTION_NUMBER_PATTERN.match(stripped):  # Sub section
+        return "subsection_header"
+    
+    for content_type, keywords in _CONTENT_KEYWORDS:
+        if _contains_any(text_upper, keywords):
+            return content_type
+    
+    # Long detailed content
+    if len(text.split()) > 100:
+        return "detailed_content"
+    
+    # Table content detection
+    if _contains_any(text, _TABLE_CHARS):
+        return "table_content"
+    
+    return "content"
+
+# === Cost-optimized intelligent chunking strategy ===
+def _create_intelligent_chunks(doc_data: Dict[str, List[Dict]]) -> List[Dict[str, Any]]:
+    """Create chunks yang cost-efficient untuk Azure AI Search."""
+    chunks = []
+    
+    # Process sections dengan cost optimization
+    for section in doc_data.get("sections", []):
+        section_chunks = _process_section_intelligently(section)
+        chunks.extend(section_chunks)
+    
+    # Process tables sebagai chunks terpisah dengan optimization
+    for table in doc_data.get("raw_tables", []):
+        chunks.extend(_table_chunks(table))
+    
+    # Deduplicate untuk avoid redundant storage
+    chunks = _deduplicate_chunks(chunks)
+    
+    return chunks
+
+def _iter_intelligent_chunks(paragraphs: Iterable[Tuple[str, Optional[str]]],
+                             tables: List[List[List[Any]]]) -> Iterator[Dict[str, Any]]:
+    """Versi streaming `_create_intelligent_chunks`: yield chunk begitu section tertutup.
+
+    `tables` adalah buffer yang diisi selama paragraf dikonsumsi; isinya di-chunk dan
+    dikosongkan setiap kali section tertutup (dan sisanya di akhir), jadi tabel tidak
+    ditahan sampai seluruh dokumen habis. Isi chunk dan table_id sama dengan versi list,
+    hanya chunk tabel muncul di dekat section tempat tabel itu berada.
+    """
+    seen_hashes = set()
+    table_count = 0
+
+    def unique(chunks: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        for chunk in chunks:
+            content_hash = hashlib.md5(chunk["content"].encode()).hexdigest()
+            if content_hash not in seen_hashes:
+                seen_hashes.add(content_hash)
+                yield chunk
+
+    def drain_tables() -> Iterator[Dict[str, Any]]:
+        nonlocal table_count
+        ready = tables[:]
+        del tables[:]
+        for table in _iter_tables(ready, table_count):
+            yield from unique(_table_chunks(table))
+        table_count += len(ready)
+
+    for section in _iter_sections(paragraphs):
+        yield from unique(_process_section_intelligently(section))
+        yield from drain_tables()
+
+    yield from drain_tables()
+
+def _iter_chunks_from_layouts(layouts: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Stream chunk dari layout per page window (urut halaman) tanpa menggabungkan dokumen.
+    Tabel sebuah window masuk buffer setelah paragraf window itu dikonsumsi, lalu di-chunk
+    saat section berikutnya tertutup; buffer hanya berisi tabel window yang belum di-chunk."""
+    tables: List[List[List[Any]]] = []
+
+    def paragraphs() -> Iterator[Tuple[str, Optional[str]]]:
+        for layout in layouts:
+            yield from layout["paragraphs"]
+            tables.extend(layout["tables"])
+
+    return _iter_intelligent_chunks(paragraphs(), tables)
+
+def _table_chunks(table: Dict[str, Any]) -> List[Dict[str, Any]]:
+    if table["tokens"] > 3500:  # Table besar dipecah dengan target yang lebih besar
+        return _split_large_table(table)
+    return [{
+        "content": f"=== TABLE ===\n{table['content']}",
+        "type": "table",
+        "metadata": {"table_id": table["table_id"], "headers": table["headers"]},
+        "tokens": table["tokens"]
+    }]
+
+def _process_section_intelligently(section: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Process section dengan cost optimization - larger chunks untuk reduce storage cost."""
+    chunks = []
+    section_header = section["header"]
+    content_parts = section["content_parts"]
+    
+    # Target chunk size yang lebih besar untuk cost efficiency (3000-4000 tokens)
+    target_chunk_size = 3500
+    
+    # Jika section kecil atau medium, jadikan satu chunk
+    if section["total_tokens"] <= target_chunk_size:
+        full_content = f"=== {section_header} ===\n"
+        full_content += "\n\n".join([part["content"] for part in content_parts])
+        
+        chunks.append({
+            "content": full_content,
+            "type": section["type"],
+            "metadata": {
+                "section_header": section_header,
+                "section_id": section["section_id"],
+                "is_complete_section": True
+            },
+            "tokens": section["total_tokens"]
+        })
+    else:
+        # Section besar, bagi dengan larger chunks untuk cost efficiency
+        current_chunk_parts = []
+        current_tokens = _header_tokens(section_header)
+        
+        for part in content_parts:
+            # Target yang lebih besar untuk reduce number of chunks
+            if current_tokens + part["tokens"] > target_chunk_size:
+                if current_chunk_parts:
+                    # Create chunk
+                    chunk_content = f"=== {section_header} ===\n"
+                    chunk_content += "\n\n".join([p["content"] for p in current_chunk_parts])
+                    
+                    chunks.append({
+                        "content": chunk_content,
+                        "type": section["type"],
+                        "metadata": {
+                            "section_header": section_header,
+                            "section_id": section["section_id"],
+                            "is_partial_section": True,
+                            "chunk_part": len(chunks) + 1
+                        },
+                        "tokens": current_tokens
+                    })
+                
+                # Start new chunk
+                current_chunk_parts = [part]
+                current_tokens = _header_tokens(section_header) + part["tokens"]
+            else:
+                current_chunk_parts.append(part)
+                current_tokens += part["tokens"]
+        
+        # Add final chunk if exists
+        if current_chunk_parts:
+            chunk_content = f"=== {section_header} ===\n"
+            chunk_content += "\n\n".join([p["content"] for p in current_chunk_parts])
+            
+            chunks.append({
+                "content": chunk_content,
+                "type": section["type"],
+                "metadata": {
+                    "section_header": section_header,
+                    "section_id": section["section_id"],
+                    "is_partial_section": True,
+                    "chunk_part": len(chunks) + 1
+                },
+                "tokens": current_tokens
+            })
+    
+    return chunks
+
+def _split_large_table(table: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Split table besar dengan preserve headers dan target size yang lebih besar."""
+    chunks = []
+    lines = table["content"].split("\n")
+    headers = lines[0] if lines else ""
+    
+    # Token per baris dihitung sekali untuk seluruh tabel
+    line_token_counts = _count_tokens_batch(lines)
+    header_tokens = line_token_counts[0] if line_token_counts else 0
+
+    current_chunk_lines = [headers]  # Always include headers
+    current_tokens = header_tokens
+    
+    # Target size yang lebih besar untuk tables
+    target_size = 3000
+    
+    for line, line_tokens in zip(lines[1:], line_token_counts[1:]):  # Skip header line
+        if current_tokens + line_tokens > target_size:
+            # Create chunk
+            chunk_content = f"=== TABLE (Part {len(chunks) + 1}) ===\n"
+            chunk_content += "\n".join(current_chunk_lines)
+            
+            chunks.append({
+                "content": chunk_content,
+                "type": "table",
+                "metadata": {
+                    "table_id": table["table_id"],
+                    "headers": table["headers"],
+                    "is_partial_table": True,
+                    "part": len(chunks) + 1
+                },
+                "tokens": current_tokens
+            })
+            
+            # Start new chunk with headers
+            current_chunk_lines = [headers, line]
+            current_tokens = header_tokens + line_tokens
+        else:
+            current_chunk_lines.append(line)
+            current_tokens += line_tokens
+    
+    # Add final chunk
+    if len(current_chunk_lines) > 1:  # More than just headers
+        chunk_content = f"=== TABLE (Part {len(chunks) + 1}) ===\n"
+        chunk_content += "\n".join(current_chunk_lines)
+        
+        chunks.append({
+            "content": chunk_content,
+            "type": "table",
+            "metadata": {
+                "table_id": table["table_id"],
+                "headers": table["headers"],
+                "is_partial_table": True,
+                "part": len(chunks) + 1
+            },
+            "tokens": current_tokens
+        })
+    
+    return chunks
+
+def _deduplicate_chunks(chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Remove duplicate chunks untuk cost optimization."""
+    unique_chunks = []
+    seen_hashes = set()
+    
+    for chunk in chunks:
+        # Create content hash untuk deduplication
+        content_hash = hashlib.md5(chunk["content"].encode()).hexdigest()
+        
+        if content_hash not in seen_hashes:
+            seen_hashes.add(content_hash)
+            unique_chunks.append(chunk)
+    
+    return unique_chunks
+
+# === Chunking di process pool (ProcessPoolExecutor) ===
+# Fungsi di bawah dijalankan di worker process: hanya bergantung pada modul ini
+# (tanpa client Azure), jadi import di process baru murah.
+def encode_layouts(layouts: Iterable[Dict[str, Any]]) -> bytes:
+    """Layout per window -> JSON ter-kompres zlib (format sama dengan cache Document Intelligence)."""
+    return zlib.compress(json.dumps(list(layouts), ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 1)
+
+def chunk_encoded_layouts(payload: bytes) -> List[Dict[str, Any]]:
+    """Chunk satu dokumen dari hasil `encode_layouts` (dijalankan di worker process)."""
+    layouts = json.loads(zlib.decompress(payload).decode("utf-8"))
+    return list(_iter_chunks_from_layouts(layouts))
+
+def init_chunk_worker(niceness: int = 0):
+    """Initializer worker process: turunkan prioritas CPU supaya request interaktif tetap didahulukan."""
+    if niceness and hasattr(os, "nice"):
+        try:
+            os.nice(niceness)
+        except OSError:
+            pass
@@ -0,0 +1,197 @@
+# doc_summaries.py - Ringkasan & daftar isi per dokumen (dibuat saat indexing) untuk pertanyaan overview (SQLite FTS5)
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from doc_chunking import _classify_content_type
+
+# Tipe konten (dari _classify_content_type) yang masuk struktur bagian
+HEADING_TYPES = ("title", "heading", "chapter", "section_header", "subsection_header")
+_DEFAULT_HEADER = "Document Content"
+# Paragraf heading/judul lebih panjang dari ini dianggap isi, bukan judul bagian
+_MAX_HEADING_WORDS = 16
+_CHUNK_HEADER_PATTERN = re.compile(r"^=== .*? ===\n")
+_TERM_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+class DocumentOutline:
+    """Kumpulkan judul, heading, daftar isi dan paragraf pembuka dari chunk dokumen saat
+    di-stream ke writer. Chunk hanya membawa tipe section-nya, jadi setiap paragraf
+    diklasifikasi ulang (title/heading/table_of_contents, dst). Tanpa panggilan LLM;
+    ukuran record dibatasi (`max_headings`, `intro_words`, `toc_words`)."""
+
+    def __init__(self, source: str, max_headings: int = 80, intro_words: int = 120, toc_words: int = 400):
+        self.source = source
+        self.max_headings = max_headings
+        self.intro_words = intro_words
+        self.toc_words = toc_words
+        self.title: Optional[str] = None
+        self.headings: List[str] = []
+        self._seen_headings: set = set()
+        self._first_line: Optional[str] = None
+        self._intro: List[str] = []
+        self._toc: List[str] = []
+        self.content_types: Dict[str, int] = {}
+
+    def _add_heading(self, text: str):
+        if text and text != _DEFAULT_HEADER and text not in self._seen_headings and len(self.headings) < self.max_headings:
+            self._seen_headings.add(text)
+            self.headings.append(text)
+
+    def add(self, chunk: Dict[str, Any]):
+        content_type = chunk.get("type") or "content"
+        self.content_types[content_type] = self.content_types.get(content_type, 0) + 1
+        if content_type == "table":
+            return
+        header = (chunk.get("metadata") or {}).get("section_header")
+        if content_type == "title" and self.title is None and header:
+            self.title = header
+        if content_type in HEADING_TYPES and header:
+            self._add_heading(header)
+
+        body = _CHUNK_HEADER_PATTERN.sub("", chunk.get("content") or "", count=1)
+        for paragraph in body.split("\n\n"):
+            words = paragraph.split()
+            if not words:
+                continue
+            if self._first_line is None and len(words) <= _MAX_HEADING_WORDS:
+                self._first_line = paragraph.strip()
+            paragraph_type = _classify_content_type(paragraph)
+            if paragraph_type == "table_of_contents":
+                if len(self._toc) < self.toc_words:
+                    self._toc.extend(words[:self.toc_words - len(self._toc)])
+            elif paragraph_type in HEADING_TYPES and len(words) <= _MAX_HEADING_WORDS:
+                self._add_heading(paragraph.strip())
+            elif len(self._intro) < self.intro_words:
+                self._intro.extend(words[:self.intro_words - len(self._intro)])
+
+    def record(self, chunk_count: int) -> Dict[str, Any]:
+        return {
+            "source": self.source,
+            "title": self.title or self._first_line or os.path.basename(self.source),
+            "summary": " ".join(self._intro),
+            "headings": list(self.headings),
+            "toc": " ".join(self._toc),
+            "content_types": dict(self.content_types),
+            "chunk_count": chunk_count,
+        }
+
+
+def format_summary(record: Dict[str, Any]) -> str:
+    """Record ringkasan -> teks konteks untuk LLM."""
+    lines = [f"[SOURCE: {record['source']} | TYPE: document_summary | CHUNKS: {record['chunk_count']}]",
+             f"Judul: {record['title']}"]
+    if record["summary"]:
+        lines.append(f"Pembuka: {record['summary']}")
+    if record["headings"]:
+        lines.append("Struktur bagian:")
+        lines.extend(f"- {heading}" for heading in record["headings"])
+    if record["toc"]:
+        lines.append(f"Daftar isi (dari dokumen): {record['toc']}")
+    return "\n".join(lines)
+
+
+class DocumentSummaryStore:
+    """Satu record ringkas per dokumen (judul, pembuka, heading, daftar isi) dengan
+    full-text search (FTS5, bobot nama file & judul lebih tinggi). Jika SQLite tanpa
+    FTS5, pencarian memakai skor overlap kata di Python."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.fts = True
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS doc_summaries (
+                    source     TEXT PRIMARY KEY,
+                    record     TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+                """
+            )
+            try:
+                conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS doc_summaries_fts USING fts5(source, title, body)")
+            except sqlite3.OperationalError:
+                self.fts = False
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def upsert(self, record: Dict[str, Any]):
+        body = " ".join([record["summary"], " ".join(record["headings"]), record["toc"]])
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO doc_summaries (source, record, updated_at) VALUES (?, ?, ?)",
+                (record["source"], json.dumps(record), datetime.now(timezone.utc).isoformat()),
+            )
+            if self.fts:
+                conn.execute("DELETE FROM doc_summaries_fts WHERE source = ?", (record["source"],))
+                conn.execute("INSERT INTO doc_summaries_fts (source, title, body) VALUES (?, ?, ?)",
+                             (record["source"], record["title"], body))
+            conn.commit()
+
+    def remove(self, source: str):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM doc_summaries WHERE source = ?", (source,))
+            if self.fts:
+                conn.execute("DELETE FROM doc_summaries_fts WHERE source = ?", (source,))
+            conn.commit()
+
+    def get(self, source: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connect().execute("SELECT record FROM doc_summaries WHERE source = ?", (source,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def search(self, terms: List[str], k: int = 3, prefix: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Dokumen yang paling cocok dengan `terms` (nama file, judul, lalu isi ringkasan)."""
+        terms = [t for t in dict.fromkeys(t.lower() for t in terms) if t]
+        if not terms:
+            return []
+        with self._lock:
+            conn = self._connect()
+            if self.fts:
+                match = " OR ".join('"' + t.replace('"', '""') + '"' for t in terms)
+                query = ("SELECT s.record FROM doc_summaries_fts f JOIN doc_summaries s ON s.source = f.source "
+                         "WHERE doc_summaries_fts MATCH ?")
+                params: List[Any] = [match]
+                if prefix:
+                    query += " AND s.source LIKE ? ESCAPE '\\'"
+                    params.append(prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+                query += " ORDER BY bm25(doc_summaries_fts, 10.0, 5.0, 1.0) LIMIT ?"
+                params.append(k)
+                return [json.loads(r[0]) for r in conn.execute(query, params).fetchall()]
+            rows = conn.execute("SELECT source, record FROM doc_summaries").fetchall()
+
+        wanted = set(terms)
+        scored = []
+        for source, raw in rows:
+            if prefix and not source.startswith(prefix):
+                continue
+            record = json.loads(raw)
+            name_terms = set(_TERM_PATTERN.findall(f"{source} {record['title']}".lower()))
+            body_terms = set(_TERM_PATTERN.findall(" ".join(
+                [record["summary"], " ".join(record["headings"]), record["toc"]]).lower()))
+            score = 3 * len(wanted & name_terms) + len(wanted & body_terms)
+            if score:
+                scored.append((score, record))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [record for _, record in scored[:k]]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count = self._connect().execute("SELECT COUNT(*) FROM doc_summaries").fetchone()[0]
+        return {"documents": count, "full_text_search": self.fts}
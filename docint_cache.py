@@ -0,0 +1,105 @@
+# docint_cache.py - Content-addressed on-disk cache untuk hasil layout Document Intelligence
+import hashlib
+import json
+import os
+import threading
+import zlib
+from typing import Any, Dict, Optional
+
+
+class LayoutCache:
+    """Cache layout (paragraf + role, sel tabel) di disk, key = SHA-256 isi blob + model + page range.
+
+    Entry disimpan sebagai JSON ter-kompres zlib (`<key>.json.z`). Jika total ukuran
+    melewati `max_bytes`, entry yang paling lama tidak dipakai (mtime) dihapus lebih dulu.
+    """
+
+    SUFFIX = ".json.z"
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._total_bytes: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(content_sha256: str, model: str, pages: Optional[str]) -> str:
+        """Key cache dari SHA-256 isi blob (hex) + model + page range."""
+        return hashlib.sha256(f"{content_sha256}:{model}:{pages or 'all'}".encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + self.SUFFIX)
+
+    def _scan_size(self) -> int:
+        if self._total_bytes is None:
+            total = 0
+            for root, _, files in os.walk(self.directory):
+                for f in files:
+                    if f.endswith(self.SUFFIX):
+                        total += os.path.getsize(os.path.join(root, f))
+            self._total_bytes = total
+        return self._total_bytes
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                layout = json.loads(zlib.decompress(f.read()).decode("utf-8"))
+            os.utime(path)  # tandai baru dipakai untuk eviction LRU
+        except (OSError, ValueError, zlib.error):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return layout
+
+    def put(self, key: str, layout: Dict[str, Any]):
+        data = zlib.compress(json.dumps(layout, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 6)
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        with self._lock:
+            total = self._scan_size()
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            self._total_bytes = total - previous + len(data)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Hapus entry terlama sampai total ukuran <= 90% dari max_bytes (dipanggil dengan lock)."""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for f in files:
+                if f.endswith(self.SUFFIX):
+                    p = os.path.join(root, f)
+                    st = os.stat(p)
+                    entries.append((st.st_mtime, st.st_size, p))
+        entries.sort()
+        target = int(self.max_bytes * 0.9)
+        for _, size, p in entries:
+            if self._total_bytes <= target:
+                break
+            try:
+                os.remove(p)
+            except OSError:
+                continue
+            self._total_bytes -= size
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "bytes_stored": self._scan_size(),
+            }
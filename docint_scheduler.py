@@ -0,0 +1,117 @@
+# docint_scheduler.py - Submit-all-then-poll untuk long-running operation Document Intelligence
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Tuple
+
+
+class AnalysisScheduler:
+    """Jalankan banyak analisis Document Intelligence bersamaan lintas dokumen.
+
+    `submit(begin)` memanggil `begin()` (mis. `begin_analyze_document`) begitu ada
+    slot (maks `max_in_flight` analisis berjalan), lalu langsung mengembalikan
+    Future. Satu thread monitor mengecek `poller.done()` semua poller sekaligus dan
+    menyelesaikan Future begitu analisisnya selesai, dalam urutan apa pun. Slot
+    dilepas saat analisis selesai, sehingga total waktu satu batch mendekati waktu
+    dokumen paling lambat, bukan jumlah semuanya.
+    """
+
+    def __init__(self, max_in_flight: int = 16, poll_seconds: float = 0.5):
+        self.max_in_flight = max(1, max_in_flight)
+        self.poll_seconds = poll_seconds
+        self._cond = threading.Condition()
+        self._pending: List[Tuple[Any, Future, float]] = []
+        self._in_flight = 0
+        self._monitor_thread = None
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.max_in_flight_seen = 0
+        self.slot_wait_seconds = 0.0
+        self.analysis_seconds = 0.0
+
+    def submit(self, begin: Callable[[], Any]) -> Future:
+        """Mulai satu analisis (blok hanya jika slot penuh). Error `begin()` muncul di Future."""
+        future: Future = Future()
+        with self._cond:
+            started = time.perf_counter()
+            while self._in_flight >= self.max_in_flight:
+                self._cond.wait()
+            self.slot_wait_seconds += time.perf_counter() - started
+            self._in_flight += 1
+            self.submitted += 1
+            self.max_in_flight_seen = max(self.max_in_flight_seen, self._in_flight)
+
+        submitted_at = time.perf_counter()
+        try:
+            poller = begin()
+        except Exception as e:
+            self._release(1, failed=1)
+            future.set_exception(e)
+            return future
+
+        with self._cond:
+            self._pending.append((poller, future, submitted_at))
+            if self._monitor_thread is None:
+                self._monitor_thread = threading.Thread(target=self._monitor, name="docint-monitor", daemon=True)
+                self._monitor_thread.start()
+            self._cond.notify_all()
+        return future
+
+    def _release(self, count: int, completed: int = 0, failed: int = 0, seconds: float = 0.0):
+        with self._cond:
+            self._in_flight -= count
+            self.completed += completed
+            self.failed += failed
+            self.analysis_seconds += seconds
+            self._cond.notify_all()
+
+    def _monitor(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                pending = list(self._pending)
+
+            finished = [entry for entry in pending if entry[0].done()]
+            if not finished:
+                time.sleep(self.poll_seconds)
+                continue
+
+            with self._cond:
+                done_ids = {id(entry) for entry in finished}
+                self._pending = [entry for entry in self._pending if id(entry) not in done_ids]
+
+            completed, failed, seconds = 0, 0, 0.0
+            results = []
+            for poller, future, submitted_at in finished:
+                elapsed = time.perf_counter() - submitted_at
+                try:
+                    results.append((future, poller.result(), None))
+                    completed += 1
+                    seconds += elapsed
+                except Exception as e:
+                    results.append((future, None, e))
+                    failed += 1
+                future.elapsed = elapsed
+            # Slot dilepas sebelum callback Future jalan supaya submitter bisa langsung lanjut
+            self._release(len(finished), completed, failed, seconds)
+            for future, result, error in results:
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "max_in_flight": self.max_in_flight,
+                "in_flight": self._in_flight,
+                "max_in_flight_seen": self.max_in_flight_seen,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "avg_analysis_seconds": round(self.analysis_seconds / self.completed, 3) if self.completed else 0.0,
+                "slot_wait_seconds": round(self.slot_wait_seconds, 3),
+            }
@@ -3,24 +3,23 @@ from azure.storage.blob import BlobServiceClient, ContentSettings
 from azure.search.documents import SearchClient
 from azure.core.credentials import AzureKeyCredential
 import os
-from typing import List, Dict, Any, Optional
+from typing import Callable, List, Dict, Any, Optional, Set
 import json
 from internal_assistant_core import blob_container, settings
+from index_jobs import IndexJobManager
+from blob_watcher import BlobWatcher, WatchState
+from local_extractors import detect_mime
+from search_schema import (
+    FIELDS_CONTENT_TYPE, FIELDS_PREFIX, FIELDS_SOURCE, iter_documents, prefix_filter, source_filter,
+    source_prefix_filter,
+)
+
+# Worker pool untuk indexing di background (job tetap jalan walaupun client disconnect)
+index_jobs = IndexJobManager(max_concurrent_jobs=settings.index_max_concurrent_jobs)
 
 def _detect_mime(path: str) -> str:
-    """Detect MIME type from file extension"""
-    ext = (os.path.splitext(path)[1] or "").lower()
-    return {
-        ".pdf": "application/pdf",
-        ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-        ".doc": "application/msword",
-        ".txt": "text/plain",
-        ".pptx": "application/vnd.openxmlformats-officedocument.presentationml.presentation",
-        ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        ".jpg": "image/jpeg",
-        ".jpeg": "image/jpeg",
-        ".png": "image/png",
-    }.get(ext, "application/octet-stream")
+    """Detect MIME type from file extension (same table used to pick the indexing extractor)"""
+    return detect_mime(path)
 
 # ==============================================
 # UPLOAD & INDEXING FUNCTIONS
@@ -107,13 +106,15 @@ def batch_upload_files(files_data: List[Dict[str, Any]], prefix: str) -> Dict[st
     results["message"] = f"Upload completed: {results['successful_uploads']} successful, {results['failed_uploads']} failed"
     return results
 
-def process_and_index_documents(prefix: str = "sop/") -> Dict[str, Any]:
-    """Process and index documents from blob storage to Azure AI Search"""
+def process_and_index_documents(prefix: str = "sop/", force: bool = False, resume: Optional[str] = None,
+                                on_progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """Process and index new or changed documents from blob storage to Azure AI Search (force=True reprocesses all,
+    resume=<run_id>|"latest" continues an interrupted run)"""
     try:
         # Import RAG module for indexing
         from rag_modul import process_and_index_docs
         
-        index_report = process_and_index_docs(prefix=prefix)
+        index_report = process_and_index_docs(prefix=prefix, force=force, resume=resume, on_progress=on_progress)
         
         return {
             "success": True,
@@ -129,11 +130,157 @@ def process_and_index_documents(prefix: str = "sop/") -> Dict[str, Any]:
             "message": f"Failed to index documents from {prefix}: {str(e)}"
         }
 
-def upload_and_index_complete(files_data: List[Dict[str, Any]], prefix: str) -> Dict[str, Any]:
-    """Complete upload and index workflow"""
+def submit_index_job(prefix: str = "sop/", force: bool = False, resume: Optional[str] = None) -> Dict[str, Any]:
+    """Queue an indexing run in the background and return the job immediately (poll with get_index_job)"""
+    return index_jobs.submit(
+        "index",
+        process_and_index_documents,
+        {"prefix": prefix, "force": force, "resume": resume},
+    )
+
+def get_index_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Status, progress (blobs done/total, chunks written, current stage, ETA) and result of an indexing job"""
+    return index_jobs.get(job_id)
+
+def list_index_jobs(limit: int = 20) -> Dict[str, Any]:
+    """List recent indexing jobs (newest first, without full results)"""
+    return {
+        "success": True,
+        "max_concurrent_jobs": index_jobs.max_concurrent_jobs,
+        "jobs": index_jobs.list_jobs(limit),
+    }
+
+def _watch_index_blobs(prefix: str, blobs: List[Any]) -> Set[str]:
+    """Index only the blobs the watcher found new or changed; returns the blobs that finished.
+    Runs as an index job so it shares the job manager's concurrency cap with user-submitted runs"""
+    from rag_modul import process_and_index_docs, index_run_log
+    completed: Set[str] = set()
+
+    def run(prefix: str, blob_count: int,
+            on_progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        report = process_and_index_docs(prefix=prefix, blobs=blobs, on_progress=on_progress)
+        # Only indexed/unchanged/skipped blobs; extraction errors stay out and are retried next scan
+        completed.update(index_run_log.completed_blobs(report["run_id"]))
+        return {
+            "success": True,
+            "prefix": prefix,
+            "index_report": report,
+            "completed_blobs": len(completed),
+        }
+
+    # Job record only keeps counts: a first scan can list tens of thousands of blobs
+    job = index_jobs.submit("watch", run, {"prefix": prefix, "blob_count": len(blobs)})
+    if job.get("coalesced"):
+        raise RuntimeError(f"watch job {job['job_id']} for {prefix} is already queued")
+    job_id = job["job_id"]
+    job = index_jobs.wait(job_id)
+    if job is None:
+        raise RuntimeError(f"watch job {job_id} for {prefix} is no longer tracked by the job manager")
+    if job["status"] != "completed":
+        raise RuntimeError(job.get("error") or f"watch job {job_id} {job['status']}")
+    return completed
+
+def _watch_remove_blob(blob_name: str) -> bool:
+    """Remove the indexed chunks of a blob that disappeared from the container"""
+    from rag_modul import remove_indexed_document
+    return not remove_indexed_document(blob_name)["failed"]
+
+# Background watcher for blobs dropped straight into the container (started by the app if enabled)
+blob_watcher = BlobWatcher(
+    blob_container,
+    WatchState(os.path.join(settings.index_state_dir, "watcher.sqlite")),
+    prefixes=[p.strip() for p in settings.index_watch_prefixes.split(",") if p.strip()],
+    interval=settings.index_watch_interval_seconds,
+    index_blobs=_watch_index_blobs,
+    remove_blob=_watch_remove_blob,
+    page_size=settings.index_watch_page_size,
+)
+
+def start_blob_watcher() -> Dict[str, Any]:
+    """Start the blob-prefix watcher daemon (no-op if already running)"""
+    blob_watcher.start()
+    return get_blob_watcher_status()
+
+def stop_blob_watcher() -> Dict[str, Any]:
+    """Stop the watcher after its current scan"""
+    blob_watcher.stop()
+    return get_blob_watcher_status()
+
+def get_blob_watcher_status() -> Dict[str, Any]:
+    """Watched prefixes, interval, watermarks and the result of the last scan per prefix"""
+    return dict(blob_watcher.status(), success=True)
+
+def scan_blob_prefixes(wait: bool = False) -> Dict[str, Any]:
+    """Scan watched prefixes now: wait=True scans inline and returns the results, otherwise wakes the watcher"""
+    if wait:
+        return {"success": True, "scans": blob_watcher.scan_once()}
+    blob_watcher.trigger()
+    return {"success": True, "triggered": True, "running": blob_watcher.status()["running"]}
+
+def start_dead_letter_retry() -> Dict[str, Any]:
+    """Start the worker that retries chunks from the dead-letter store with backoff (no-op if already running)"""
+    from rag_modul import dead_letter_worker
+    dead_letter_worker.start()
+    return get_dead_letter_status()
+
+def get_dead_letter_status(source: Optional[str] = None, limit: int = 100) -> Dict[str, Any]:
+    """Chunks waiting for retry and permanently failed chunks per document, plus the retry worker state"""
+    from rag_modul import dead_letters, dead_letter_worker
+    return dict(dead_letters.summary(source, limit), success=True, worker=dead_letter_worker.status())
+
+def retry_dead_letters(source: Optional[str] = None, wait: bool = False) -> Dict[str, Any]:
+    """Requeue permanently failed chunks (all or one document) and retry now: wait=True drains inline"""
+    from rag_modul import dead_letters, dead_letter_worker
+    requeued = dead_letters.requeue(source)
+    if wait:
+        return {"success": True, "requeued": requeued, "drain": dead_letter_worker.drain_once()}
+    dead_letter_worker.trigger()
+    return {"success": True, "requeued": requeued, "triggered": True,
+            "running": dead_letter_worker.status()["running"]}
+
+def build_document_summaries(prefix: str = "", force: bool = False,
+                             on_progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """Create summary/table-of-contents records for documents indexed before the summary tier existed"""
+    try:
+        from rag_modul import backfill_document_summaries
+        report = backfill_document_summaries(prefix, force=force, on_progress=on_progress)
+        return dict(report, success=not report["failed"],
+                    message=f"Built {report['built']} document summaries ({report['existing']} already present)")
+    except Exception as e:
+        return {"success": False, "prefix": prefix, "error": str(e),
+                "message": f"Failed to build document summaries: {str(e)}"}
+
+def submit_summary_backfill(prefix: str = "", force: bool = False) -> Dict[str, Any]:
+    """Queue the summary backfill in the background and return the job immediately (poll with get_index_job)"""
+    return index_jobs.submit("summaries", build_document_summaries, {"prefix": prefix, "force": force})
+
+def get_document_summary(blob_name: str) -> Optional[Dict[str, Any]]:
+    """Index-time summary record (title, opening text, headings, table of contents) of one document"""
+    from rag_modul import doc_summaries
+    return doc_summaries.get(blob_name)
+
+def get_document_tables(blob_name: str, table_id: Optional[int] = None) -> Dict[str, Any]:
+    """Tables extracted from one document (headers and row counts, or all rows of one table)"""
+    from rag_modul import table_store
+    if table_id is not None:
+        table = table_store.get_table(blob_name, table_id)
+        return {"success": table is not None, "table": table}
+    return {"success": True, "blob_name": blob_name, "tables": table_store.list_tables(blob_name)}
+
+def search_table_rows(query: str, prefix: str = "", max_rows: int = 20) -> Dict[str, Any]:
+    """Table rows matching the query words, grouped per table (what table-intent questions send to the LLM)"""
+    import re
+    from rag_modul import table_store
+    terms = re.findall(r"\w+", query.lower())
+    return {"success": True, "query": query,
+            "tables": table_store.search_rows(terms, max_rows=max_rows, prefix=prefix or None)}
+
+def upload_and_index_complete(files_data: List[Dict[str, Any]], prefix: str, wait: bool = False) -> Dict[str, Any]:
+    """Complete upload and index workflow (indexing runs as a background job unless wait=True)"""
     results = {
         "upload_results": None,
         "index_results": None,
+        "index_job": None,
         "overall_success": False,
         "message": ""
     }
@@ -144,7 +291,12 @@ def upload_and_index_complete(files_data: List[Dict[str, Any]], prefix: str) ->
         results["upload_results"] = upload_results
         
         # Step 2: Index documents (only if some files were uploaded successfully)
-        if upload_results["successful_uploads"] > 0:
+        if upload_results["successful_uploads"] > 0 and not wait:
+            job = submit_index_job(prefix)
+            results["index_job"] = job
+            results["overall_success"] = True
+            results["message"] = f"Upload: {upload_results['message']}. Index: job {job['job_id']} {job['status']}"
+        elif upload_results["successful_uploads"] > 0:
             index_results = process_and_index_documents(prefix)
             results["index_results"] = index_results
             
@@ -223,10 +375,20 @@ def search_documents_in_index(blob_name: str) -> List[str]:
             index_name=settings.search_index,
             credential=AzureKeyCredential(settings.search_key)
         )
-        
-        # Try multiple possible field names for source/filename
+
+        # Managed schema: one filter on the typed `source` field, paged without a top cap
+        try:
+            document_ids = [
+                result["id"]
+                for result in search_client.search(search_text="*", filter=source_filter(blob_name), select=["id"])
+            ]
+            print(f"Found {len(document_ids)} indexed chunks for blob: {blob_name}")
+            return document_ids
+        except Exception as filter_error:
+            print(f"Source filter failed (index not migrated to the managed schema?): {str(filter_error)}")
+
+        # Legacy index: try multiple possible field names for source/filename
         possible_filters = [
-            f"source eq '{blob_name}'",
             f"filename eq '{blob_name}'",
             f"sourcefile eq '{blob_name}'",
             f"document_name eq '{blob_name}'",
@@ -376,6 +538,11 @@ def delete_document_complete(blob_name: str) -> Dict[str, Any]:
         # Step 3: Delete from blob storage
         blob_deleted = delete_document_from_blob(blob_name)
         result["blob_deleted"] = blob_deleted
+
+        # Forget the blob in the incremental-indexing manifest
+        if blob_deleted:
+            from rag_modul import forget_indexed_document
+            result["requeued_for_reindex"] = forget_indexed_document(blob_name)
         
         # Step 4: Determine overall success
         if blob_deleted and (deleted_count == len(document_ids) or len(document_ids) == 0):
@@ -471,6 +638,192 @@ def inspect_search_index_sample(blob_name: Optional[str] = None) -> Dict[str, An
     except Exception as e:
         return {"error": f"Failed to inspect index: {str(e)}"}
 
+def list_index_runs(limit: int = 20) -> Dict[str, Any]:
+    """List recent indexing runs with their checkpoint status (for resuming interrupted runs)"""
+    try:
+        from rag_modul import index_run_log
+        runs = index_run_log.list_runs(limit)
+        return {
+            "success": True,
+            "runs": [dict(run, summary=index_run_log.summary(run["run_id"])) for run in runs],
+        }
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+# Upper bound for distinct facet values returned per field (one entry per blob for `source`)
+_FACET_LIMIT = 100000
+
+def _facet_counts(search_client: SearchClient, field: str, filter_expr: Optional[str] = None) -> Dict[str, int]:
+    """Distinct values of a facetable field with their chunk counts (no documents returned)"""
+    results = search_client.search(
+        search_text="*",
+        filter=filter_expr,
+        facets=[f"{field},count:{_FACET_LIMIT}"],
+        top=0,
+    )
+    return {f["value"]: f["count"] for f in (results.get_facets() or {}).get(field, [])}
+
+def get_search_index_stats(prefix: str = "") -> Dict[str, Any]:
+    """Chunk counts per document, content type and folder from facets on the managed index schema"""
+    try:
+        search_client = SearchClient(
+            endpoint=settings.search_endpoint,
+            index_name=settings.search_index,
+            credential=AzureKeyCredential(settings.search_key)
+        )
+        filter_expr = prefix_filter(prefix) if prefix else None
+        total = search_client.search(search_text="*", filter=filter_expr, include_total_count=True, top=0).get_count()
+        sources = _facet_counts(search_client, FIELDS_SOURCE, filter_expr)
+        largest = sorted(sources.items(), key=lambda item: item[1], reverse=True)[:20]
+        return {
+            "success": True,
+            "index": settings.search_index,
+            "prefix": prefix,
+            "total_chunks": total or 0,
+            "documents": len(sources),
+            "by_content_type": _facet_counts(search_client, FIELDS_CONTENT_TYPE, filter_expr),
+            "by_prefix": _facet_counts(search_client, FIELDS_PREFIX, filter_expr),
+            "largest_documents": [{"source": source, "chunks": count} for source, count in largest],
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "index": settings.search_index,
+            "prefix": prefix,
+            "error": str(e),
+            "message": f"Failed to read index stats (index not migrated to the managed schema?): {str(e)}"
+        }
+
+def migrate_search_index(target_index: str, compression: Optional[str] = None,
+                         on_progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """Copy every chunk of the current index into `target_index` with the managed schema (typed source/prefix/
+    content_type/chunk_index/doc_hash fields). Point AZURE_SEARCH_INDEX_NAME at the target afterwards."""
+    try:
+        from search_migration import migrate_index
+        from rag_modul import index_manifest
+        from internal_assistant_core import invalidate_search_index_fields, search_upload_limiter
+
+        report = migrate_index(
+            settings.search_endpoint,
+            settings.search_key,
+            settings.search_index,
+            target_index,
+            compression=compression or settings.search_vector_compression,
+            oversampling=settings.search_vector_oversampling,
+            doc_hash=lambda source: (index_manifest.get(source) or {}).get("content_md5"),
+            upload=search_upload_limiter.call,
+            on_progress=on_progress,
+        )
+        # Fields added by the migration are picked up by the writer without a restart
+        invalidate_search_index_fields()
+        return report
+    except Exception as e:
+        return {
+            "success": False,
+            "source_index": settings.search_index,
+            "target_index": target_index,
+            "error": str(e),
+            "message": f"Failed to migrate index to {target_index}: {str(e)}"
+        }
+
+def submit_index_migration(target_index: str, compression: Optional[str] = None) -> Dict[str, Any]:
+    """Queue an index migration in the background and return the job immediately (poll with get_index_job)"""
+    return index_jobs.submit(
+        "migrate",
+        migrate_search_index,
+        {"target_index": target_index, "compression": compression},
+    )
+
+def sweep_orphaned_chunks(prefix: str = "", dry_run: bool = False) -> Dict[str, Any]:
+    """Find (and delete) indexed chunks whose source blob no longer exists in blob storage"""
+    result = {
+        "prefix": prefix,
+        "dry_run": dry_run,
+        "chunks_scanned": 0,
+        "orphaned_sources": [],
+        "orphaned_chunks": 0,
+        "deleted": 0,
+        "failed": [],
+    }
+
+    try:
+        search_client = SearchClient(
+            endpoint=settings.search_endpoint,
+            index_name=settings.search_index,
+            credential=AzureKeyCredential(settings.search_key)
+        )
+
+        # One paginated listing of the container, no per-blob property calls
+        existing_blobs = {b.name for b in blob_container.list_blobs(name_starts_with=prefix or None)}
+
+        orphaned: Dict[str, List[str]] = {}
+        try:
+            # Managed schema: distinct sources from a facet, then one filter per missing source.
+            # Same prefix rule as the blob listing (plain name prefix, not only whole folders)
+            sources = _facet_counts(search_client, FIELDS_SOURCE, source_prefix_filter(prefix) if prefix else None)
+            result["chunks_scanned"] = sum(sources.values())
+            for source in sources:
+                if source.startswith(prefix) and source not in existing_blobs:
+                    orphaned[source] = [
+                        doc["id"]
+                        for doc in search_client.search(search_text="*", filter=source_filter(source), select=["id"])
+                    ]
+        except Exception as facet_error:
+            # Legacy index: scan every chunk's metadata JSON, partitioned by ID so that
+            # indexes over the 100k paging limit are read completely
+            print(f"Source facet failed (index not migrated to the managed schema?): {str(facet_error)}")
+            orphaned.clear()
+            result["chunks_scanned"] = 0
+            for doc in iter_documents(search_client, select=["id", "metadata"]):
+                result["chunks_scanned"] += 1
+                try:
+                    source = json.loads(doc.get("metadata") or "{}").get("source")
+                except ValueError:
+                    source = None
+                if not source or not source.startswith(prefix) or source in existing_blobs:
+                    continue
+                orphaned.setdefault(source, []).append(doc["id"])
+
+        orphan_ids = [doc_id for ids in orphaned.values() for doc_id in ids]
+        result["orphaned_sources"] = sorted(orphaned.keys())
+        result["orphaned_chunks"] = len(orphan_ids)
+
+        if not dry_run:
+            # Azure AI Search accepts up to 1000 actions per batch
+            for i in range(0, len(orphan_ids), 1000):
+                batch = orphan_ids[i:i + 1000]
+                try:
+                    for r in search_client.delete_documents(documents=[{"id": doc_id} for doc_id in batch]):
+                        if r.succeeded:
+                            result["deleted"] += 1
+                        else:
+                            result["failed"].append(r.key)
+                except Exception as batch_error:
+                    print(f"Error deleting orphaned chunks: {str(batch_error)}")
+                    result["failed"].extend(batch)
+
+            # Like remove_indexed_document: keep the manifest entry of a source whose chunks were
+            # not all deleted, so the next sweep can still reconcile it
+            from rag_modul import forget_indexed_document
+            failed_ids = set(result["failed"])
+            requeued = set()
+            for source, ids in orphaned.items():
+                if failed_ids.intersection(ids):
+                    continue
+                requeued.update(forget_indexed_document(source))
+            result["requeued_for_reindex"] = sorted(requeued - set(orphaned))
+
+        result["message"] = (
+            f"Found {len(orphan_ids)} orphaned chunks from {len(orphaned)} missing blobs"
+            + ("" if dry_run else f", deleted {result['deleted']}")
+        )
+        return result
+
+    except Exception as e:
+        result["error"] = str(e)
+        result["message"] = f"Failed to sweep orphaned chunks: {str(e)}"
+        return result
+
 def rebuild_search_index(prefix: str = "sop/") -> Dict[str, Any]:
     """Rebuild search index from blob storage - USE WITH CAUTION"""
     try:
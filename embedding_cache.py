@@ -0,0 +1,185 @@
+# embedding_cache.py - Persistent embedding cache (LRU memory + SQLite disk tier)
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+
+class CachedEmbeddings(Embeddings):
+    """Wrapper caching untuk AzureOpenAIEmbeddings, dipakai untuk indexing maupun query.
+
+    Key = SHA-256(deployment + text). Tier 1 adalah LRU in-memory, tier 2 tabel SQLite
+    yang menyimpan vektor sebagai float32 ter-pack. Hanya teks yang miss diteruskan
+    ke model (dalam satu panggilan embed_documents), lewat `limiter` jika diberikan
+    (rate limit RPM/TPM deployment, retry otomatis untuk response 429).
+    `query_limiter` (opsional) dipakai `embed_query` supaya pertanyaan interaktif punya
+    kuota sendiri dan tidak ikut antri/pause di belakang indexing massal.
+    """
+
+    def __init__(self, inner: Embeddings, deployment: str, path: str, memory_items: int = 2000, limiter=None,
+                 query_limiter=None):
+        self.inner = inner
+        self.limiter = limiter
+        self.query_limiter = query_limiter
+        self.deployment = deployment
+        self.path = path
+        self.memory_items = max(0, memory_items)
+        self._memory: "OrderedDict[str, array]" = OrderedDict()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.upstream_requests = 0
+
+    @property
+    def chunk_size(self) -> int:
+        return getattr(self.inner, "chunk_size", 2048)
+
+    @property
+    def last_call_requests(self) -> int:
+        """Jumlah request ke model pada panggilan terakhir di thread ini (0 jika semua hit)."""
+        return getattr(self._local, "requests", 0)
+
+    # ---------- storage ----------
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.deployment}\x00{text}".encode("utf-8")).hexdigest()
+
+    def cache_key(self, text: str) -> str:
+        """Key cache untuk teks (dipakai untuk merujuk vektor chunk lain, mis. near-duplicate)."""
+        return self._key(text)
+
+    def _remember(self, key: str, vector: array):
+        """Simpan ke LRU memory (dipanggil dengan lock)."""
+        if not self.memory_items:
+            return
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, keys: List[str]) -> Dict[str, array]:
+        found: Dict[str, array] = {}
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+                    self.memory_hits += 1
+
+            pending = [k for k in dict.fromkeys(keys) if k not in found]
+            conn = self._connect()
+            # Batasi jumlah parameter per query SQLite
+            for i in range(0, len(pending), 500):
+                part = pending[i:i + 500]
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(part))})", part
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[key] = vector
+                    self._remember(key, vector)
+                    self.disk_hits += 1
+        return found
+
+    def _store(self, items: Dict[str, List[float]]):
+        with self._lock:
+            packed = {key: array("f", vector) for key, vector in items.items()}
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, vector.tobytes()) for key, vector in packed.items()],
+            )
+            conn.commit()
+            for key, vector in packed.items():
+                self._remember(key, vector)
+
+    def cached_vectors(self, keys: List[str]) -> Dict[str, List[float]]:
+        """Vektor yang sudah ada di cache untuk key tertentu, tanpa memanggil model."""
+        return {key: vector.tolist() for key, vector in self._lookup(keys).items()}
+
+    def _upstream(self, call, texts: List[str], requests: int, limiter=None):
+        limiter = limiter or self.limiter
+        if limiter is None:
+            return call()
+        # Estimasi token untuk bucket TPM (~4 karakter per token)
+        tokens = sum(len(t) for t in texts) // 4 + len(texts)
+        return limiter.call(call, tokens=tokens, requests=requests)
+
+    # ---------- Embeddings interface ----------
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(t) for t in texts]
+        found = self._lookup(keys)
+
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+
+        self._local.requests = 0
+        if missing:
+            requests = math.ceil(len(missing) / max(self.chunk_size, 1))
+            vectors = self._upstream(lambda: self.inner.embed_documents(list(missing.values())),
+                                     list(missing.values()), requests)
+            self._local.requests = requests
+            with self._lock:
+                self.misses += len(missing)
+                self.upstream_requests += requests
+            fresh = dict(zip(missing.keys(), vectors))
+            self._store(fresh)
+            found.update({key: array("f", vector) for key, vector in fresh.items()})
+
+        return [found[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        found = self._lookup([key])
+        self._local.requests = 0
+        if key in found:
+            return found[key].tolist()
+
+        vector = self._upstream(lambda: self.inner.embed_query(text), [text], 1, self.query_limiter)
+        self._local.requests = 1
+        with self._lock:
+            self.misses += 1
+            self.upstream_requests += 1
+        self._store({key: vector})
+        return list(vector)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            row = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+            ).fetchone()
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "upstream_requests": self.upstream_requests,
+                "vectors_stored": row[0],
+                "bytes_stored": row[1],
+                "memory_items": len(self._memory),
+            }
@@ -0,0 +1,207 @@
+# index_checkpoint.py - Checkpoint run indexing supaya bisa di-resume setelah proses mati (SQLite)
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set
+
+
+class IndexRunLog:
+    """Catatan run indexing: status per blob + counter, disimpan setiap checkpoint.
+
+    Satu run logis bisa terdiri dari beberapa attempt (restart setelah deploy/OOM).
+    Counter & elapsed attempt sebelumnya diakumulasi di `base_*`, sedangkan status
+    per blob menentukan blob mana yang sudah selesai dan tidak perlu diproses lagi.
+    """
+
+    # Status blob yang tidak perlu diproses ulang saat resume
+    # ("partial": chunk yang gagal sudah di dead-letter store dan di-retry terpisah)
+    COMPLETED_STATUSES = ("indexed", "partial", "unchanged", "skipped")
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS index_runs (
+                    run_id        TEXT PRIMARY KEY,
+                    prefix        TEXT NOT NULL,
+                    force         INTEGER NOT NULL,
+                    status        TEXT NOT NULL,
+                    attempts      INTEGER NOT NULL,
+                    created_at    TEXT NOT NULL,
+                    updated_at    TEXT NOT NULL,
+                    base_counters TEXT NOT NULL,
+                    counters      TEXT NOT NULL,
+                    base_elapsed  REAL NOT NULL,
+                    elapsed       REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS index_run_blobs (
+                    run_id     TEXT NOT NULL,
+                    blob_name  TEXT NOT NULL,
+                    status     TEXT NOT NULL,
+                    chunks     INTEGER NOT NULL,
+                    error      TEXT,
+                    updated_at TEXT NOT NULL,
+                    PRIMARY KEY (run_id, blob_name)
+                );
+                """
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    @staticmethod
+    def _row_to_dict(row) -> Dict[str, Any]:
+        return {
+            "run_id": row[0],
+            "prefix": row[1],
+            "force": bool(row[2]),
+            "status": row[3],
+            "attempts": row[4],
+            "created_at": row[5],
+            "updated_at": row[6],
+            "base_counters": json.loads(row[7]),
+            "counters": json.loads(row[8]),
+            "base_elapsed": row[9],
+            "elapsed": row[10],
+        }
+
+    def get(self, run_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connect().execute("SELECT * FROM index_runs WHERE run_id = ?", (run_id,)).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def latest_incomplete(self, prefix: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Run terakhir yang belum selesai (opsional: dengan prefix yang sama)."""
+        query = "SELECT * FROM index_runs WHERE status != 'completed'"
+        params: List[Any] = []
+        if prefix is not None:
+            query += " AND prefix = ?"
+            params.append(prefix)
+        query += " ORDER BY updated_at DESC LIMIT 1"
+        with self._lock:
+            row = self._connect().execute(query, params).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def list_runs(self, limit: int = 20) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT * FROM index_runs ORDER BY updated_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [self._row_to_dict(r) for r in rows]
+
+    def start(self, prefix: str, force: bool, resume: Optional[str] = None) -> Dict[str, Any]:
+        """Mulai run baru, atau lanjutkan run yang belum selesai.
+
+        `resume`: run ID, atau "latest" untuk run terakhir yang belum selesai dengan prefix yang sama.
+        Return row run (dengan `resumed` True/False).
+        """
+        previous = None
+        if resume == "latest":
+            previous = self.latest_incomplete(prefix)
+        elif resume:
+            previous = self.get(resume)
+            if previous and previous["status"] == "completed":
+                print(f"Run {resume} already completed, starting a new run")
+                previous = None
+
+        now = self._now()
+        with self._lock:
+            conn = self._connect()
+            if previous:
+                base = dict(previous["base_counters"])
+                for key, value in previous["counters"].items():
+                    base[key] = base.get(key, 0) + value
+                conn.execute(
+                    "UPDATE index_runs SET status = 'running', attempts = attempts + 1, updated_at = ?, "
+                    "base_counters = ?, counters = '{}', base_elapsed = base_elapsed + elapsed, elapsed = 0 "
+                    "WHERE run_id = ?",
+                    (now, json.dumps(base), previous["run_id"]),
+                )
+                run_id = previous["run_id"]
+            else:
+                run_id = uuid.uuid4().hex
+                conn.execute(
+                    "INSERT INTO index_runs VALUES (?, ?, ?, 'running', 1, ?, ?, '{}', '{}', 0, 0)",
+                    (run_id, prefix, int(force), now, now),
+                )
+            conn.commit()
+            row = conn.execute("SELECT * FROM index_runs WHERE run_id = ?", (run_id,)).fetchone()
+        run = self._row_to_dict(row)
+        run["resumed"] = previous is not None
+        return run
+
+    def record_blob(self, run_id: str, blob_name: str, status: str, chunks: int = 0, error: Optional[str] = None):
+        """Checkpoint per blob (status terakhir menang, jadi blob yang di-retry ter-update)."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO index_run_blobs (run_id, blob_name, status, chunks, error, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (run_id, blob_name, status, chunks, error, self._now()),
+            )
+            conn.commit()
+
+    def completed_blobs(self, run_id: str) -> Set[str]:
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT blob_name FROM index_run_blobs WHERE run_id = ? "
+                f"AND status IN ({','.join('?' * len(self.COMPLETED_STATUSES))})",
+                (run_id, *self.COMPLETED_STATUSES),
+            ).fetchall()
+        return {r[0] for r in rows}
+
+    def checkpoint(self, run_id: str, counters: Dict[str, float], elapsed: float):
+        """Simpan counter attempt sekarang (dipanggil setelah setiap batch chunk ter-upload)."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "UPDATE index_runs SET counters = ?, elapsed = ?, updated_at = ? WHERE run_id = ?",
+                (json.dumps(counters), elapsed, self._now(), run_id),
+            )
+            conn.commit()
+
+    def finish(self, run_id: str, status: str = "completed"):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("UPDATE index_runs SET status = ?, updated_at = ? WHERE run_id = ?",
+                         (status, self._now(), run_id))
+            conn.commit()
+
+    def summary(self, run_id: str) -> Dict[str, Any]:
+        """Ringkasan kumulatif run logis: status blob + counter & elapsed semua attempt."""
+        run = self.get(run_id)
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT blob_name, status, chunks, error FROM index_run_blobs WHERE run_id = ?", (run_id,)
+            ).fetchall()
+        by_status: Dict[str, int] = {}
+        for _, status, _, _ in rows:
+            by_status[status] = by_status.get(status, 0) + 1
+        counters = dict(run["base_counters"])
+        for key, value in run["counters"].items():
+            counters[key] = counters.get(key, 0) + value
+        return {
+            "run_id": run_id,
+            "attempts": run["attempts"],
+            "blobs": by_status,
+            "total_chunks": sum(chunks for _, status, chunks, _ in rows if status in ("indexed", "partial")),
+            "errors": [f"{name}: {error}" for name, status, _, error in rows if status == "error"],
+            "counters": counters,
+            "elapsed_seconds": round(run["base_elapsed"] + run["elapsed"], 3),
+        }
@@ -0,0 +1,58 @@
+from index_checkpoint import IndexRunLog
+
+
+def test_resume_skips_completed_blobs_and_retries_errors(tmp_path):
+    run_log = IndexRunLog(str(tmp_path / "runs.sqlite"))
+    run_id = run_log.start("sop/", False)["run_id"]
+    run_log.record_blob(run_id, "sop/a.pdf", "indexed", 4)
+    run_log.record_blob(run_id, "sop/b.pdf", "partial", 2, "1 chunks queued for retry")
+    run_log.record_blob(run_id, "sop/c.pdf", "unchanged")
+    run_log.record_blob(run_id, "sop/empty.pdf", "skipped", error="No content extracted")
+    run_log.record_blob(run_id, "sop/timeout.pdf", "error", error="Document Intelligence timeout")
+    run_log.checkpoint(run_id, {"chunks_written": 6}, 12.5)
+
+    resumed = run_log.start("sop/", False, resume="latest")
+
+    assert resumed["run_id"] == run_id
+    assert resumed["resumed"] is True
+    assert resumed["attempts"] == 2
+    # Blob dengan error (mis. timeout / 429 / 5xx) tidak dianggap selesai, jadi diproses ulang
+    assert run_log.completed_blobs(run_id) == {"sop/a.pdf", "sop/b.pdf", "sop/c.pdf", "sop/empty.pdf"}
+
+
+def test_retried_blob_status_replaces_error(tmp_path):
+    run_log = IndexRunLog(str(tmp_path / "runs.sqlite"))
+    run_id = run_log.start("sop/", False)["run_id"]
+    run_log.record_blob(run_id, "sop/timeout.pdf", "error", error="503 Service Unavailable")
+    run_log.start("sop/", False, resume=run_id)
+    run_log.record_blob(run_id, "sop/timeout.pdf", "indexed", 3)
+
+    summary = run_log.summary(run_id)
+
+    assert "sop/timeout.pdf" in run_log.completed_blobs(run_id)
+    assert summary["blobs"] == {"indexed": 1}
+    assert summary["errors"] == []
+    assert summary["total_chunks"] == 3
+
+
+def test_counters_accumulate_across_attempts(tmp_path):
+    run_log = IndexRunLog(str(tmp_path / "runs.sqlite"))
+    run_id = run_log.start("sop/", False)["run_id"]
+    run_log.checkpoint(run_id, {"chunks_written": 10}, 5.0)
+    run_log.start("sop/", False, resume="latest")
+    run_log.checkpoint(run_id, {"chunks_written": 7}, 2.0)
+
+    summary = run_log.summary(run_id)
+
+    assert summary["attempts"] == 2
+    assert summary["counters"] == {"chunks_written": 17}
+    assert summary["elapsed_seconds"] == 7.0
+
+
+def test_completed_run_is_not_resumed(tmp_path):
+    run_log = IndexRunLog(str(tmp_path / "runs.sqlite"))
+    run_id = run_log.start("sop/", False)["run_id"]
+    run_log.finish(run_id)
+
+    assert run_log.latest_incomplete("sop/") is None
+    assert run_log.start("sop/", False, resume=run_id)["run_id"] != run_id
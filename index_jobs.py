@@ -0,0 +1,111 @@
+# index_jobs.py - Background job indexing dengan status & progress yang bisa di-poll
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+
+class IndexJobManager:
+    """Jalankan job indexing di worker pool (maks `max_concurrent_jobs` bersamaan).
+
+    `submit` langsung mengembalikan job (dengan `job_id`); job tetap jalan walaupun
+    client HTTP sudah disconnect. `func` dipanggil dengan `on_progress=callback`
+    sehingga snapshot progress terakhir tersimpan di job dan bisa di-poll.
+    Riwayat job disimpan in-memory (maks `max_history` job terakhir).
+    """
+
+    def __init__(self, max_concurrent_jobs: int = 1, max_history: int = 200):
+        self.max_concurrent_jobs = max(1, max_concurrent_jobs)
+        self.max_history = max_history
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent_jobs, thread_name_prefix="index-job")
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    def submit(self, kind: str, func: Callable[..., Dict[str, Any]], params: Dict[str, Any]) -> Dict[str, Any]:
+        """Antrikan job. Job identik yang masih `queued` dipakai ulang (upload beruntun digabung)."""
+        with self._lock:
+            for job in self._jobs.values():
+                if job["status"] == "queued" and job["kind"] == kind and job["params"] == params:
+                    return dict(job, coalesced=True)
+
+            job_id = uuid.uuid4().hex
+            job = {
+                "job_id": job_id,
+                "kind": kind,
+                "params": dict(params),
+                "status": "queued",
+                "submitted_at": self._now(),
+                "started_at": None,
+                "finished_at": None,
+                "progress": None,
+                "result": None,
+                "error": None,
+            }
+            self._jobs[job_id] = job
+            self._trim()
+            submitted = dict(job)
+            self._futures[job_id] = self._executor.submit(self._run, job_id, func, params)
+        return submitted
+
+    def _run(self, job_id: str, func: Callable[..., Dict[str, Any]], params: Dict[str, Any]):
+        self._update(job_id, status="running", started_at=self._now())
+        try:
+            result = func(on_progress=lambda snapshot: self._update(job_id, progress=snapshot), **params)
+        except Exception as e:
+            print(f"Index job {job_id} failed: {e}")
+            self._update(job_id, status="failed", error=str(e), finished_at=self._now())
+            return
+        # Fungsi yang menangkap error sendiri mengembalikan {"success": False, ...}
+        failed = isinstance(result, dict) and result.get("success") is False
+        self._update(
+            job_id,
+            status="failed" if failed else "completed",
+            result=result,
+            error=result.get("error") if failed else None,
+            finished_at=self._now(),
+        )
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Tunggu job selesai (untuk caller background seperti watcher yang butuh hasilnya),
+        lalu return job beserta result-nya."""
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None:
+            future.result(timeout)
+        return self.get(job_id)
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+
+    def _trim(self):
+        """Buang job selesai yang paling lama jika riwayat melebihi batas (dipanggil dengan lock)."""
+        finished = [jid for jid, job in self._jobs.items() if job["status"] in ("completed", "failed")]
+        while len(self._jobs) > self.max_history and finished:
+            job_id = finished.pop(0)
+            self._jobs.pop(job_id, None)
+            self._futures.pop(job_id, None)
+
+    def get(self, job_id: str, include_result: bool = True) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job = dict(job)
+        if not include_result:
+            job.pop("result", None)
+        return job
+
+    def list_jobs(self, limit: int = 20) -> List[Dict[str, Any]]:
+        with self._lock:
+            job_ids = list(self._jobs.keys())[-limit:]
+        return [self.get(job_id, include_result=False) for job_id in reversed(job_ids)]
@@ -0,0 +1,107 @@
+# index_manifest.py - Manifest lokal untuk incremental indexing (SQLite)
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+
+class IndexManifest:
+    """Catatan per blob yang sudah ter-index: ETag, MD5 konten, jumlah chunk dan chunk ID.
+
+    Disimpan di file SQLite lokal supaya run berikutnya bisa skip blob yang tidak berubah.
+    Koneksi dibuka lazily dan dipakai bersama antar thread (dilindungi lock).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS indexed_blobs (
+                    blob_name   TEXT PRIMARY KEY,
+                    etag        TEXT,
+                    content_md5 TEXT,
+                    chunk_count INTEGER NOT NULL,
+                    chunk_ids   TEXT NOT NULL,
+                    indexed_at  TEXT NOT NULL
+                )
+                """
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, blob_name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT blob_name, etag, content_md5, chunk_count, chunk_ids, indexed_at "
+                "FROM indexed_blobs WHERE blob_name = ?",
+                (blob_name,),
+            ).fetchone()
+        if not row:
+            return None
+        return {
+            "blob_name": row[0],
+            "etag": row[1],
+            "content_md5": row[2],
+            "chunk_count": row[3],
+            "chunk_ids": json.loads(row[4]),
+            "indexed_at": row[5],
+        }
+
+    def is_unchanged(self, blob_name: str, etag: Optional[str] = None, content_md5: Optional[str] = None) -> bool:
+        """True jika blob sudah ter-index dengan ETag atau MD5 konten yang sama."""
+        entry = self.get(blob_name)
+        if not entry:
+            return False
+        if etag and entry["etag"] == etag:
+            return True
+        return bool(content_md5) and entry["content_md5"] == content_md5
+
+    def record(self, blob_name: str, etag: Optional[str], content_md5: Optional[str], chunk_ids: List[str]):
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO indexed_blobs "
+                "(blob_name, etag, content_md5, chunk_count, chunk_ids, indexed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    blob_name,
+                    etag,
+                    content_md5,
+                    len(chunk_ids),
+                    json.dumps(chunk_ids),
+                    datetime.now(timezone.utc).isoformat(),
+                ),
+            )
+            conn.commit()
+
+    def touch_etag(self, blob_name: str, etag: Optional[str]):
+        """Update ETag saja (blob di-upload ulang dengan konten yang identik)."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("UPDATE indexed_blobs SET etag = ? WHERE blob_name = ?", (etag, blob_name))
+            conn.commit()
+
+    def remove(self, blob_name: str):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM indexed_blobs WHERE blob_name = ?", (blob_name,))
+            conn.commit()
+
+    def list_blobs(self, prefix: str = "") -> List[str]:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT blob_name FROM indexed_blobs WHERE blob_name LIKE ? ESCAPE '\\'",
+                (prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%",),
+            ).fetchall()
+        return [r[0] for r in rows]
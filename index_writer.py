@@ -0,0 +1,475 @@
+# index_writer.py - Batched embedding + Azure AI Search writer untuk pipeline indexing
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_community.vectorstores.azuresearch import (
+    FIELDS_CONTENT,
+    FIELDS_CONTENT_VECTOR,
+    FIELDS_ID,
+    FIELDS_METADATA,
+)
+
+from rate_limiter import THROTTLE_STATUS_CODES
+
+# Batas Azure AI Search: 1000 dokumen / 16 MB per request indexing
+SEARCH_MAX_BATCH_DOCS = 1000
+SEARCH_MAX_BATCH_BYTES = 16 * 1024 * 1024
+
+
+class IndexWriter:
+    """Kumpulkan chunk lintas dokumen, embed per batch (berdasarkan token) dan
+    upload ke Azure AI Search per batch (berdasarkan jumlah dokumen & ukuran payload).
+
+    Buffer di-flush saat melewati batas ukuran, atau saat item tertua sudah
+    menunggu lebih dari `flush_seconds` (dicek oleh thread background).
+    Kegagalan dicatat per chunk di `failed_chunks`.
+
+    Dokumen yang chunk-nya masih di-stream bisa dibuka dengan `open_document`:
+    chunk-nya tetap di-embed, tetapi upload ditahan sampai `seal_document`
+    (metadata seperti `total_chunks` baru diketahui di akhir) atau dibuang
+    dengan `discard_document` jika produksi chunk gagal di tengah jalan.
+
+    Setelah semua chunk dokumen yang sudah di-seal selesai di-upload (atau gagal),
+    `on_document_done(source, failed)` dipanggil, sehingga caller bisa checkpoint per
+    dokumen. `on_upload_batch()` dipanggil setelah setiap request upload.
+
+    Upload lewat `upload_limiter` (AdaptiveRateLimiter) jika diberikan: request yang
+    di-throttle, maupun dokumen individual dengan status 429/503, dikirim ulang
+    setelah backoff alih-alih langsung dianggap gagal.
+
+    Jika `dead_letters` (DeadLetterStore) diberikan, chunk yang tetap gagal disimpan
+    beserta payload-nya (termasuk vektor jika embedding sudah berhasil) untuk di-retry
+    belakangan, alih-alih hanya dicatat lalu dibuang.
+
+    `field_names()` (opsional) mengembalikan field index live; hanya field metadata yang
+    ada di sana yang dikirim sebagai field top-level (index lama tanpa field bertipe
+    menolak seluruh batch jika ada property yang tidak dikenal). Jika schema tidak bisa
+    dibaca (None), hanya JSON `metadata` yang dikirim selama umur writer ini.
+    """
+
+    def __init__(
+        self,
+        vectorstore,
+        embeddings,
+        embed_batch_tokens: int = 100_000,
+        embed_batch_size: int = 256,
+        upload_batch_size: int = SEARCH_MAX_BATCH_DOCS,
+        upload_batch_bytes: int = 12 * 1024 * 1024,
+        flush_seconds: float = 5.0,
+        on_document_done: Optional[Callable[[str, bool], None]] = None,
+        on_upload_batch: Optional[Callable[[], None]] = None,
+        upload_limiter=None,
+        dead_letters=None,
+        field_names: Optional[Callable[[], Optional[set]]] = None,
+    ):
+        self.vectorstore = vectorstore
+        self.embeddings = embeddings
+        self.embed_batch_tokens = max(1, embed_batch_tokens)
+        # Satu panggilan embed_documents = satu request selama <= chunk_size client
+        self.embed_batch_size = max(1, min(embed_batch_size, getattr(embeddings, "chunk_size", embed_batch_size)))
+        self.upload_batch_size = max(1, min(upload_batch_size, SEARCH_MAX_BATCH_DOCS))
+        self.upload_batch_bytes = max(1, min(upload_batch_bytes, SEARCH_MAX_BATCH_BYTES))
+        self.flush_seconds = flush_seconds
+        self.on_document_done = on_document_done
+        self.on_upload_batch = on_upload_batch
+        self.upload_limiter = upload_limiter
+        self.dead_letters = dead_letters
+        self.field_names = field_names
+
+        self._lock = threading.Lock()
+        self._embed_buffer: List[Dict[str, Any]] = []
+        self._embed_tokens = 0
+        self._embed_since: Optional[float] = None
+        self._upload_buffer: List[Dict[str, Any]] = []
+        self._upload_bytes = 0
+        self._upload_since: Optional[float] = None
+        self._open_documents: set = set()
+        # Tracking per dokumen: chunk yang belum selesai di-upload, status seal & gagal
+        self._pending: Dict[str, int] = {}
+        self._sealed: set = set()
+        self._failed_sources: set = set()
+        self._discarded: set = set()
+
+        self._search_field_names: Optional[set] = None
+        self._stop = threading.Event()
+        self._timer: Optional[threading.Thread] = None
+
+        self.embedding_requests = 0
+        self.search_write_requests = 0
+        self.chunks_written = 0
+        self.failed_chunks: List[Dict[str, Any]] = []
+        self.embed_seconds = 0.0
+        self.upload_seconds = 0.0
+        self.vectors_reused = 0
+        self.tokens_reused = 0
+        self.vector_dimensions = 0
+
+    # ---------- lifecycle ----------
+    def start(self) -> "IndexWriter":
+        if self.flush_seconds and self.flush_seconds > 0:
+            self._timer = threading.Thread(target=self._timer_loop, name="index-writer-flush", daemon=True)
+            self._timer.start()
+        return self
+
+    def close(self) -> Dict[str, Any]:
+        self._stop.set()
+        if self._timer is not None:
+            self._timer.join()
+        self.flush()
+        return self.stats()
+
+    def _timer_loop(self):
+        while not self._stop.wait(min(self.flush_seconds, 1.0)):
+            now = time.monotonic()
+            with self._lock:
+                embed_stale = self._embed_since is not None and now - self._embed_since >= self.flush_seconds
+                upload_stale = self._upload_since is not None and now - self._upload_since >= self.flush_seconds
+            if embed_stale:
+                self._flush_embed(force=True)
+            if upload_stale:
+                self._flush_upload(force=True)
+
+    # ---------- public API ----------
+    def add(self, chunk_id: str, content: str, metadata: Dict[str, Any], tokens: int,
+            embedding_key: Optional[str] = None, vector: Optional[List[float]] = None):
+        """Tambahkan satu chunk ke buffer embedding (thread-safe).
+
+        `embedding_key`: key cache embedding milik chunk lain (near-duplicate) yang
+        vektornya dipakai ulang. Jika vektor itu tidak ada di cache, chunk di-embed biasa.
+        `vector`: vektor yang sudah ada (mis. retry dead letter); chunk langsung antri upload.
+        """
+        item = {
+            "id": chunk_id,
+            "content": content,
+            "metadata": metadata,
+            "tokens": tokens,
+            "embedding_key": embedding_key,
+        }
+        with self._lock:
+            source = metadata.get("source")
+            if source is not None:
+                self._pending[source] = self._pending.get(source, 0) + 1
+            if vector is None:
+                self._embed_buffer.append(item)
+                self._embed_tokens += tokens
+                if self._embed_since is None:
+                    self._embed_since = time.monotonic()
+                ready = self._embed_tokens >= self.embed_batch_tokens or len(self._embed_buffer) >= self.embed_batch_size
+        if vector is not None:
+            self._queue_upload([(item, vector)])
+        elif ready:
+            self._flush_embed()
+
+    def open_document(self, source: str):
+        """Tahan upload chunk milik `source` sampai seal_document/discard_document."""
+        with self._lock:
+            self._open_documents.add(source)
+            self._discarded.discard(source)
+            self._failed_sources.discard(source)
+
+    def seal_document(self, source: str):
+        """Dokumen selesai di-stream: chunk-nya boleh di-upload."""
+        with self._lock:
+            self._open_documents.discard(source)
+            self._sealed.add(source)
+            ready = self._upload_ready()
+        self._settle([], failed=False, check=[source])
+        if ready:
+            self._flush_upload()
+
+    def discard_document(self, source: str) -> int:
+        """Buang semua chunk `source` yang belum di-upload. Return jumlah chunk yang dibuang."""
+        with self._lock:
+            self._open_documents.discard(source)
+            # Chunk yang sedang di-embed juga dibuang begitu masuk antrian upload
+            self._discarded.add(source)
+            self._pending.pop(source, None)
+            self._sealed.discard(source)
+            embed_keep = [i for i in self._embed_buffer if i["metadata"].get("source") != source]
+            upload_keep = [e for e in self._upload_buffer if e["item"]["metadata"].get("source") != source]
+            dropped = len(self._embed_buffer) - len(embed_keep) + len(self._upload_buffer) - len(upload_keep)
+            self._embed_buffer, self._upload_buffer = embed_keep, upload_keep
+            self._embed_tokens = sum(i["tokens"] for i in embed_keep)
+            self._upload_bytes = sum(e["size"] for e in upload_keep)
+            if not embed_keep:
+                self._embed_since = None
+            if not upload_keep:
+                self._upload_since = None
+        return dropped
+
+    def flush(self):
+        """Paksa embed + upload semua yang masih di buffer."""
+        self._flush_embed(force=True)
+        self._flush_upload(force=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "chunks_written": self.chunks_written,
+            "failed_chunks": list(self.failed_chunks),
+            "embedding_requests": self.embedding_requests,
+            "search_write_requests": self.search_write_requests,
+            "embed_seconds": round(self.embed_seconds, 3),
+            "upload_seconds": round(self.upload_seconds, 3),
+            "vectors_reused": self.vectors_reused,
+            "tokens_reused": self.tokens_reused,
+        }
+
+    # ---------- embedding ----------
+    def _take_embed_batch(self, force: bool) -> List[Dict[str, Any]]:
+        """Ambil satu batch dari buffer embedding sesuai batas token & jumlah teks."""
+        with self._lock:
+            if not self._embed_buffer:
+                return []
+            if not force and self._embed_tokens < self.embed_batch_tokens and len(self._embed_buffer) < self.embed_batch_size:
+                return []
+            batch, tokens = [], 0
+            while self._embed_buffer and len(batch) < self.embed_batch_size:
+                item = self._embed_buffer[0]
+                if batch and tokens + item["tokens"] > self.embed_batch_tokens:
+                    break
+                batch.append(self._embed_buffer.pop(0))
+                tokens += item["tokens"]
+            self._embed_tokens -= tokens
+            self._embed_since = time.monotonic() if self._embed_buffer else None
+            return batch
+
+    def _flush_embed(self, force: bool = False):
+        while True:
+            batch = self._take_embed_batch(force)
+            if not batch:
+                return
+            started = time.perf_counter()
+            requests = 0
+            try:
+                reused = self._reused_vectors(batch)
+                pending = [item for item in batch if item["id"] not in reused]
+                vectors = dict(reused)
+                if pending:
+                    requests = 1
+                    embedded = self.embeddings.embed_documents([item["content"] for item in pending])
+                    # CachedEmbeddings hanya memanggil model untuk teks yang belum ada di cache
+                    requests = getattr(self.embeddings, "last_call_requests", 1)
+                    vectors.update((item["id"], vector) for item, vector in zip(pending, embedded))
+            except Exception as e:
+                self._fail(batch, f"embedding failed: {e}")
+                continue
+            finally:
+                with self._lock:
+                    self.embedding_requests += requests
+                    self.embed_seconds += time.perf_counter() - started
+
+            with self._lock:
+                self.vectors_reused += len(reused)
+                self.tokens_reused += sum(item["tokens"] for item in batch if item["id"] in reused)
+                if vectors and not self.vector_dimensions:
+                    self.vector_dimensions = len(next(iter(vectors.values())))
+            self._queue_upload([(item, vectors[item["id"]]) for item in batch])
+
+    def _reused_vectors(self, batch: List[Dict[str, Any]]) -> Dict[str, List[float]]:
+        """Vektor near-duplicate dari cache embedding, per chunk ID."""
+        keys = {item["id"]: item["embedding_key"] for item in batch if item.get("embedding_key")}
+        if not keys or not hasattr(self.embeddings, "cached_vectors"):
+            return {}
+        cached = self.embeddings.cached_vectors(list(set(keys.values())))
+        return {chunk_id: cached[key] for chunk_id, key in keys.items() if key in cached}
+
+    # ---------- upload ----------
+    def _to_search_document(self, item: Dict[str, Any], vector: List[float]) -> Dict[str, Any]:
+        """Bentuk dokumen sama persis dengan AzureSearch.add_embeddings dari LangChain."""
+        metadata = item["metadata"]
+        doc = {
+            "@search.action": "upload",
+            FIELDS_ID: item["id"],
+            FIELDS_CONTENT: item["content"],
+            FIELDS_CONTENT_VECTOR: [float(v) for v in vector],
+            FIELDS_METADATA: json.dumps(metadata),
+        }
+        field_names = self._field_names()
+        doc.update({k: v for k, v in metadata.items() if k in field_names})
+        return doc
+
+    def _field_names(self) -> set:
+        if self._search_field_names is None:
+            if self.field_names is not None:
+                # Dibaca sekali per writer; schema yang gagal dibaca (None) juga di-cache
+                # sebagai "tanpa field bertipe", bukan diulang untuk setiap chunk
+                names = self.field_names() or set()
+            else:
+                names = {f.name for f in getattr(self.vectorstore, "fields", None) or []}
+            self._search_field_names = set(names) - {FIELDS_ID, FIELDS_CONTENT, FIELDS_CONTENT_VECTOR, FIELDS_METADATA}
+        return self._search_field_names
+
+    def _queue_upload(self, embedded: List[tuple]):
+        # Dokumen Search baru dibentuk saat upload, supaya metadata yang dilengkapi
+        # setelah dokumen selesai di-stream (total_chunks) ikut terkirim.
+        with self._lock:
+            for item, vector in embedded:
+                if item["metadata"].get("source") in self._discarded:
+                    continue
+                # Estimasi ukuran JSON: vector float ~ 12 byte per dimensi
+                size = len(item["content"]) + len(json.dumps(item["metadata"])) + 12 * len(vector) + 64
+                self._upload_buffer.append({"item": item, "vector": vector, "size": size})
+                self._upload_bytes += size
+            if self._upload_buffer and self._upload_since is None:
+                self._upload_since = time.monotonic()
+            ready = self._upload_ready()
+        if ready:
+            self._flush_upload()
+
+    def _is_held(self, entry: Dict[str, Any]) -> bool:
+        return bool(self._open_documents) and entry["item"]["metadata"].get("source") in self._open_documents
+
+    def _upload_ready(self) -> bool:
+        """True jika chunk yang siap upload sudah mencapai batas batch (dipanggil dengan lock)."""
+        if not self._open_documents:
+            return len(self._upload_buffer) >= self.upload_batch_size or self._upload_bytes >= self.upload_batch_bytes
+        count, size = 0, 0
+        for entry in self._upload_buffer:
+            if not self._is_held(entry):
+                count += 1
+                size += entry["size"]
+        return count >= self.upload_batch_size or size >= self.upload_batch_bytes
+
+    def _take_upload_batch(self, force: bool) -> List[Dict[str, Any]]:
+        with self._lock:
+            if not self._upload_buffer:
+                return []
+            if not force and not self._upload_ready():
+                return []
+            batch, held, size = [], [], 0
+            for position, entry in enumerate(self._upload_buffer):
+                if len(batch) >= self.upload_batch_size or (batch and size + entry["size"] > self.upload_batch_bytes):
+                    held.extend(self._upload_buffer[position:])
+                    break
+                if self._is_held(entry):
+                    held.append(entry)
+                    continue
+                batch.append(entry)
+                size += entry["size"]
+            self._upload_buffer = held
+            self._upload_bytes -= size
+            self._upload_since = time.monotonic() if self._upload_buffer else None
+            return batch
+
+    def _flush_upload(self, force: bool = False):
+        while True:
+            batch = self._take_upload_batch(force)
+            if not batch:
+                return
+            items = {entry["item"]["id"]: entry["item"] for entry in batch}
+            vectors = {entry["item"]["id"]: entry["vector"] for entry in batch}
+            docs = [self._to_search_document(entry["item"], entry["vector"]) for entry in batch]
+            started = time.perf_counter()
+            try:
+                results = self._upload_documents(docs)
+            except Exception as e:
+                self._fail(list(items.values()), f"upload failed: {e}", vectors)
+                self._batch_done()
+                continue
+            finally:
+                with self._lock:
+                    self.upload_seconds += time.perf_counter() - started
+
+            succeeded, failed = [], []
+            for r in results:
+                item = items.pop(r.key, None)
+                if item is None:
+                    continue
+                if r.succeeded:
+                    succeeded.append(item)
+                else:
+                    failed.append((item, getattr(r, "error_message", None) or f"status {r.status_code}"))
+            # Chunk tanpa hasil dianggap gagal
+            failed.extend((item, "no indexing result returned") for item in items.values())
+            with self._lock:
+                self.chunks_written += len(succeeded)
+            for item, err in failed:
+                self._fail([item], err, vectors)
+            self._settle(succeeded, failed=False)
+            self._batch_done()
+
+    def _send(self, docs: List[Dict[str, Any]]) -> List[Any]:
+        with self._lock:
+            self.search_write_requests += 1
+        return self.vectorstore.client.upload_documents(documents=docs)
+
+    def _upload_documents(self, docs: List[Dict[str, Any]]) -> List[Any]:
+        """Upload satu batch; dokumen yang di-throttle per item (429/503) dikirim ulang."""
+        if self.upload_limiter is None:
+            return self._send(docs)
+        results: Dict[str, Any] = {}
+        attempt = 0
+        while docs:
+            batch = docs
+            response = self.upload_limiter.call(lambda: self._send(batch))
+            throttled = set()
+            for r in response:
+                if not r.succeeded and r.status_code in THROTTLE_STATUS_CODES and attempt < self.upload_limiter.max_retries:
+                    throttled.add(r.key)
+                else:
+                    results[r.key] = r
+            if not throttled:
+                break
+            attempt += 1
+            self.upload_limiter.on_throttled(None, attempt)
+            docs = [doc for doc in docs if doc[FIELDS_ID] in throttled]
+        return list(results.values())
+
+    def _batch_done(self):
+        if self.on_upload_batch is not None:
+            try:
+                self.on_upload_batch()
+            except Exception as e:
+                print(f"Upload batch callback failed: {e}")
+
+    # ---------- per-document completion ----------
+    def _settle(self, items: List[Dict[str, Any]], failed: bool, check: Optional[List[str]] = None):
+        """Kurangi chunk pending per dokumen; panggil on_document_done untuk dokumen yang selesai."""
+        done = []
+        with self._lock:
+            touched = set(check or [])
+            for item in items:
+                source = item["metadata"].get("source")
+                if source not in self._pending:
+                    continue
+                self._pending[source] -= 1
+                if failed:
+                    self._failed_sources.add(source)
+                touched.add(source)
+            for source in touched:
+                if source in self._sealed and self._pending.get(source, 0) <= 0:
+                    self._sealed.discard(source)
+                    self._pending.pop(source, None)
+                    done.append((source, source in self._failed_sources))
+                    self._failed_sources.discard(source)
+        if self.on_document_done is None:
+            return
+        for source, source_failed in done:
+            try:
+                self.on_document_done(source, source_failed)
+            except Exception as e:
+                print(f"Document completion callback failed for {source}: {e}")
+
+    # ---------- failures ----------
+    def _fail(self, items: List[Dict[str, Any]], error: str,
+              vectors: Optional[Dict[str, List[float]]] = None):
+        dead_lettered = False
+        if self.dead_letters is not None:
+            try:
+                self.dead_letters.add([dict(item, vector=(vectors or {}).get(item["id"])) for item in items], error)
+                dead_lettered = True
+            except Exception as e:
+                print(f"Could not store failed chunks in the dead-letter store: {e}")
+        with self._lock:
+            for item in items:
+                self.failed_chunks.append({
+                    "chunk_id": item["id"],
+                    "source": item["metadata"].get("source"),
+                    "error": error,
+                    "dead_lettered": dead_lettered,
+                })
+        for item in items:
+            print(f"Error indexing chunk {item['id']}: {error}" + (" (queued for retry)" if dead_lettered else ""))
+        self._settle(items, failed=True)
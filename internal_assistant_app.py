@@ -50,9 +50,29 @@ from documentManagement import (
     batch_delete_documents,
     inspect_search_index_sample,
     get_search_index_schema,
-    rebuild_search_index
+    rebuild_search_index,
+    sweep_orphaned_chunks,
+    list_index_runs,
+    submit_index_job,
+    get_index_job,
+    list_index_jobs,
+    start_blob_watcher,
+    stop_blob_watcher,
+    get_blob_watcher_status,
+    scan_blob_prefixes,
+    get_search_index_stats,
+    submit_index_migration,
+    start_dead_letter_retry,
+    get_dead_letter_status,
+    retry_dead_letters,
+    submit_summary_backfill,
+    get_document_summary,
+    get_document_tables,
+    search_table_rows
 )
 
+from local_extractors import detect_mime
+
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
 from fastapi.responses import RedirectResponse, HTMLResponse
 from fastapi.middleware.cors import CORSMiddleware
@@ -147,18 +167,7 @@ def health():
 
 # ========== UPLOAD & INDEX ENDPOINT ==========
 def _detect_mime(path: str) -> str:
-    ext = (os.path.splitext(path)[1] or "").lower()
-    return {
-        ".pdf": "application/pdf",
-        ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-        ".doc": "application/msword",
-        ".txt": "text/plain",
-        ".pptx": "application/vnd.openxmlformats-officedocument.presentationml.presentation",
-        ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        ".jpg": "image/jpeg",
-        ".jpeg": "image/jpeg",
-        ".png": "image/png",
-    }.get(ext, "application/octet-stream")
+    return detect_mime(path)
 # ========== DOCUMENT MANAGEMENT ENDPOINTS ==========
 
 @app.get("/documents")
@@ -176,8 +185,9 @@ def list_documents(prefix: str = "sop/"):
         raise HTTPException(status_code=500, detail=f"Error listing documents: {str(e)}")
 
 @app.post("/documents/upload")
-async def upload_documents(files: List[UploadFile] = File(...), prefix: str = Form("sop/")):
-    """Upload multiple documents to blob storage and index them"""
+async def upload_documents(files: List[UploadFile] = File(...), prefix: str = Form("sop/"), wait: bool = Form(False)):
+    """Upload multiple documents to blob storage and index them in a background job
+    (poll /documents/index-jobs/{job_id}; wait=true indexes inline)"""
     try:
         if not prefix.endswith("/"):
             prefix += "/"
@@ -191,7 +201,7 @@ async def upload_documents(files: List[UploadFile] = File(...), prefix: str = Fo
                 "content_type": _detect_mime(file.filename)
             })
         
-        result = upload_and_index_complete(files_data, prefix)
+        result = upload_and_index_complete(files_data, prefix, wait=wait)
         return result
         
     except Exception as e:
@@ -234,18 +244,138 @@ def get_index_schema():
         raise HTTPException(status_code=500, detail=f"Error getting schema: {str(e)}")
 
 @app.post("/documents/reindex")
-def reindex_documents(prefix: str = "sop/"):
-    """Re-index all documents from blob storage"""
+def reindex_documents(prefix: str = "sop/", force: bool = False, resume: Optional[str] = None, wait: bool = False):
+    """Re-index new or changed documents from blob storage (force=true reprocesses everything,
+    resume=<run_id> or resume=latest continues an interrupted run). Returns a job ID immediately;
+    wait=true runs the indexing inline and returns the report"""
     try:
-        result = process_and_index_documents(prefix)
+        if not wait:
+            return submit_index_job(prefix, force=force, resume=resume)
+        result = process_and_index_documents(prefix, force=force, resume=resume)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error reindexing documents: {str(e)}")
 
+@app.get("/documents/index-runs")
+def get_index_runs(limit: int = 20):
+    """List recent indexing runs and their checkpoints"""
+    try:
+        return list_index_runs(limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error listing index runs: {str(e)}")
+
+@app.get("/documents/index-jobs")
+def get_index_jobs(limit: int = 20):
+    """List recent background indexing jobs"""
+    return list_index_jobs(limit)
+
+@app.get("/documents/index-jobs/{job_id}")
+def get_index_job_status(job_id: str):
+    """Status and progress of a background indexing job (blobs done/total, chunks written, stage, ETA)"""
+    job = get_index_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Index job {job_id} not found")
+    return job
+
+@app.get("/documents/watcher")
+def get_watcher_status():
+    """Status of the blob-prefix watcher (prefixes, interval, watermarks, last scans)"""
+    return get_blob_watcher_status()
+
+@app.post("/documents/watcher/scan")
+def scan_watched_prefixes(wait: bool = False):
+    """Scan watched prefixes now for new, changed or deleted blobs (wait=true returns the scan results)"""
+    try:
+        return scan_blob_prefixes(wait=wait)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error scanning blob prefixes: {str(e)}")
+
+@app.post("/documents/watcher/start")
+def start_watcher():
+    """Start continuous indexing of the watched prefixes"""
+    return start_blob_watcher()
+
+@app.post("/documents/watcher/stop")
+def stop_watcher():
+    """Stop continuous indexing"""
+    return stop_blob_watcher()
+
+@app.get("/documents/summary")
+def document_summary(blob_name: str):
+    """Summary and table of contents of one document (used to answer overview questions)"""
+    summary = get_document_summary(blob_name)
+    if summary is None:
+        raise HTTPException(status_code=404, detail=f"No summary for {blob_name}")
+    return summary
+
+@app.post("/documents/summaries/backfill")
+def backfill_summaries(prefix: str = "", force: bool = False):
+    """Build summaries for documents indexed before the summary tier, from their stored chunks (background job)"""
+    return submit_summary_backfill(prefix, force)
+
+@app.get("/documents/tables")
+def document_tables(blob_name: str, table_id: Optional[int] = None):
+    """Structured tables of one document (all rows of `table_id` when given)"""
+    result = get_document_tables(blob_name, table_id)
+    if table_id is not None and not result["success"]:
+        raise HTTPException(status_code=404, detail=f"Table {table_id} not found in {blob_name}")
+    return result
+
+@app.get("/documents/tables/search")
+def table_rows_search(q: str, prefix: str = "", max_rows: int = 20):
+    """Table rows matching a question, grouped per table"""
+    return search_table_rows(q, prefix, max_rows)
+
+@app.get("/documents/dead-letters")
+def get_dead_letters(source: Optional[str] = None, limit: int = 100):
+    """Chunks that failed to index: pending retries and permanently failed items per document"""
+    return get_dead_letter_status(source, limit)
+
+@app.post("/documents/dead-letters/retry")
+def retry_failed_chunks(source: Optional[str] = None, wait: bool = False):
+    """Requeue permanently failed chunks and retry now (wait=true returns the retry results)"""
+    try:
+        return retry_dead_letters(source, wait=wait)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrying failed chunks: {str(e)}")
+
+@app.on_event("startup")
+def _start_blob_watcher_on_startup():
+    if settings.index_watch_enabled:
+        start_blob_watcher()
+
+@app.on_event("startup")
+def _start_dead_letter_retry_on_startup():
+    if settings.index_retry_enabled:
+        start_dead_letter_retry()
+
+@app.post("/documents/sweep")
+def sweep_documents(prefix: str = "", dry_run: bool = False):
+    """Remove indexed chunks whose source blob no longer exists"""
+    try:
+        result = sweep_orphaned_chunks(prefix, dry_run=dry_run)
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error sweeping index: {str(e)}")
+
+@app.get("/documents/index-stats")
+def index_stats(prefix: str = ""):
+    """Chunk counts per document, content type and folder (facets on the managed index schema)"""
+    return get_search_index_stats(prefix)
+
+@app.post("/documents/index/migrate")
+def migrate_index(target_index: str, compression: Optional[str] = None):
+    """Copy the current index into `target_index` with the managed schema in a background job
+    (poll /documents/index-jobs/{job_id}; then point AZURE_SEARCH_INDEX_NAME at the target)"""
+    if target_index == settings.search_index:
+        raise HTTPException(status_code=400, detail="target_index must differ from the current index")
+    return submit_index_migration(target_index, compression)
+
 @app.post("/upload-and-index")
 async def upload_and_index(
     files: List[UploadFile] = File(...),
-    prefix: str = Form("sop/")
+    prefix: str = Form("sop/"),
+    wait: bool = Form(False)
 ):
     uploaded = []
     errors = []
@@ -266,6 +396,13 @@ async def upload_and_index(
             uploaded.append(blob_name)
         except Exception as e:
             errors.append(f"{fname}: {e}")
+    if not wait:
+        # Indexing jalan di background; progress di-poll via /documents/index-jobs/{job_id}
+        return {
+            "uploaded": uploaded,
+            "upload_errors": errors,
+            "index_job": submit_index_job(prefix) if uploaded else None
+        }
     index_report = process_and_index_docs(prefix=prefix)
     return {
         "uploaded": uploaded,
@@ -278,7 +415,7 @@ async def upload_and_index(
 def rag_chat(req: dict):
     message = req.get("message", "")
     try:
-        answer = rag_answer(message)
+        answer = rag_answer(message, prefix=req.get("prefix"))
         return {"answer": answer}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
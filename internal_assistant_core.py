@@ -1,4 +1,8 @@
 from depedencies import *
+import time
+from embedding_cache import CachedEmbeddings
+from rate_limiter import AdaptiveRateLimiter
+from search_schema import embedding_dimensions, index_fields, vector_search_config
 
 # Load env & Settings
 load_dotenv()
@@ -11,11 +15,17 @@ class Settings(BaseModel):
     openai_api_version: str = os.getenv("AZURE_OPENAI_API_VERSION", "2024-05-01-preview")
     openai_deployment: str = os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4o-mini")
     openai_embed_deployment: str = os.getenv("AZURE_OPENAI_EMBED_DEPLOYMENT", "text-embedding-3-large")
+    # Dimensi embedding (parameter native `dimensions` text-embedding-3); 0 = dimensi penuh model
+    embed_dimensions: int = int(os.getenv("AZURE_OPENAI_EMBED_DIMENSIONS", "0"))
 
     # Cognitive Search
     search_endpoint: str = os.getenv("AZURE_SEARCH_ENDPOINT", "")
     search_key: str = os.getenv("AZURE_SEARCH_KEY", "")
     search_index: str = os.getenv("AZURE_SEARCH_INDEX_NAME", "internal-docs-index")
+    # Kuantisasi vektor di index: none | scalar (int8) | binary. Berlaku saat index dibuat
+    # (dimensi & kompresi index yang sudah ada tidak bisa diubah; pakai nama index baru)
+    search_vector_compression: str = os.getenv("SEARCH_VECTOR_COMPRESSION", "none").lower()
+    search_vector_oversampling: float = float(os.getenv("SEARCH_VECTOR_OVERSAMPLING", "4"))
 
     # Blob
     blob_conn: str = os.getenv("AZURE_BLOB_CONNECTION_STRING", "")
@@ -24,6 +34,18 @@ class Settings(BaseModel):
     # Document Intelligence
     docint_endpoint: str = os.getenv("AZURE_DOCINT_ENDPOINT", "")
     docint_key: str = os.getenv("AZURE_DOCINT_KEY", "")
+    docint_model: str = os.getenv("AZURE_DOCINT_MODEL", "prebuilt-layout")
+    docint_pages: str = os.getenv("AZURE_DOCINT_PAGES", "")  # kosong = semua halaman
+    # Dokumen panjang: analisis per page window secara paralel
+    docint_window_pages: int = int(os.getenv("AZURE_DOCINT_WINDOW_PAGES", "10"))
+    docint_window_concurrency: int = int(os.getenv("AZURE_DOCINT_WINDOW_CONCURRENCY", "4"))
+    docint_max_pages: int = int(os.getenv("AZURE_DOCINT_MAX_PAGES", "0"))  # 0 = tanpa batas
+    # Analisis in-flight lintas semua dokumen (submit semua, poll bersama)
+    docint_max_in_flight: int = int(os.getenv("AZURE_DOCINT_MAX_IN_FLIGHT", "16"))
+    docint_poll_seconds: float = float(os.getenv("AZURE_DOCINT_POLL_SECONDS", "0.5"))
+    docint_cache_max_mb: int = int(os.getenv("DOCINT_CACHE_MAX_MB", "1024"))
+    # TXT/DOCX/XLSX/PPTX diparse lokal; hanya PDF, gambar & format lain ke Document Intelligence
+    index_local_extractors: bool = os.getenv("INDEX_LOCAL_EXTRACTORS", "true").lower() == "true"
 
     # Azure Function (preprocess)
     func_preprocess_url: str = os.getenv("AZURE_FUNCTION_PREPROCESS_URL", "")
@@ -50,6 +72,64 @@ class Settings(BaseModel):
     # Notifications
     notify_webhook: str = os.getenv("NOTIFY_WEBHOOK_URL", "")
 
+    # Indexing pipeline (jumlah worker per stage & kapasitas antrian antar stage)
+    index_download_workers: int = int(os.getenv("INDEX_DOWNLOAD_WORKERS", "4"))
+    index_extract_workers: int = int(os.getenv("INDEX_EXTRACT_WORKERS", "4"))
+    index_chunk_workers: int = int(os.getenv("INDEX_CHUNK_WORKERS", "2"))
+    index_write_workers: int = int(os.getenv("INDEX_WRITE_WORKERS", "2"))
+    # >0: cleaning/klasifikasi/chunking dijalankan di process pool (lepas dari GIL app); 0 = thread
+    index_chunk_processes: int = int(os.getenv("INDEX_CHUNK_PROCESSES", "0"))
+    index_chunk_process_nice: int = int(os.getenv("INDEX_CHUNK_PROCESS_NICE", "10"))
+    index_queue_size: int = int(os.getenv("INDEX_QUEUE_SIZE", "8"))
+    # Blob lebih besar dari ini di-stream ke temp file (batas memory per dokumen)
+    index_doc_memory_mb: int = int(os.getenv("INDEX_DOC_MEMORY_MB", "32"))
+    index_download_concurrency: int = int(os.getenv("INDEX_DOWNLOAD_CONCURRENCY", "4"))
+
+    # Index writer (batch embedding & upload ke Azure AI Search)
+    index_embed_batch_tokens: int = int(os.getenv("INDEX_EMBED_BATCH_TOKENS", "100000"))
+    index_embed_batch_size: int = int(os.getenv("INDEX_EMBED_BATCH_SIZE", "256"))
+    index_upload_batch_size: int = int(os.getenv("INDEX_UPLOAD_BATCH_SIZE", "1000"))
+    index_upload_batch_bytes: int = int(os.getenv("INDEX_UPLOAD_BATCH_BYTES", str(12 * 1024 * 1024)))
+    index_flush_seconds: float = float(os.getenv("INDEX_FLUSH_SECONDS", "5"))
+
+    # State lokal indexing (manifest incremental, cache, dsb.)
+    index_state_dir: str = os.getenv("INDEX_STATE_DIR", ".index_state")
+    embed_cache_memory_items: int = int(os.getenv("EMBED_CACHE_MEMORY_ITEMS", "2000"))
+
+    # Near-duplicate chunk lintas dokumen: "reuse" (pakai ulang vektor), "skip" (tidak disimpan), "off"
+    index_near_dup_mode: str = os.getenv("INDEX_NEAR_DUP_MODE", "reuse").lower()
+    index_near_dup_threshold: float = float(os.getenv("INDEX_NEAR_DUP_THRESHOLD", "0.9"))
+    # Jumlah job indexing background yang boleh jalan bersamaan (job lain antri)
+    index_max_concurrent_jobs: int = int(os.getenv("INDEX_MAX_CONCURRENT_JOBS", "1"))
+    # Watcher prefix blob: index otomatis blob baru/berubah/terhapus tanpa endpoint upload/reindex
+    index_watch_enabled: bool = os.getenv("INDEX_WATCH_ENABLED", "false").lower() == "true"
+    index_watch_prefixes: str = os.getenv("INDEX_WATCH_PREFIXES", "sop/")  # dipisah koma
+    index_watch_interval_seconds: float = float(os.getenv("INDEX_WATCH_INTERVAL_SECONDS", "60"))
+    index_watch_page_size: int = int(os.getenv("INDEX_WATCH_PAGE_SIZE", "5000"))
+    # Dead-letter chunk yang gagal ditulis: retry otomatis dengan exponential backoff
+    index_retry_enabled: bool = os.getenv("INDEX_RETRY_ENABLED", "true").lower() == "true"
+    index_retry_interval_seconds: float = float(os.getenv("INDEX_RETRY_INTERVAL_SECONDS", "30"))
+    index_retry_batch_size: int = int(os.getenv("INDEX_RETRY_BATCH_SIZE", "500"))
+    index_retry_max_attempts: int = int(os.getenv("INDEX_RETRY_MAX_ATTEMPTS", "6"))
+    index_retry_backoff_seconds: float = float(os.getenv("INDEX_RETRY_BACKOFF_SECONDS", "30"))
+    index_retry_max_backoff_seconds: float = float(os.getenv("INDEX_RETRY_MAX_BACKOFF_SECONDS", "3600"))
+
+    # Rate limit adaptif (0 = tidak dibatasi); sesuaikan dengan kuota deployment embedding
+    embed_requests_per_minute: int = int(os.getenv("EMBED_RPM", "1440"))
+    embed_tokens_per_minute: int = int(os.getenv("EMBED_TPM", "240000"))
+    search_upload_requests_per_minute: int = int(os.getenv("SEARCH_UPLOAD_RPM", "600"))
+    # Porsi RPM/TPM embedding yang dicadangkan untuk query chat (limiter terpisah dari indexing)
+    embed_query_share: float = float(os.getenv("EMBED_QUERY_SHARE", "0.1"))
+    rate_limit_max_retries: int = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "6"))
+
+    # Pertanyaan overview ("SOP ini tentang apa", "daftar isi") dijawab dari ringkasan per dokumen
+    rag_summary_routing: bool = os.getenv("RAG_SUMMARY_ROUTING", "true").lower() == "true"
+    rag_summary_max_docs: int = int(os.getenv("RAG_SUMMARY_MAX_DOCS", "3"))
+    # Pertanyaan tabular ("limit approval level 3") dijawab dari baris tabel terstruktur yang relevan
+    rag_table_routing: bool = os.getenv("RAG_TABLE_ROUTING", "true").lower() == "true"
+    rag_table_max_rows: int = int(os.getenv("RAG_TABLE_MAX_ROWS", "20"))
+    rag_table_max_tables: int = int(os.getenv("RAG_TABLE_MAX_TABLES", "3"))
+
     debug: bool = os.getenv("APP_DEBUG", "false").lower() == "true"
 
 settings = Settings()
@@ -66,22 +146,95 @@ llm = AzureChatOpenAI(
     temperature=0.2,
 )
 
-embeddings = AzureOpenAIEmbeddings(
-    azure_endpoint=settings.openai_endpoint,
-    api_key=settings.openai_key,
-    api_version=settings.openai_api_version,
-    deployment=settings.openai_embed_deployment,
+# Rate limiter bersama untuk deployment embedding & upload Azure AI Search.
+# Kuota embedding dibagi: indexing memakai sisanya, query chat punya porsi sendiri sehingga
+# pause 429 / antrian indexing massal tidak menahan pertanyaan interaktif.
+_query_share = min(max(settings.embed_query_share, 0.0), 0.9)
+embed_rate_limiter = AdaptiveRateLimiter(
+    "embeddings",
+    requests_per_minute=settings.embed_requests_per_minute * (1 - _query_share),
+    tokens_per_minute=settings.embed_tokens_per_minute * (1 - _query_share),
+    max_retries=settings.rate_limit_max_retries,
+)
+# EMBED_QUERY_SHARE=0: query memakai limiter indexing (perilaku lama)
+embed_query_limiter = AdaptiveRateLimiter(
+    "embeddings_query",
+    requests_per_minute=settings.embed_requests_per_minute * _query_share,
+    tokens_per_minute=settings.embed_tokens_per_minute * _query_share,
+    # Pertanyaan interaktif: retry singkat saja, jangan menunggu Retry-After panjang
+    max_retries=2,
+    max_backoff=5.0,
+) if _query_share > 0 else None
+search_upload_limiter = AdaptiveRateLimiter(
+    "search_upload",
+    requests_per_minute=settings.search_upload_requests_per_minute,
+    max_retries=settings.rate_limit_max_retries,
+)
+
+# Embeddings dibungkus cache persisten (dipakai indexing & query).
+# Retry 429 ditangani limiter (max_retries=0 di client) supaya semua thread ikut melambat.
+embeddings = CachedEmbeddings(
+    AzureOpenAIEmbeddings(
+        azure_endpoint=settings.openai_endpoint,
+        api_key=settings.openai_key,
+        api_version=settings.openai_api_version,
+        deployment=settings.openai_embed_deployment,
+        dimensions=settings.embed_dimensions or None,
+        max_retries=0,
+    ),
+    # Vektor dengan dimensi berbeda tidak boleh tercampur di cache
+    deployment=(f"{settings.openai_embed_deployment}:{settings.embed_dimensions}"
+                if settings.embed_dimensions else settings.openai_embed_deployment),
+    path=os.path.join(settings.index_state_dir, "embeddings.sqlite"),
+    memory_items=settings.embed_cache_memory_items,
+    limiter=embed_rate_limiter,
+    query_limiter=embed_query_limiter,
 )
 
-# VectorStore via Azure Cognitive Search
+# VectorStore via Azure Cognitive Search. Field vektor dibuat dengan dimensi embedding
+# yang sama dengan query, plus kuantisasi sesuai SEARCH_VECTOR_COMPRESSION
+vector_dimensions = (embedding_dimensions(settings.openai_embed_deployment, settings.embed_dimensions)
+                     or len(embeddings.embed_query("Text")))
 vectorstore = AzureSearch(
     azure_search_endpoint=settings.search_endpoint,
     azure_search_key=settings.search_key,
     index_name=settings.search_index,
-    embedding_function=embeddings.embed_query,
+    embedding_function=embeddings,
+    fields=index_fields(vector_dimensions),
+    vector_search=vector_search_config(settings.search_vector_compression, settings.search_vector_oversampling),
 )
 retriever = vectorstore.as_retriever()
 
+# Schema live di-cache per proses; TTL supaya field yang ditambahkan migrasi ikut terkirim
+# tanpa restart, dan kegagalan baca schema tidak diulang setiap batch
+SEARCH_SCHEMA_TTL_SECONDS = 300.0
+SEARCH_SCHEMA_RETRY_SECONDS = 30.0
+_search_index_schema: Dict[str, Any] = {"fields": None, "expires": 0.0}
+
+def search_index_field_names() -> Optional[set]:
+    """Nama field index yang sedang dipakai (dibaca dari schema live, di-cache dengan TTL). Index
+    lama yang belum dimigrasi tidak punya field bertipe (source, prefix, ...), jadi writer tidak
+    boleh mengirimnya. Return None jika schema gagal dibaca (dicoba lagi setelah backoff)."""
+    now = time.monotonic()
+    if now >= _search_index_schema["expires"]:
+        try:
+            from azure.search.documents.indexes import SearchIndexClient
+
+            index = SearchIndexClient(
+                endpoint=settings.search_endpoint,
+                credential=AzureKeyCredential(settings.search_key),
+            ).get_index(settings.search_index)
+            _search_index_schema.update(fields={field.name for field in index.fields},
+                                        expires=now + SEARCH_SCHEMA_TTL_SECONDS)
+        except Exception as e:
+            print(f"Failed to read search index schema: {e}")
+            _search_index_schema.update(fields=None, expires=now + SEARCH_SCHEMA_RETRY_SECONDS)
+    return _search_index_schema["fields"]
+
+def invalidate_search_index_fields():
+    """Paksa schema dibaca ulang (dipanggil setelah migrasi index)."""
+    _search_index_schema["expires"] = 0.0
+
 # Blob
 blob_service = BlobServiceClient.from_connection_string(settings.blob_conn)
 blob_container = blob_service.get_container_client(settings.blob_container)
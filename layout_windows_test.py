@@ -0,0 +1,106 @@
+import importlib
+import sys
+from types import SimpleNamespace as NS
+
+import pytest
+
+pytest.importorskip("pydantic")
+pytest.importorskip("tiktoken")
+pytest.importorskip("depedencies")
+
+from benchmarks._fakes import (FakeBlobContainer, FakeDocClient, FakeEmbeddings, FakeSearchClient,  # noqa: E402
+                               fake_pdf, install_fake_core, load_settings)
+
+
+class FakeHttpError(Exception):
+    """Bentuk HttpResponseError azure-core yang dibaca `_is_page_range_error`: `.error.code/.message`."""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.error = NS(code=code, message=message, innererror=None)
+
+
+class ShortDocClient(FakeDocClient):
+    """Dokumen sebenarnya hanya `actual_pages` halaman; window di luar itu ditolak service."""
+
+    def __init__(self, actual_pages, beyond_error):
+        super().__init__(paragraphs_per_page=2, tables_per_page=0)
+        self.actual_pages = actual_pages
+        self.beyond_error = beyond_error
+        self.requested = []
+
+    def begin_analyze_document(self, model, document=None, pages=None, **kwargs):
+        self.requested.append(pages)
+        if int(pages.partition("-")[0]) > self.actual_pages:
+            raise self.beyond_error
+        data = document.read().replace(b"/Count 25", b"/Count %d" % self.actual_pages)
+        return super().begin_analyze_document(model, document=data, pages=pages)
+
+
+@pytest.fixture
+def rag(tmp_path):
+    settings = load_settings()
+    settings.index_state_dir = str(tmp_path)
+    settings.docint_window_pages = 10
+    settings.docint_window_concurrency = 1
+    doc_client = ShortDocClient(12, None)
+    core = install_fake_core(settings, FakeBlobContainer(0, 0), doc_client, FakeEmbeddings(), FakeSearchClient())
+    sys.modules.pop("rag_modul", None)
+    module = importlib.import_module("rag_modul")
+    yield module, core.doc_client
+    sys.modules.pop("rag_modul", None)
+    sys.modules.pop("internal_assistant_core", None)
+
+
+def _cached_windows(module, source):
+    sha = module._content_digest(source, "sha256")
+    return [pages for pages in ("1-10", "11-20", "21-25")
+            if module.layout_cache.get(module.layout_cache.make_key(sha, module.settings.docint_model, pages))]
+
+
+def test_page_range_error_after_short_window_ends_document(rag):
+    module, doc_client = rag
+    # Jumlah halaman dari PDF (25) terlalu besar; service hanya punya 12 halaman
+    doc_client.beyond_error = FakeHttpError("InvalidArgument", "Invalid page range: the document has 12 pages.")
+    source = fake_pdf(1, 25)
+
+    layouts = list(module._LayoutWindows(source))
+
+    assert [layout["page_count"] for layout in layouts] == [10, 2, 0]
+    assert doc_client.requested == ["1-10", "11-20", "21-25"]
+    # Window yang ditolak tidak di-cache, window sukses di-cache
+    assert _cached_windows(module, source) == ["1-10", "11-20"]
+
+
+def test_transient_error_is_raised_and_not_cached(rag):
+    module, doc_client = rag
+    doc_client.beyond_error = FakeHttpError("ServiceUnavailable", "Service unavailable, please retry the page later.")
+    source = fake_pdf(2, 25)
+    windows = module._LayoutWindows(source)
+
+    assert next(windows)["page_count"] == 10
+    assert next(windows)["page_count"] == 2
+    with pytest.raises(FakeHttpError):
+        next(windows)
+    assert _cached_windows(module, source) == ["1-10", "11-20"]
+
+
+def test_page_range_error_after_full_window_is_raised(rag):
+    module, doc_client = rag
+    # Window sebelumnya penuh: penolakan page range bukan tanda akhir dokumen
+    doc_client.actual_pages = 10
+    doc_client.beyond_error = FakeHttpError("InvalidArgument", "Invalid page range.")
+    windows = module._LayoutWindows(fake_pdf(3, 25))
+
+    assert next(windows)["page_count"] == 10
+    with pytest.raises(FakeHttpError):
+        next(windows)
+
+
+def test_is_page_range_error(rag):
+    module, _ = rag
+
+    assert module._is_page_range_error(FakeHttpError("InvalidParameter", "The pages parameter is invalid."))
+    assert not module._is_page_range_error(FakeHttpError("InvalidArgument", "Invalid model id."))
+    assert not module._is_page_range_error(FakeHttpError("ServiceUnavailable", "Invalid page range."))
+    assert not module._is_page_range_error(TimeoutError("page 3 timed out"))
@@ -0,0 +1,321 @@
+# local_extractors.py - Ekstraksi lokal (tanpa Document Intelligence) untuk format teks native
+# Output sama dengan layout ringkas Document Intelligence (lihat rag_modul._compact_layout):
+#   {"page_count": int, "paragraphs": [[content, role], ...], "tables": [[[row, col, content], ...], ...]}
+# sehingga chunking menghasilkan struktur sections/raw_tables/document_structure yang sama.
+import os
+import posixpath
+import re
+import zipfile
+from io import BytesIO
+from typing import IO, Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+from xml.etree import ElementTree as ET
+
+MIME_TYPES = {
+    ".pdf": "application/pdf",
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    ".doc": "application/msword",
+    ".txt": "text/plain",
+    ".pptx": "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+}
+
+DEFAULT_MIME = "application/octet-stream"
+
+Source = Union[bytes, IO[bytes]]
+Layout = Dict[str, Any]
+
+# mime type -> (nama extractor, fungsi source -> iterator layout)
+_EXTRACTORS: Dict[str, Tuple[str, Callable[[Source], Iterator[Layout]]]] = {}
+
+
+def detect_mime(path: str) -> str:
+    """Detect MIME type from file extension"""
+    ext = (os.path.splitext(path)[1] or "").lower()
+    return MIME_TYPES.get(ext, DEFAULT_MIME)
+
+
+def resolve_mime(name: str, content_type: Optional[str] = None) -> str:
+    """Content type blob jika spesifik, selain itu tebak dari ekstensi nama blob."""
+    if content_type and content_type.split(";")[0].strip() not in ("", DEFAULT_MIME):
+        return content_type.split(";")[0].strip().lower()
+    return detect_mime(name)
+
+
+def register_extractor(name: str, *mime_types: str):
+    """Decorator: daftarkan extractor lokal untuk satu atau beberapa MIME type."""
+    def decorator(func: Callable[[Source], Iterator[Layout]]):
+        for mime in mime_types:
+            _EXTRACTORS[mime] = (name, func)
+        return func
+    return decorator
+
+
+def get_extractor(mime: str) -> Optional[Tuple[str, Callable[[Source], Iterator[Layout]]]]:
+    """(nama, fungsi) extractor lokal untuk MIME type, atau None (pakai Document Intelligence)."""
+    return _EXTRACTORS.get(mime)
+
+
+def _read_bytes(source: Source) -> bytes:
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    source.seek(0)
+    return source.read()
+
+
+def _open_zip(source: Source) -> zipfile.ZipFile:
+    if isinstance(source, (bytes, bytearray)):
+        return zipfile.ZipFile(BytesIO(source))
+    source.seek(0)
+    return zipfile.ZipFile(source)
+
+
+def _layout(paragraphs: List[List[Any]], tables: List[List[List[Any]]], page_count: int = 1) -> Layout:
+    return {"page_count": page_count, "paragraphs": paragraphs, "tables": tables}
+
+
+# ---------- Plain text ----------
+_BLANK_LINES = re.compile(r"\n\s*\n")
+
+
+@register_extractor("text", "text/plain")
+def extract_text(source: Source) -> Iterator[Layout]:
+    data = _read_bytes(source)
+    for encoding in ("utf-8-sig", "cp1252"):
+        try:
+            text = data.decode(encoding)
+            break
+        except UnicodeDecodeError:
+            continue
+    else:
+        text = data.decode("latin-1")
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    paragraphs = [[block.strip(), None] for block in _BLANK_LINES.split(text) if block.strip()]
+    yield _layout(paragraphs, [])
+
+
+# ---------- Office Open XML helpers ----------
+_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+
+def _relationships(archive: zipfile.ZipFile, part: str) -> Dict[str, str]:
+    """Relationship ID -> path part di dalam zip (relatif terhadap folder `part`)."""
+    folder, filename = posixpath.split(part)
+    rels_path = posixpath.join(folder, "_rels", filename + ".rels")
+    if rels_path not in archive.namelist():
+        return {}
+    targets = {}
+    for rel in ET.fromstring(archive.read(rels_path)).iter(f"{{{_PKG_REL_NS}}}Relationship"):
+        target = rel.get("Target", "")
+        path = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join(folder, target))
+        targets[rel.get("Id")] = path
+    return targets
+
+
+def _app_pages(archive: zipfile.ZipFile, tag: str) -> Optional[int]:
+    """Jumlah halaman/slide dari docProps/app.xml jika tersedia."""
+    try:
+        root = ET.fromstring(archive.read("docProps/app.xml"))
+    except (KeyError, ET.ParseError):
+        return None
+    for element in root:
+        if element.tag.endswith("}" + tag) and (element.text or "").isdigit():
+            return int(element.text)
+    return None
+
+
+# ---------- DOCX ----------
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+def _docx_text(element: ET.Element) -> str:
+    parts = []
+    for node in element.iter():
+        if node.tag == _W + "t":
+            parts.append(node.text or "")
+        elif node.tag == _W + "tab":
+            parts.append("\t")
+        elif node.tag in (_W + "br", _W + "cr"):
+            parts.append("\n")
+    return "".join(parts)
+
+
+def _docx_role(paragraph: ET.Element) -> Optional[str]:
+    style = paragraph.find(f"{_W}pPr/{_W}pStyle")
+    name = (style.get(_W + "val") if style is not None else "") or ""
+    lowered = name.lower()
+    if lowered == "title":
+        return "title"
+    if lowered.startswith("heading") or lowered.startswith("judul"):
+        return "sectionHeading"
+    return None
+
+
+def _docx_table(table: ET.Element) -> List[List[Any]]:
+    cells = []
+    for row_index, row in enumerate(table.findall(f"{_W}tr")):
+        column = 0
+        for cell in row.findall(f"{_W}tc"):
+            span = cell.find(f"{_W}tcPr/{_W}gridSpan")
+            text = "\n".join(t for t in (_docx_text(p).strip() for p in cell.iter(_W + "p")) if t)
+            cells.append([row_index, column, text])
+            column += int(span.get(_W + "val", "1")) if span is not None else 1
+    return cells
+
+
+@register_extractor("docx", MIME_TYPES[".docx"])
+def extract_docx(source: Source) -> Iterator[Layout]:
+    with _open_zip(source) as archive:
+        body = ET.fromstring(archive.read("word/document.xml")).find(f"{_W}body")
+        page_count = _app_pages(archive, "Pages") or 1
+
+    paragraphs, tables = [], []
+
+    def walk(container: ET.Element):
+        for block in container:
+            if block.tag == _W + "p":
+                text = _docx_text(block).strip()
+                if text:
+                    paragraphs.append([text, _docx_role(block)])
+            elif block.tag == _W + "tbl":
+                tables.append(_docx_table(block))
+            elif block.tag == _W + "sdt":  # content control (mis. daftar isi otomatis)
+                content = block.find(f"{_W}sdtContent")
+                if content is not None:
+                    walk(content)
+
+    if body is not None:
+        walk(body)
+    yield _layout(paragraphs, tables, page_count)
+
+
+# ---------- XLSX ----------
+_S = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_CELL_REF = re.compile(r"([A-Z]+)(\d+)")
+
+
+def _column_index(letters: str) -> int:
+    index = 0
+    for letter in letters:
+        index = index * 26 + (ord(letter) - 64)
+    return index - 1
+
+
+def _xlsx_shared_strings(archive: zipfile.ZipFile) -> List[str]:
+    if "xl/sharedStrings.xml" not in archive.namelist():
+        return []
+    root = ET.fromstring(archive.read("xl/sharedStrings.xml"))
+    return ["".join(t.text or "" for t in item.iter(_S + "t")) for item in root.findall(f"{_S}si")]
+
+
+def _xlsx_sheet_cells(archive: zipfile.ZipFile, path: str, shared: List[str]) -> List[List[Any]]:
+    cells = []
+    with archive.open(path) as f:
+        # iterparse: sheet besar tidak dimuat sebagai satu tree
+        for _, element in ET.iterparse(f):
+            if element.tag != _S + "c":
+                if element.tag == _S + "row":
+                    element.clear()
+                continue
+            ref = _CELL_REF.match(element.get("r", ""))
+            kind = element.get("t")
+            if kind == "inlineStr":
+                value = "".join(t.text or "" for t in element.iter(_S + "t"))
+            else:
+                v = element.find(f"{_S}v")
+                value = v.text if v is not None and v.text is not None else ""
+                if kind == "s" and value.isdigit() and int(value) < len(shared):
+                    value = shared[int(value)]
+                elif kind == "b":
+                    value = "TRUE" if value == "1" else "FALSE"
+            if ref and value.strip():
+                cells.append([int(ref.group(2)) - 1, _column_index(ref.group(1)), value.strip()])
+    if not cells:
+        return []
+    # Normalisasi supaya baris pertama yang berisi data jadi header (row 0)
+    first_row = min(c[0] for c in cells)
+    first_column = min(c[1] for c in cells)
+    return [[row - first_row, column - first_column, value] for row, column, value in cells]
+
+
+@register_extractor("xlsx", MIME_TYPES[".xlsx"])
+def extract_xlsx(source: Source) -> Iterator[Layout]:
+    paragraphs, tables = [], []
+    with _open_zip(source) as archive:
+        shared = _xlsx_shared_strings(archive)
+        rels = _relationships(archive, "xl/workbook.xml")
+        workbook = ET.fromstring(archive.read("xl/workbook.xml"))
+        sheets = workbook.findall(f"{_S}sheets/{_S}sheet")
+        for sheet in sheets:
+            path = rels.get(sheet.get(f"{{{_REL_NS}}}id"))
+            if not path or path not in archive.namelist():
+                continue
+            cells = _xlsx_sheet_cells(archive, path, shared)
+            if cells:
+                # Nama sheet jadi heading section, isinya tabel
+                paragraphs.append([f"Sheet: {sheet.get('name', '')}", "sectionHeading"])
+                tables.append(cells)
+    yield _layout(paragraphs, tables, max(1, len(sheets)))
+
+
+# ---------- PPTX ----------
+_A = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+_P = "{http://schemas.openxmlformats.org/presentationml/2006/main}"
+
+
+def _pptx_paragraphs(element: ET.Element) -> List[str]:
+    texts = []
+    for paragraph in element.iter(_A + "p"):
+        text = "".join(node.text or "" for node in paragraph.iter() if node.tag == _A + "t").strip()
+        if text:
+            texts.append(text)
+    return texts
+
+
+def _pptx_table(table: ET.Element) -> List[List[Any]]:
+    cells = []
+    for row_index, row in enumerate(table.findall(f"{_A}tr")):
+        column = 0
+        for cell in row.findall(f"{_A}tc"):
+            if cell.get("hMerge") != "1" and cell.get("vMerge") != "1":
+                cells.append([row_index, column, "\n".join(_pptx_paragraphs(cell))])
+            column += 1
+    return cells
+
+
+def _pptx_shapes(tree: ET.Element, paragraphs: List[List[Any]], tables: List[List[List[Any]]]):
+    for shape in tree:
+        if shape.tag == _P + "sp":
+            placeholder = shape.find(f"{_P}nvSpPr/{_P}nvPr/{_P}ph")
+            kind = placeholder.get("type") if placeholder is not None else None
+            texts = _pptx_paragraphs(shape)
+            if not texts:
+                continue
+            if kind in ("title", "ctrTitle"):
+                paragraphs.append([" ".join(texts), "title" if kind == "ctrTitle" else "sectionHeading"])
+            else:
+                paragraphs.extend([text, None] for text in texts)
+        elif shape.tag == _P + "graphicFrame":
+            for table in shape.iter(_A + "tbl"):
+                tables.append(_pptx_table(table))
+        elif shape.tag == _P + "grpSp":
+            _pptx_shapes(shape, paragraphs, tables)
+
+
+@register_extractor("pptx", MIME_TYPES[".pptx"])
+def extract_pptx(source: Source) -> Iterator[Layout]:
+    paragraphs, tables = [], []
+    with _open_zip(source) as archive:
+        rels = _relationships(archive, "ppt/presentation.xml")
+        presentation = ET.fromstring(archive.read("ppt/presentation.xml"))
+        slide_paths = [rels.get(slide.get(f"{{{_REL_NS}}}id"))
+                       for slide in presentation.findall(f"{_P}sldIdLst/{_P}sldId")]
+        slide_paths = [path for path in slide_paths if path and path in archive.namelist()]
+        for path in slide_paths:
+            tree = ET.fromstring(archive.read(path)).find(f"{_P}cSld/{_P}spTree")
+            if tree is not None:
+                _pptx_shapes(tree, paragraphs, tables)
+    yield _layout(paragraphs, tables, max(1, len(slide_paths)))
@@ -0,0 +1,214 @@
+# near_duplicates.py - Deteksi chunk near-duplicate lintas dokumen (MinHash + LSH, SQLite)
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from array import array
+from typing import Any, Dict, List, Optional
+
+_WORD_PATTERN = re.compile(r"\w+")
+_MAX_HASH = (1 << 64) - 1
+
+
+class NearDuplicateIndex:
+    """Signature MinHash per chunk yang sudah ter-index, dengan LSH banding di SQLite.
+
+    Signature dibuat dengan one-permutation hashing: setiap shingle (n kata) di-hash
+    sekali dan masuk ke salah satu `num_bins` bin, nilai minimum per bin jadi
+    signature (bin kosong diisi dari bin berikutnya). Estimasi Jaccard = porsi bin
+    yang sama. LSH memecah signature jadi `bands` band; kandidat = chunk yang punya
+    minimal satu band identik, lalu diverifikasi terhadap `threshold`.
+
+    Hanya chunk canonical (di-embed dengan teksnya sendiri) yang masuk bucket LSH.
+    Chunk yang di-skip karena duplikat dicatat beserta canonical-nya, supaya dokumen
+    yang bergantung bisa di-index ulang jika canonical-nya berubah atau dihapus.
+    """
+
+    def __init__(self, path: str, threshold: float = 0.9, num_bins: int = 64, bands: int = 16,
+                 shingle_words: int = 5, min_words: int = 20):
+        if num_bins % bands:
+            raise ValueError("num_bins must be a multiple of bands")
+        self.path = path
+        self.threshold = threshold
+        self.num_bins = num_bins
+        self.bands = bands
+        self.rows = num_bins // bands
+        self.shingle_words = shingle_words
+        self.min_words = min_words
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    # ---------- storage ----------
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS chunk_signatures (
+                    chunk_id      TEXT PRIMARY KEY,
+                    source        TEXT NOT NULL,
+                    signature     BLOB NOT NULL,
+                    embedding_key TEXT,
+                    canonical_id  TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_signatures_source ON chunk_signatures (source);
+                CREATE INDEX IF NOT EXISTS idx_signatures_canonical ON chunk_signatures (canonical_id);
+                CREATE TABLE IF NOT EXISTS lsh_buckets (
+                    band     INTEGER NOT NULL,
+                    bucket   INTEGER NOT NULL,
+                    chunk_id TEXT NOT NULL,
+                    PRIMARY KEY (band, bucket, chunk_id)
+                );
+                CREATE INDEX IF NOT EXISTS idx_buckets_chunk ON lsh_buckets (chunk_id);
+                """
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    # ---------- signature ----------
+    def signature(self, text: str) -> Optional[array]:
+        """MinHash signature teks, atau None jika teks terlalu pendek untuk dibandingkan."""
+        words = _WORD_PATTERN.findall(text.lower())
+        if len(words) < max(self.min_words, self.shingle_words):
+            return None
+
+        bins = [_MAX_HASH] * self.num_bins
+        n = self.shingle_words
+        for i in range(len(words) - n + 1):
+            h = int.from_bytes(hashlib.blake2b(" ".join(words[i:i + n]).encode("utf-8"), digest_size=8).digest(), "big")
+            b = h % self.num_bins
+            if h < bins[b]:
+                bins[b] = h
+
+        # Densifikasi: bin kosong ambil nilai bin terisi berikutnya (melingkar)
+        filled = [i for i, v in enumerate(bins) if v != _MAX_HASH]
+        if len(filled) < self.num_bins:
+            for i in range(self.num_bins):
+                if bins[i] == _MAX_HASH:
+                    donor = next((j for j in filled if j > i), filled[0])
+                    bins[i] = bins[donor]
+        return array("Q", bins)
+
+    def similarity(self, a: array, b: array) -> float:
+        return sum(1 for x, y in zip(a, b) if x == y) / self.num_bins
+
+    def _band_buckets(self, signature: array) -> List[int]:
+        buckets = []
+        for band in range(self.bands):
+            part = signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            digest = hashlib.blake2b(part, digest_size=8, person=band.to_bytes(2, "big")).digest()
+            buckets.append(int.from_bytes(digest, "big", signed=True))
+        return buckets
+
+    # ---------- lookup ----------
+    def find(self, signature: array, exclude_source: Optional[str] = None,
+             max_candidates: int = 20) -> Optional[Dict[str, Any]]:
+        """Canonical chunk paling mirip (>= threshold) dari dokumen lain, atau None."""
+        buckets = self._band_buckets(signature)
+        with self._lock:
+            conn = self._connect()
+            clauses = " OR ".join("(b.band = ? AND b.bucket = ?)" for _ in buckets)
+            params: List[Any] = [v for band, bucket in enumerate(buckets) for v in (band, bucket)]
+            query = (
+                "SELECT s.chunk_id, s.source, s.signature, s.embedding_key, COUNT(*) AS hits "
+                f"FROM lsh_buckets b JOIN chunk_signatures s ON s.chunk_id = b.chunk_id WHERE ({clauses})"
+            )
+            if exclude_source is not None:
+                query += " AND s.source != ?"
+                params.append(exclude_source)
+            query += " GROUP BY s.chunk_id ORDER BY hits DESC LIMIT ?"
+            params.append(max_candidates)
+            rows = conn.execute(query, params).fetchall()
+
+        best = None
+        for chunk_id, source, blob, embedding_key, _ in rows:
+            candidate = array("Q")
+            candidate.frombytes(blob)
+            score = self.similarity(signature, candidate)
+            if score >= self.threshold and (best is None or score > best["similarity"]):
+                best = {"chunk_id": chunk_id, "source": source, "embedding_key": embedding_key, "similarity": score}
+        return best
+
+    # ---------- update ----------
+    def replace_source(self, source: str, canonical: List[Dict[str, Any]],
+                       duplicates: List[Dict[str, Any]]) -> List[str]:
+        """Ganti semua entry `source` dengan hasil indexing terbaru.
+
+        `canonical`: [{"chunk_id", "signature", "embedding_key"}] untuk chunk yang di-embed sendiri.
+        `duplicates`: [{"chunk_id", "signature", "canonical_id"}] untuk chunk yang tidak disimpan.
+        Return source lain yang punya duplikat bergantung pada canonical lama yang
+        berubah/hilang (perlu di-index ulang).
+        """
+        new_signatures = {c["chunk_id"]: c["signature"].tobytes() for c in canonical}
+        with self._lock:
+            conn = self._connect()
+            old = conn.execute(
+                "SELECT chunk_id, signature FROM chunk_signatures WHERE source = ? AND canonical_id IS NULL",
+                (source,),
+            ).fetchall()
+            changed = [chunk_id for chunk_id, blob in old if new_signatures.get(chunk_id) != blob]
+            dependents = self._dependents(conn, changed, source)
+            self._delete_source(conn, source)
+
+            conn.executemany(
+                "INSERT OR REPLACE INTO chunk_signatures (chunk_id, source, signature, embedding_key, canonical_id) "
+                "VALUES (?, ?, ?, ?, NULL)",
+                [(c["chunk_id"], source, c["signature"].tobytes(), c.get("embedding_key")) for c in canonical],
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO lsh_buckets (band, bucket, chunk_id) VALUES (?, ?, ?)",
+                [(band, bucket, c["chunk_id"])
+                 for c in canonical for band, bucket in enumerate(self._band_buckets(c["signature"]))],
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO chunk_signatures (chunk_id, source, signature, embedding_key, canonical_id) "
+                "VALUES (?, ?, ?, NULL, ?)",
+                [(d["chunk_id"], source, d["signature"].tobytes(), d["canonical_id"]) for d in duplicates],
+            )
+            conn.commit()
+        return dependents
+
+    def remove_source(self, source: str) -> List[str]:
+        """Hapus semua entry `source`. Return source lain yang duplikatnya bergantung padanya."""
+        with self._lock:
+            conn = self._connect()
+            canonical_ids = [r[0] for r in conn.execute(
+                "SELECT chunk_id FROM chunk_signatures WHERE source = ? AND canonical_id IS NULL", (source,)
+            ).fetchall()]
+            dependents = self._dependents(conn, canonical_ids, source)
+            self._delete_source(conn, source)
+            conn.commit()
+        return dependents
+
+    @staticmethod
+    def _dependents(conn: sqlite3.Connection, canonical_ids: List[str], source: str) -> List[str]:
+        found = set()
+        for i in range(0, len(canonical_ids), 500):
+            part = canonical_ids[i:i + 500]
+            rows = conn.execute(
+                f"SELECT DISTINCT source FROM chunk_signatures WHERE canonical_id IN ({','.join('?' * len(part))})",
+                part,
+            ).fetchall()
+            found.update(r[0] for r in rows)
+        found.discard(source)
+        return sorted(found)
+
+    @staticmethod
+    def _delete_source(conn: sqlite3.Connection, source: str):
+        conn.execute(
+            "DELETE FROM lsh_buckets WHERE chunk_id IN (SELECT chunk_id FROM chunk_signatures WHERE source = ?)",
+            (source,),
+        )
+        conn.execute("DELETE FROM chunk_signatures WHERE source = ?", (source,))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(canonical_id IS NOT NULL), 0) FROM chunk_signatures"
+            ).fetchone()
+        return {"signatures_stored": row[0], "duplicates_tracked": row[1]}
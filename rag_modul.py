@@ -1,482 +1,1314 @@
 from depedencies import *
 # Language detection removed - not needed for core functionality
-from internal_assistant_core import llm, retriever, vectorstore, blob_container, doc_client, settings
+from internal_assistant_core import (llm, retriever, vectorstore, embeddings, blob_container, doc_client, settings,
+                                     search_upload_limiter, search_index_field_names)
+from index_writer import IndexWriter, SEARCH_MAX_BATCH_DOCS
+from doc_chunking import (
+    tokenizer, tiktoken_len, _clean_text, _classify_content_type, _layout_to_doc_data,
+    _create_intelligent_chunks, _process_section_intelligently, _split_large_table,
+    _deduplicate_chunks, _iter_chunks_from_layouts, encode_layouts, chunk_encoded_layouts, init_chunk_worker,
+)
+from index_manifest import IndexManifest
+from docint_cache import LayoutCache
+from near_duplicates import NearDuplicateIndex
+from index_checkpoint import IndexRunLog
+from local_extractors import get_extractor, resolve_mime
+from docint_scheduler import AnalysisScheduler
+from dead_letter import DeadLetterRetryWorker, DeadLetterStore
+from doc_summaries import DocumentOutline, DocumentSummaryStore, format_summary
+from table_store import TableStore, format_table_rows
+from search_schema import prefix_filter, source_prefixes
 import base64
 import re
-import tiktoken
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from typing import Dict, List, Any, Optional
+from typing import IO, Callable, Dict, Iterator, List, Any, Optional, Tuple, Union
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
 import hashlib
 import time
 import sys
 from io import BytesIO
 import contextlib
+import tempfile
+import queue
+import threading
+import itertools
 
-tokenizer = tiktoken.get_encoding("cl100k_base")
-def tiktoken_len(text):
-    return len(tokenizer.encode(text))
+index_manifest = IndexManifest(os.path.join(settings.index_state_dir, "manifest.sqlite"))
+index_run_log = IndexRunLog(os.path.join(settings.index_state_dir, "runs.sqlite"))
+near_duplicates = NearDuplicateIndex(os.path.join(settings.index_state_dir, "near_duplicates.sqlite"),
+                                     threshold=settings.index_near_dup_threshold)
+layout_cache = LayoutCache(os.path.join(settings.index_state_dir, "docint_cache"),
+                           max_bytes=settings.docint_cache_max_mb * 1024 * 1024)
+docint_scheduler = AnalysisScheduler(max_in_flight=settings.docint_max_in_flight,
+                                     poll_seconds=settings.docint_poll_seconds)
+dead_letters = DeadLetterStore(os.path.join(settings.index_state_dir, "dead_letters.sqlite"),
+                               max_attempts=settings.index_retry_max_attempts,
+                               backoff_seconds=settings.index_retry_backoff_seconds,
+                               max_backoff_seconds=settings.index_retry_max_backoff_seconds)
+doc_summaries = DocumentSummaryStore(os.path.join(settings.index_state_dir, "doc_summaries.sqlite"))
+table_store = TableStore(os.path.join(settings.index_state_dir, "tables.sqlite"))
 
 def _make_safe_doc_id(blob_name: str) -> str:
     return base64.urlsafe_b64encode(blob_name.encode()).decode()
 
-# === Advanced text cleaning dengan preserve struktur ===
-def _clean_text(text: str) -> str:
-    if not text:
-        return ""
-    
-    # Preserve struktur dokumen yang penting
-    txt = text.replace("\u00a0", " ")            # Non-breaking space
-    txt = re.sub(r"[•●▪∙◦]", "- ", txt)          # Bullet points dengan spasi
-    txt = re.sub(r'[ \t]+', ' ', txt)            # Multiple spaces jadi single space
-    txt = re.sub(r'\n{4,}', '\n\n\n', txt)       # Max 3 newlines berturut-turut
-    
-    # Preserve numbering dan struktur hierarki
-    txt = re.sub(r'(\d+)\.(\s*)', r'\1. ', txt)  # Normalize numbering
-    txt = re.sub(r'(\d+\.\d+)\.(\s*)', r'\1. ', txt)  # Sub-numbering
-    
-    return txt.strip()
-
 # === Ekstraksi teks yang comprehensive dan general ===
 
-def _extract_text_with_docint(binary: bytes) -> Dict[str, List[Dict[str, Any]]]:
+def _compact_layout(res) -> Dict[str, Any]:
+    """Ringkas AnalyzeResult jadi struktur JSON-able yang kecil (untuk cache & reuse).
+
+    paragraphs: [[content, role], ...] sesuai urutan asli
+    tables: [[[row_index, column_index, content], ...], ...]
+    """
+    return {
+        "page_count": len(res.pages) if getattr(res, "pages", None) else 0,
+        "paragraphs": [
+            [para.content, getattr(para, "role", None)]
+            for para in (getattr(res, "paragraphs", None) or [])
+        ],
+        "tables": [
+            [[cell.row_index, cell.column_index, cell.content] for cell in table.cells]
+            for table in (getattr(res, "tables", None) or [])
+        ],
+    }
+
+def _content_digest(source: Union[bytes, IO[bytes]], algorithm: str = "md5") -> str:
+    """Hash isi dokumen; file handle dibaca per blok lalu di-rewind."""
+    if isinstance(source, (bytes, bytearray)):
+        return hashlib.new(algorithm, source).hexdigest()
+    digest = hashlib.new(algorithm)
+    source.seek(0)
+    for block in iter(lambda: source.read(1024 * 1024), b""):
+        digest.update(block)
+    source.seek(0)
+    return digest.hexdigest()
+
+_PDF_PAGES_DICT_RE = re.compile(rb"<<[^<>]*?/Type\s*/Pages\b[^<>]*?>>")
+_PDF_COUNT_RE = re.compile(rb"/Count\s+(\d+)")
+
+def _detect_page_count(source: Union[bytes, IO[bytes]]) -> Optional[int]:
+    """Perkirakan jumlah halaman PDF dari dictionary `/Type /Pages ... /Count N`.
+
+    Return None untuk non-PDF atau PDF yang page tree-nya ada di object stream
+    terkompresi (dianalisis sekaligus tanpa fan-out).
+    """
+    def scan(data: bytes, found: List[int]):
+        for match in _PDF_PAGES_DICT_RE.finditer(data):
+            count = _PDF_COUNT_RE.search(match.group(0))
+            if count:
+                found.append(int(count.group(1)))
+
+    counts: List[int] = []
+    if isinstance(source, (bytes, bytearray)):
+        if not source.startswith(b"%PDF"):
+            return None
+        scan(source, counts)
+    else:
+        source.seek(0)
+        if source.read(4) != b"%PDF":
+            source.seek(0)
+            return None
+        tail = b""
+        for block in iter(lambda: source.read(1024 * 1024), b""):
+            data = tail + block
+            scan(data, counts)
+            tail = data[-4096:]  # overlap supaya dictionary di batas blok tetap terbaca
+        source.seek(0)
+    return max(counts) if counts else None
+
+def _page_windows(page_count: Optional[int]) -> List[Optional[str]]:
+    """Bagi dokumen panjang jadi page window (mis. "1-10", "11-20")."""
+    window = settings.docint_window_pages
+    if not page_count or not window or page_count <= window:
+        return [settings.docint_pages or None]
+    last_page = min(page_count, settings.docint_max_pages) if settings.docint_max_pages else page_count
+    return [f"{start}-{min(start + window - 1, last_page)}" for start in range(1, last_page + 1, window)]
+
+def _merge_layouts(layouts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Gabungkan layout per window (sudah urut halaman) jadi satu layout dokumen."""
+    merged = {"page_count": 0, "paragraphs": [], "tables": []}
+    for layout in layouts:
+        merged["page_count"] += layout["page_count"]
+        merged["paragraphs"].extend(layout["paragraphs"])
+        merged["tables"].extend(layout["tables"])
+    return merged
+
+_PAGE_RANGE_ERROR_CODES = {"InvalidArgument", "InvalidParameter", "InvalidRequest", "InvalidContentRange"}
+
+
+def _is_page_range_error(error: Exception) -> bool:
+    """True jika Document Intelligence menolak `pages` karena di luar jumlah halaman dokumen."""
+    detail = getattr(error, "error", None)
+    codes = {getattr(detail, "code", None)}
+    inner = getattr(detail, "innererror", None)
+    if inner is not None:
+        codes.add(inner.get("code") if isinstance(inner, dict) else getattr(inner, "code", None))
+    message = str(getattr(detail, "message", None) or error).lower()
+    return bool(codes & _PAGE_RANGE_ERROR_CODES) and "page" in message
+
+
+class _LayoutWindows:
+    """Iterator layout per page window (urut halaman) dari Document Intelligence.
+
+    Window awal langsung di-submit ke `docint_scheduler` saat dibuat, jadi analisis
+    sudah berjalan sebelum consumer mulai iterasi. Saat iterasi, window berikutnya
+    (maks `settings.docint_window_concurrency` di depan posisi sekarang) ikut di-submit.
+    """
+
+    def __init__(self, source: Union[bytes, IO[bytes]]):
+        self.source = source
+        self.model = settings.docint_model
+        self.content_sha = _content_digest(source, "sha256")
+        self.windows = _page_windows(_detect_page_count(source))
+        self.concurrency = max(1, settings.docint_window_concurrency)
+        self.analysis_seconds = 0.0
+        self._in_flight: Dict[int, Any] = {}
+        self._next_submit = 0
+        self._position = 0
+        self._previous: Optional[Dict[str, Any]] = None
+        self._fill()
+
+    def _submit(self, i: int):
+        cached = layout_cache.get(layout_cache.make_key(self.content_sha, self.model, self.windows[i]))
+        if cached is not None:
+            return cached
+
+        def begin():
+            # Dokumen besar dikirim sebagai file handle (spooled), bukan salinan bytes
+            if isinstance(self.source, (bytes, bytearray)):
+                document = BytesIO(self.source)
+            else:
+                self.source.seek(0)
+                document = self.source
+            # ✅ Force baca semua halaman (per window)
+            return doc_client.begin_analyze_document(self.model, document=document, pages=self.windows[i])
+
+        return docint_scheduler.submit(begin)
+
+    def _fill(self):
+        while self._next_submit < len(self.windows) and self._next_submit < self._position + self.concurrency:
+            self._in_flight[self._next_submit] = self._submit(self._next_submit)
+            self._next_submit += 1
+
+    def first_ready(self) -> Optional[Future]:
+        """Future analisis window pertama, atau None jika sudah tersedia (cache)."""
+        first = self._in_flight.get(0)
+        return first if isinstance(first, Future) else None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> Dict[str, Any]:
+        i = self._position
+        if i >= len(self.windows):
+            raise StopIteration
+        self._fill()
+        pending = self._in_flight.pop(i)
+        self._position += 1
+        if isinstance(pending, dict):
+            layout = pending
+        else:
+            try:
+                result = pending.result()
+            except Exception as e:
+                # Jumlah halaman hanya perkiraan: window setelah akhir dokumen boleh ditolak
+                # service (page range invalid). Error lain (mis. transient) tetap di-raise,
+                # dan layout kosong ini tidak di-cache.
+                if (self._previous is None or self._previous["page_count"] >= settings.docint_window_pages
+                        or not _is_page_range_error(e)):
+                    raise
+                layout = {"page_count": 0, "paragraphs": [], "tables": []}
+            else:
+                self.analysis_seconds += getattr(pending, "elapsed", 0.0)
+                layout = _compact_layout(result)
+                layout_cache.put(layout_cache.make_key(self.content_sha, self.model, self.windows[i]), layout)
+
+        self._previous = layout
+        # Lookahead langsung di-submit supaya analisis jalan selagi window ini di-chunk
+        self._fill()
+        return layout
+
+def _iter_layout_windows(source: Union[bytes, IO[bytes]]) -> Iterator[Dict[str, Any]]:
+    """Jalankan prebuilt-layout Document Intelligence dan yield layout per page window
+    sesuai urutan halaman, begitu window tersebut selesai. Cache on-disk per isi blob.
+
+    Dokumen yang lebih panjang dari `settings.docint_window_pages` dipecah per page
+    window. Semua analisis lewat `docint_scheduler`: dibatasi `settings.docint_max_in_flight`
+    lintas dokumen dan di-poll bersama, sehingga window dan dokumen lain tetap berjalan
+    paralel sementara consumer memproses window awal. Urutan halaman tetap dijaga
+    sehingga section & table ID stabil.
+    """
+    return _LayoutWindows(source)
+
+def _analyze_layout(source: Union[bytes, IO[bytes]]) -> Dict[str, Any]:
+    """Layout lengkap satu dokumen (semua page window digabung)."""
+    return _merge_layouts(list(_iter_layout_windows(source)))
+
+def _extract_text_with_docint(binary: Union[bytes, IO[bytes]]) -> Dict[str, List[Dict[str, Any]]]:
     """Extract structured text dengan metadata posisi dan context - GENERAL untuk semua dokumen."""
     try:
-        # ✅ Force baca semua halaman
-        poller = doc_client.begin_analyze_document(
-            "prebuilt-layout",
-            document=BytesIO(binary),   # lebih aman untuk file besar
-            pages="1-15"               # ambil semua halaman
-        )
-        res = poller.result()
+        layout = _analyze_layout(binary)
     except Exception as e:
         print(f"Error analyzing document: {e}")
         return {"sections": [], "raw_tables": [], "document_structure": []}
 
     # ✅ Debug jumlah halaman yang berhasil dibaca
-    if hasattr(res, "pages"):
-        print(f"✅ Document Intelligence extracted {len(res.pages)} pages")
+    print(f"✅ Document Intelligence extracted {layout['page_count']} pages")
+    return _layout_to_doc_data(layout)
 
-    processed = {
-        "sections": [],  # Semua bagian dengan metadata
-        "raw_tables": [],
-        "document_structure": []  # Struktur hierarki dokumen
-    }
+def _open_source_layouts(name: str, source: Union[bytes, IO[bytes]], mime: Optional[str] = None,
+                         on_done: Optional[Callable[[str, float, int], None]] = None
+                         ) -> Tuple[Iterator[Dict[str, Any]], Optional[Future]]:
+    """Mulai ekstraksi satu dokumen: extractor lokal (format teks native) atau Document
+    Intelligence (PDF, gambar, format lain). Jika extractor lokal gagal (mis. file rusak),
+    dokumen dikirim ke Document Intelligence.
+
+    Return (iterator layout per window, Future window pertama). Future None berarti
+    window pertama sudah siap (lokal/cache); selain itu analisis sudah di-submit dan
+    caller bisa menunggu Future tanpa memblok thread.
+    """
+    local = get_extractor(mime) if mime and settings.index_local_extractors else None
+    extractor = local[0] if local else "document_intelligence"
+    layouts: Optional[List[Dict[str, Any]]] = None
+    elapsed = 0.0
+    try:
+        if local:
+            started = time.perf_counter()
+            try:
+                layouts = list(local[1](source))
+            except Exception as e:
+                print(f"Local {extractor} extractor failed for {name}, using Document Intelligence: {e}")
+                extractor = "document_intelligence_fallback"
+            elapsed += time.perf_counter() - started
+        windows = iter(layouts) if layouts is not None else _iter_layout_windows(source)
+    except Exception:
+        _close_source(source)
+        raise
+    first_ready = getattr(windows, "first_ready", None)
+    ready = first_ready() if first_ready is not None else None
+    return _iter_source_layouts(name, source, windows, extractor, elapsed, on_done), ready
+
+def _iter_source_layouts(name: str, source: Union[bytes, IO[bytes]], windows: Iterator[Dict[str, Any]],
+                         extractor: str, elapsed: float = 0.0,
+                         on_done: Optional[Callable[[str, float, int], None]] = None) -> Iterator[Dict[str, Any]]:
+    """Yield layout per window dari `windows`. Source ditutup setelah window terakhir (atau saat dibatalkan).
+
+    `on_done(extractor, seconds, pages)` dipanggil di akhir dengan waktu ekstraksi total
+    (untuk Document Intelligence: total durasi analisis per window, submit sampai selesai).
+    """
+    pages = 0
+    try:
+        while True:
+            started = time.perf_counter()
+            layout = next(windows, None)
+            elapsed += time.perf_counter() - started
+            if layout is None:
+                break
+            pages += layout["page_count"]
+            yield layout
+    finally:
+        _close_source(source)
+        elapsed = getattr(windows, "analysis_seconds", None) or elapsed
+        if on_done is not None:
+            on_done(extractor, elapsed, pages)
+    # ✅ Debug jumlah halaman yang berhasil dibaca
+    print(f"✅ {extractor} extracted {pages} pages from {name} in {elapsed:.2f}s")
+
+# === Staged indexing pipeline (download -> extract -> chunk -> write) ===
+_STAGE_STOP = object()
+_STREAM_END = object()
+
+class _ChunkStream:
+    """Antrian chunk terbatas untuk satu dokumen, dari stage chunk ke stage write.
+
+    Stage chunk mem-`put` chunk begitu section tertutup sementara stage write sudah
+    meng-iterasi stream yang sama, sehingga embedding dimulai sebelum seluruh
+    dokumen selesai di-extract. Error producer di-raise ulang di sisi consumer.
+    """
 
-    current_section = None
-    section_counter = 0
+    def __init__(self, maxsize: int = 64):
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, maxsize))
+        self._cancelled = threading.Event()
+        self._error: Optional[BaseException] = None
 
-    # Process paragraphs dengan context dan posisi - GENERAL approach
-    if hasattr(res, "paragraphs"):
-        for idx, para in enumerate(res.paragraphs):
-            role = getattr(para, "role", None)
-            text = _clean_text(para.content)
-            if not text or len(text) < 10:  # Skip very short content
+    def put(self, chunk: Dict[str, Any]) -> bool:
+        """Blocking saat antrian penuh; False jika consumer sudah berhenti."""
+        while not self._cancelled.is_set():
+            try:
+                self._queue.put(chunk, timeout=0.5)
+                return True
+            except queue.Full:
                 continue
+        return False
+
+    def close(self, error: Optional[BaseException] = None):
+        self._error = error
+        self.put(_STREAM_END)
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        while True:
+            chunk = self._queue.get()
+            if chunk is _STREAM_END:
+                break
+            yield chunk
+        if self._error is not None:
+            raise self._error
+
+class _IndexRun:
+    """State bersama satu attempt indexing (counter report dilindungi lock).
+
+    Status setiap blob langsung di-checkpoint ke `run_log` supaya run bisa di-resume.
+    `on_progress` (opsional) dipanggil setelah setiap checkpoint blob (di-throttle).
+    """
+
+    PROGRESS_INTERVAL = 0.5
+
+    def __init__(self, run_log: Optional[IndexRunLog] = None, run_id: Optional[str] = None,
+                 on_progress: Optional[Callable[[], None]] = None):
+        self.run_log = run_log
+        self.run_id = run_id
+        self.on_progress = on_progress
+        self.lock = threading.Lock()
+        self.finished_blobs: set = set()
+        self._last_progress = 0.0
+        self.indexed = 0
+        self.skipped = 0
+        self.errors: List[str] = []
+        self.total_chunks = 0
+        self.unchanged = 0
+        self.written: Dict[str, Dict[str, Any]] = {}
+        self.requeue: set = set()
+        self.write_failed = 0
+        self.partial = 0
+        self.orphaned_chunks_deleted = 0
+        self.orphan_delete_failures: List[str] = []
+        self.extractions: Dict[str, Dict[str, Any]] = {}
+        self.near_dup = {
+            "chunks_checked": 0,
+            "near_duplicates": 0,
+            "chunks_not_stored": 0,
+            "tokens_not_embedded": 0,
+            "content_bytes_not_stored": 0,
+        }
+
+    def checkpoint_blob(self, name: str, status: str, chunks: int = 0, error: Optional[str] = None):
+        if self.run_log is not None:
+            self.run_log.record_blob(self.run_id, name, status, chunks, error)
+        with self.lock:
+            self.finished_blobs.add(name)
+        self.notify()
+
+    def notify(self, force: bool = False):
+        """Kirim snapshot progress, maksimal sekali per PROGRESS_INTERVAL kecuali `force`."""
+        if self.on_progress is None:
+            return
+        now = time.perf_counter()
+        with self.lock:
+            if not force and now - self._last_progress < self.PROGRESS_INTERVAL:
+                return
+            self._last_progress = now
+        try:
+            self.on_progress()
+        except Exception as e:
+            print(f"Progress callback failed: {e}")
 
-            content_type = _classify_content_type(text, role)
-            
-            section_data = {
-                "content": text,
-                "type": content_type,
-                "role": role,
-                "position": idx,
-                "tokens": tiktoken_len(text)
+    def skip(self, name: str, reason: str):
+        with self.lock:
+            self.skipped += 1
+        self.checkpoint_blob(name, "skipped", error=reason)
+        print(f"Skipped {name}: {reason}")
+
+    def error(self, name: str, exc: Exception):
+        with self.lock:
+            self.errors.append(f"{name}: {str(exc)}")
+        self.checkpoint_blob(name, "error", error=str(exc))
+        print(f"Error processing {name}: {exc}")
+
+    def unchanged_blob(self, name: str):
+        with self.lock:
+            self.unchanged += 1
+        self.checkpoint_blob(name, "unchanged")
+        print(f"Unchanged {name}: already indexed")
+
+    def extracted(self, name: str, extractor: str, seconds: float, pages: int):
+        with self.lock:
+            self.extractions[name] = {"extractor": extractor, "seconds": round(seconds, 3), "pages": pages}
+
+    def extraction_report(self) -> Dict[str, Any]:
+        """Extractor yang menangani setiap file + ringkasan per extractor."""
+        with self.lock:
+            files = dict(self.extractions)
+        summary: Dict[str, Dict[str, Any]] = {}
+        for entry in files.values():
+            total = summary.setdefault(entry["extractor"], {"files": 0, "pages": 0, "seconds": 0.0})
+            total["files"] += 1
+            total["pages"] += entry["pages"]
+            total["seconds"] = round(total["seconds"] + entry["seconds"], 3)
+        return {"summary": summary, "files": files}
+
+    def near_duplicate_checked(self, chunk: Dict[str, Any], match: Optional[Dict[str, Any]], stored: bool):
+        with self.lock:
+            self.near_dup["chunks_checked"] += 1
+            if match is None:
+                return
+            self.near_dup["near_duplicates"] += 1
+            if not stored:
+                self.near_dup["chunks_not_stored"] += 1
+                self.near_dup["tokens_not_embedded"] += chunk["tokens"]
+                self.near_dup["content_bytes_not_stored"] += len(chunk["content"].encode("utf-8"))
+
+    def requeue_sources(self, sources: List[str]):
+        """Dokumen yang duplikatnya bergantung pada canonical yang berubah: index ulang di run berikutnya."""
+        if sources:
+            with self.lock:
+                self.requeue.update(sources)
+
+    def done(self, job: Dict[str, Any], chunk_ids: List[str]):
+        with self.lock:
+            self.indexed += 1
+            self.total_chunks += len(chunk_ids)
+            self.written[job["name"]] = {
+                "etag": job.get("etag"),
+                "content_md5": job.get("content_md5"),
+                "chunk_ids": chunk_ids,
+                "summary": job.get("summary"),
+                "tables": job.get("tables"),
             }
+        print(f"Indexed {job['name']}: {len(chunk_ids)} chunks")
 
-            # Jika heading, mulai section baru
-            if content_type in ["title", "heading", "section_header", "chapter", "subsection"]:
-                if current_section:
-                    processed["sections"].append(current_section)
-                
-                current_section = {
-                    "header": text,
-                    "type": content_type,
-                    "content_parts": [section_data],
-                    "section_id": section_counter,
-                    "total_tokens": tiktoken_len(text)
-                }
-                section_counter += 1
-            else:
-                if current_section:
-                    current_section["content_parts"].append(section_data)
-                    current_section["total_tokens"] += tiktoken_len(text)
-                else:
-                    current_section = {
-                        "header": "Document Content",
-                        "type": "content",
-                        "content_parts": [section_data],
-                        "section_id": section_counter,
-                        "total_tokens": tiktoken_len(text)
-                    }
-                    section_counter += 1
-
-            processed["document_structure"].append(section_data)
-
-        if current_section:
-            processed["sections"].append(current_section)
-
-    # Process tables dengan context yang lebih baik
-    if hasattr(res, "tables"):
-        for table_idx, table in enumerate(res.tables):
-            rows = {}
-            headers = []
-            
-            for cell in table.cells:
-                content = _clean_text(cell.content)
-                if cell.row_index not in rows:
-                    rows[cell.row_index] = {}
-                rows[cell.row_index][cell.column_index] = content
-                
-                if cell.row_index == 0:
-                    headers.append(content)
-
-            table_rows = []
-            for r in sorted(rows.keys()):
-                row_data = [rows[r].get(c, "") for c in sorted(rows[r].keys())]
-                table_rows.append(" | ".join(row_data))
-            
-            table_text = "\n".join(table_rows)
-            
-            processed["raw_tables"].append({
-                "content": table_text,
-                "headers": headers,
-                "table_id": table_idx,
-                "tokens": tiktoken_len(table_text)
-            })
-
-    return processed
-
-
-def _classify_content_type(text: str, role: Optional[str] = None) -> str:
-    """Klasifikasi jenis konten GENERAL untuk semua jenis dokumen."""
-    text_upper = text.upper()
-    text_lower = text.lower()
-    
-    # Deteksi berdasarkan role
-    if role and "title" in role.lower():
-        return "title"
-    if role and "heading" in role.lower():
-        return "heading"
-    
-    # Pattern umum untuk berbagai bahasa dan jenis dokumen
-    # Table of Contents patterns
-    if any(keyword in text_upper for keyword in 
-           ["DAFTAR ISI", "TABLE OF CONTENTS", "CONTENTS", "INDEX", "INDEKS"]):
-        return "table_of_contents"
-    
-    # Chapter/Section patterns
-    if re.match(r'^(BAB|CHAPTER|SECTION|BAGIAN)\s*\d+', text_upper):
-        return "chapter"
-    
-    if re.match(r'^\d+\.', text.strip()):  # Dimulai dengan nomor
-        return "section_header"
-    
-    if re.match(r'^\d+\.\d+', text.strip()):  # Sub section
-        return "subsection_header"
-    
-    # Appendix patterns
-    if any(keyword in text_upper for keyword in 
-           ["APPENDIX", "LAMPIRAN", "ANNEX", "ATTACHMENT"]):
-        return "appendix"
-    
-    # General important sections
-    if any(keyword in text_upper for keyword in 
-           ["PURPOSE", "TUJUAN", "VISION", "VISI", "MISSION", "MISI", 
-            "OBJECTIVE", "SASARAN", "GOAL", "TARGET", "INTRODUCTION", 
-            "PENDAHULUAN", "OVERVIEW", "RINGKASAN", "SUMMARY",
-            "CONCLUSION", "KESIMPULAN", "RECOMMENDATION", "REKOMENDASI"]):
-        return "purpose_statement"
-    
-    # Procedure/Process patterns
-    if any(keyword in text_upper for keyword in 
-           ["PROCEDURE", "PROSEDUR", "PROCESS", "PROSES", "WORKFLOW",
-            "LANGKAH", "TAHAP", "STEPS", "CARA"]):
-        return "detailed_content"
-    
-    # Policy/Rule patterns
-    if any(keyword in text_upper for keyword in 
-           ["POLICY", "KEBIJAKAN", "RULE", "ATURAN", "REGULATION",
-            "REGULASI", "GUIDELINE", "PANDUAN"]):
-        return "detailed_content"
-    
-    # Long detailed content
-    if len(text.split()) > 100:
-        return "detailed_content"
-    
-    # Table content detection
-    if any(char in text for char in ["|", ":", "─", "┌", "└"]) or \
-       (text.count("|") > 2 and "\n" in text):
-        return "table_content"
-    
-    # List content
-    if text.count("- ") > 2 or text.count("• ") > 2:
-        return "content"
-    
-    return "content"
 
-# === Cost-optimized intelligent chunking strategy ===
-def _create_intelligent_chunks(doc_data: Dict[str, List[Dict]]) -> List[Dict[str, Any]]:
-    """Create chunks yang cost-efficient untuk Azure AI Search."""
-    chunks = []
-    
-    # Process sections dengan cost optimization
-    for section in doc_data.get("sections", []):
-        section_chunks = _process_section_intelligently(section)
-        chunks.extend(section_chunks)
-    
-    # Process tables sebagai chunks terpisah dengan optimization
-    for table in doc_data.get("raw_tables", []):
-        if table["tokens"] > 3500:  # Table besar dipecah dengan target yang lebih besar
-            table_chunks = _split_large_table(table)
-            chunks.extend(table_chunks)
-        else:
-            chunks.append({
-                "content": f"=== TABLE ===\n{table['content']}",
-                "type": "table",
-                "metadata": {"table_id": table["table_id"], "headers": table["headers"]},
-                "tokens": table["tokens"]
-            })
-    
-    # Deduplicate untuk avoid redundant storage
-    chunks = _deduplicate_chunks(chunks)
-    
-    return chunks
+class _IndexStage:
+    """Satu stage pipeline dengan worker pool sendiri dan antrian input terbatas.
 
-def _process_section_intelligently(section: Dict[str, Any]) -> List[Dict[str, Any]]:
-    """Process section dengan cost optimization - larger chunks untuk reduce storage cost."""
-    chunks = []
-    section_header = section["header"]
-    content_parts = section["content_parts"]
-    
-    # Target chunk size yang lebih besar untuk cost efficiency (3000-4000 tokens)
-    target_chunk_size = 3500
-    
-    # Jika section kecil atau medium, jadikan satu chunk
-    if section["total_tokens"] <= target_chunk_size:
-        full_content = f"=== {section_header} ===\n"
-        full_content += "\n\n".join([part["content"] for part in content_parts])
-        
-        chunks.append({
-            "content": full_content,
-            "type": section["type"],
-            "metadata": {
-                "section_header": section_header,
-                "section_id": section["section_id"],
-                "is_complete_section": True
-            },
-            "tokens": section["total_tokens"]
-        })
-    else:
-        # Section besar, bagi dengan larger chunks untuk cost efficiency
-        current_chunk_parts = []
-        current_tokens = tiktoken_len(f"=== {section_header} ===\n")
-        
-        for part in content_parts:
-            # Target yang lebih besar untuk reduce number of chunks
-            if current_tokens + part["tokens"] > target_chunk_size:
-                if current_chunk_parts:
-                    # Create chunk
-                    chunk_content = f"=== {section_header} ===\n"
-                    chunk_content += "\n\n".join([p["content"] for p in current_chunk_parts])
-                    
-                    chunks.append({
-                        "content": chunk_content,
-                        "type": section["type"],
-                        "metadata": {
-                            "section_header": section_header,
-                            "section_id": section["section_id"],
-                            "is_partial_section": True,
-                            "chunk_part": len(chunks) + 1
-                        },
-                        "tokens": current_tokens
-                    })
-                
-                # Start new chunk
-                current_chunk_parts = [part]
-                current_tokens = tiktoken_len(f"=== {section_header} ===\n") + part["tokens"]
+    `func(job)` mengembalikan job untuk stage berikutnya, atau None jika job
+    selesai/di-skip. Exception per job dicatat ke run dan job di-drop.
+
+    Stage dengan `finish` boleh menunda job lewat `defer(job, ready)`: worker langsung
+    lanjut ke job berikutnya, dan begitu Future `ready` selesai (urutan bebas) thread
+    handoff menjalankan `finish(job)` lalu meneruskan hasilnya. Stage berikutnya baru
+    ditutup setelah semua job yang ditunda selesai.
+    """
+
+    def __init__(self, name: str, func, workers: int, run: _IndexRun, queue_size: int, finish=None):
+        self.name = name
+        self.func = func
+        self.finish = finish
+        self.workers = max(1, int(workers))
+        self.run = run
+        self.in_queue: "queue.Queue" = queue.Queue(maxsize=max(1, queue_size))
+        self.next_stage: Optional["_IndexStage"] = None
+        self.busy_seconds = 0.0
+        self.processed = 0
+        self.active = 0
+        self.deferred = 0
+        self.deferred_total = 0
+        self.max_queue_depth = 0
+        self._depth_total = 0
+        self._alive = self.workers
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._ready: "queue.Queue" = queue.Queue()
+
+    def start(self):
+        for n in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"index-{self.name}-{n}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        if self.finish is not None:
+            t = threading.Thread(target=self._handoff, name=f"index-{self.name}-handoff", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def join(self):
+        for t in self._threads:
+            t.join()
+
+    def _worker(self):
+        while True:
+            depth = self.in_queue.qsize()
+            job = self.in_queue.get()
+            if job is _STAGE_STOP:
+                break
+
+            started = time.perf_counter()
+            result = None
+            with self._lock:
+                self.active += 1
+            try:
+                result = self.func(job)
+            except Exception as e:
+                self.run.error(job["name"], e)
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    self.busy_seconds += time.perf_counter() - started
+                    self.processed += 1
+                    self._depth_total += depth
+                    self.max_queue_depth = max(self.max_queue_depth, depth)
+
+            if result is not None:
+                self.forward(result)
+
+        with self._lock:
+            self._alive -= 1
+            last_worker = self._alive == 0
+        # Worker terakhir yang selesai menutup stage berikutnya (lewat handoff jika ada job ditunda)
+        if last_worker:
+            if self.finish is not None:
+                self._ready.put(_STAGE_STOP)
             else:
-                current_chunk_parts.append(part)
-                current_tokens += part["tokens"]
-        
-        # Add final chunk if exists
-        if current_chunk_parts:
-            chunk_content = f"=== {section_header} ===\n"
-            chunk_content += "\n\n".join([p["content"] for p in current_chunk_parts])
-            
-            chunks.append({
-                "content": chunk_content,
-                "type": section["type"],
-                "metadata": {
-                    "section_header": section_header,
-                    "section_id": section["section_id"],
-                    "is_partial_section": True,
-                    "chunk_part": len(chunks) + 1
-                },
-                "tokens": current_tokens
-            })
-    
-    return chunks
+                self._stop_next()
 
-def _split_large_table(table: Dict[str, Any]) -> List[Dict[str, Any]]:
-    """Split table besar dengan preserve headers dan target size yang lebih besar."""
-    chunks = []
-    lines = table["content"].split("\n")
-    headers = lines[0] if lines else ""
-    
-    current_chunk_lines = [headers]  # Always include headers
-    current_tokens = tiktoken_len(headers)
-    
-    # Target size yang lebih besar untuk tables
-    target_size = 3000
-    
-    for line in lines[1:]:  # Skip header line
-        line_tokens = tiktoken_len(line)
-        if current_tokens + line_tokens > target_size:
-            # Create chunk
-            chunk_content = f"=== TABLE (Part {len(chunks) + 1}) ===\n"
-            chunk_content += "\n".join(current_chunk_lines)
-            
-            chunks.append({
-                "content": chunk_content,
-                "type": "table",
-                "metadata": {
-                    "table_id": table["table_id"],
-                    "headers": table["headers"],
-                    "is_partial_table": True,
-                    "part": len(chunks) + 1
-                },
-                "tokens": current_tokens
-            })
-            
-            # Start new chunk with headers
-            current_chunk_lines = [headers, line]
-            current_tokens = tiktoken_len(headers) + line_tokens
-        else:
-            current_chunk_lines.append(line)
-            current_tokens += line_tokens
-    
-    # Add final chunk
-    if len(current_chunk_lines) > 1:  # More than just headers
-        chunk_content = f"=== TABLE (Part {len(chunks) + 1}) ===\n"
-        chunk_content += "\n".join(current_chunk_lines)
-        
-        chunks.append({
-            "content": chunk_content,
-            "type": "table",
-            "metadata": {
-                "table_id": table["table_id"],
-                "headers": table["headers"],
-                "is_partial_table": True,
-                "part": len(chunks) + 1
-            },
-            "tokens": current_tokens
-        })
-    
-    return chunks
+    def _stop_next(self):
+        if self.next_stage is not None:
+            for _ in range(self.next_stage.workers):
+                self.next_stage.in_queue.put(_STAGE_STOP)
 
-def _deduplicate_chunks(chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    """Remove duplicate chunks untuk cost optimization."""
-    unique_chunks = []
-    seen_hashes = set()
-    
-    for chunk in chunks:
-        # Create content hash untuk deduplication
-        content_hash = hashlib.md5(chunk["content"].encode()).hexdigest()
-        
-        if content_hash not in seen_hashes:
-            seen_hashes.add(content_hash)
-            unique_chunks.append(chunk)
-    
-    return unique_chunks
+    def defer(self, job: Dict[str, Any], ready: Future):
+        """Tunda job sampai `ready` selesai; `finish(job)` lalu jalan di thread handoff."""
+        with self._lock:
+            self.deferred += 1
+            self.deferred_total += 1
+        ready.add_done_callback(lambda _: self._ready.put(job))
 
-# === Enhanced indexing pipeline - tetap nama function yang sama ===
-def process_and_index_docs(prefix: str = "") -> Dict[str, Any]:
-    """Process dan index dokumen dengan cost optimization - support semua prefix termasuk kosong."""
-    indexed, skipped, errors = 0, 0, []
-    total_chunks = 0
-    
-    # Jika prefix kosong, process semua blobs
-    if prefix:
-        blob_list = blob_container.list_blobs(name_starts_with=prefix)
+    def _handoff(self):
+        workers_done = False
+        while True:
+            with self._lock:
+                if workers_done and self.deferred == 0:
+                    break
+            job = self._ready.get()
+            if job is _STAGE_STOP:
+                workers_done = True
+                continue
+
+            result = None
+            try:
+                result = self.finish(job)
+            except Exception as e:
+                self.run.error(job["name"], e)
+            finally:
+                with self._lock:
+                    self.deferred -= 1
+            if result is not None:
+                self.forward(result)
+        self._stop_next()
+
+    def forward(self, job: Dict[str, Any]):
+        """Teruskan job ke stage berikutnya (boleh dipanggil func sebelum job selesai)."""
+        if self.next_stage is not None:
+            self.next_stage.in_queue.put(job)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "processed": self.processed,
+            "deferred": self.deferred_total,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "queue_capacity": self.in_queue.maxsize,
+            "max_queue_depth": self.max_queue_depth,
+            "avg_queue_depth": round(self._depth_total / max(self.processed, 1), 2),
+        }
+
+
+def _blob_md5(blob) -> Optional[str]:
+    """MD5 konten dari properti listing blob (hex), jika tersedia."""
+    content_settings = getattr(blob, "content_settings", None)
+    md5 = getattr(content_settings, "content_md5", None) if content_settings else None
+    return bytes(md5).hex() if md5 else None
+
+def _download_blob(name: str, size: Optional[int]) -> Union[bytes, IO[bytes]]:
+    """Download blob dengan memory terbatas per dokumen.
+
+    Blob <= `settings.index_doc_memory_mb` dibaca langsung sebagai bytes. Blob lebih
+    besar di-stream lewat ranged read paralel (`max_concurrency`) ke SpooledTemporaryFile
+    yang pindah ke disk setelah melewati batas yang sama, lalu dikembalikan sebagai file handle.
+    """
+    blob_client = blob_container.get_blob_client(name)
+    memory_limit = max(1, settings.index_doc_memory_mb) * 1024 * 1024
+    if size is not None and size <= memory_limit:
+        return blob_client.download_blob().readall()
+
+    spool = tempfile.SpooledTemporaryFile(max_size=memory_limit)
+    try:
+        downloader = blob_client.download_blob(max_concurrency=settings.index_download_concurrency)
+        downloader.readinto(spool)
+    except Exception:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+def _close_source(source: Any):
+    if hasattr(source, "close"):
+        source.close()
+
+def _stage_download(job: Dict[str, Any], run: _IndexRun) -> Optional[Dict[str, Any]]:
+    print(f"Processing: {job['name']}")
+    content = _download_blob(job["name"], getattr(job["blob"], "size", None))
+
+    # Upload ulang file identik mengganti ETag; cek hash konten sebelum extract
+    job["content_md5"] = _content_digest(content, "md5")
+    if not job["force"] and index_manifest.is_unchanged(job["name"], content_md5=job["content_md5"]):
+        _close_source(content)
+        index_manifest.touch_etag(job["name"], job.get("etag"))
+        run.unchanged_blob(job["name"])
+        return None
+
+    job["content"] = content
+    return job
+
+def _stage_extract(job: Dict[str, Any], run: _IndexRun, defer) -> Optional[Dict[str, Any]]:
+    # Extract dengan struktur yang comprehensive dan general.
+    # Analisis Document Intelligence di-submit lalu job ditunda (defer) sampai window pertama
+    # selesai, jadi worker langsung lanjut submit dokumen berikutnya; job diteruskan ke stage
+    # chunk sesuai urutan selesai, bukan urutan listing.
+    blob = job.get("blob")
+    content_settings = getattr(blob, "content_settings", None)
+    mime = resolve_mime(job["name"], getattr(content_settings, "content_type", None))
+    windows, ready = _open_source_layouts(
+        job["name"], job.pop("content"), mime,
+        on_done=lambda extractor, seconds, pages: run.extracted(job["name"], extractor, seconds, pages),
+    )
+    job["layouts"] = windows
+    if ready is not None and not ready.done():
+        defer(job, ready)
+        return None
+    return _prime_layouts(job, run)
+
+def _prime_layouts(job: Dict[str, Any], run: _IndexRun) -> Optional[Dict[str, Any]]:
+    # Hanya window pertama yang berisi konten ditunggu di sini; sisanya di-stream ke stage chunk.
+    windows = job["layouts"]
+    try:
+        first = next((layout for layout in windows if layout["paragraphs"] or layout["tables"]), None)
+    except Exception as e:
+        # Gagal analisis (timeout, 429, 5xx) = error, bukan skip: resume & watcher mencoba lagi
+        windows.close()
+        job.pop("layouts")
+        run.error(job["name"], e)
+        return None
+    if first is None:
+        windows.close()
+        job.pop("layouts")
+        run.skip(job["name"], "No content extracted")
+        return None
+    job["first_layout"] = first
+    return job
+
+_chunk_pool: Optional[ProcessPoolExecutor] = None
+_chunk_pool_lock = threading.Lock()
+
+def _get_chunk_pool() -> ProcessPoolExecutor:
+    """Process pool chunking bersama (dibuat sekali, dipakai ulang lintas run)."""
+    global _chunk_pool
+    with _chunk_pool_lock:
+        if _chunk_pool is None:
+            # spawn: fork dari process yang punya banyak thread (FastAPI, pipeline) rawan deadlock
+            _chunk_pool = ProcessPoolExecutor(
+                max_workers=settings.index_chunk_processes,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_chunk_worker,
+                initargs=(settings.index_chunk_process_nice,),
+            )
+        return _chunk_pool
+
+def _chunk_in_process(layouts: Iterator[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Chunk satu dokumen di process pool; layout dikirim sebagai JSON ter-kompres."""
+    global _chunk_pool
+    pool = _get_chunk_pool()
+    try:
+        return pool.submit(chunk_encoded_layouts, encode_layouts(layouts)).result()
+    except BrokenProcessPool:
+        # Worker mati (mis. OOM): pool dibuat ulang untuk dokumen berikutnya
+        with _chunk_pool_lock:
+            if _chunk_pool is pool:
+                _chunk_pool = None
+        raise
+
+def _stage_chunk(job: Dict[str, Any], run: _IndexRun, forward) -> None:
+    # Create cost-optimized chunks. Job diteruskan ke stage write lebih dulu, lalu
+    # chunk dikirim satu per satu begitu section tertutup (memory ~ section terbesar).
+    # Dengan `index_chunk_processes` > 0 seluruh layout dokumen dikirim ke process pool
+    # dan chunk baru di-stream setelah dokumen selesai di-chunk.
+    windows = job.pop("layouts")
+    # Sel tabel mentah ikut disimpan untuk table store (urutan = table_id di metadata chunk);
+    # lengkap begitu stream chunk selesai karena layout dikonsumsi sebelum chunk terakhir.
+    # Ditulis per window sebagai JSON lines ke spool (pindah ke disk setelah batas memory
+    # dokumen), jadi tabel tidak ditahan di memory sampai dokumen selesai ditulis.
+    tables = tempfile.SpooledTemporaryFile(max_size=max(1, settings.index_doc_memory_mb) * 1024 * 1024, mode="w+")
+    job["tables"] = tables
+
+    def collect_tables(source_layouts):
+        for layout in source_layouts:
+            for cells in layout["tables"]:
+                tables.write(json.dumps(cells) + "\n")
+            yield layout
+
+    layouts = collect_tables(itertools.chain([job.pop("first_layout")], windows))
+    stream = _ChunkStream()
+    job["chunks"] = stream
+    forward(job)
+    try:
+        chunks = _chunk_in_process(layouts) if settings.index_chunk_processes > 0 else _iter_chunks_from_layouts(layouts)
+        for chunk in chunks:
+            if not stream.put(chunk):
+                break
+    except Exception as e:
+        stream.close(error=e)
     else:
-        blob_list = blob_container.list_blobs()
+        stream.close()
+    finally:
+        windows.close()
+    return None
 
-    print(f"Starting to process documents with prefix: '{prefix}'")
-    
-    for b in blob_list:
-        try:
-            print(f"Processing: {b.name}")
-            blob_client = blob_container.get_blob_client(b.name)
-            content_bytes = blob_client.download_blob().readall()
-
-            # Extract dengan struktur yang comprehensive dan general
-            doc_data = _extract_text_with_docint(content_bytes)
-            
-            if not doc_data.get("sections") and not doc_data.get("raw_tables"):
-                skipped += 1
-                print(f"Skipped {b.name}: No content extracted")
-                continue
+def _stage_write(job: Dict[str, Any], run: _IndexRun, writer: IndexWriter) -> None:
+    name = job["name"]
+    stream = job.pop("chunks")
 
-            # Create cost-optimized chunks
-            chunks = _create_intelligent_chunks(doc_data)
-            
-            if not chunks:
-                skipped += 1
-                print(f"Skipped {b.name}: No chunks created")
+    # Serahkan setiap chunk ke writer; embedding & upload dilakukan per batch lintas dokumen.
+    # Upload ditahan sampai dokumen selesai karena total_chunks baru diketahui di akhir.
+    # Chunk near-duplicate dari dokumen lain memakai ulang vektor canonical ("reuse")
+    # atau tidak disimpan sama sekali ("skip").
+    mode = settings.index_near_dup_mode
+    check_duplicates = mode in ("reuse", "skip")
+    chunk_ids = []
+    metadatas = []
+    canonical, duplicates = [], []
+    # Versi baru dokumen menggantikan chunk lama yang masih menunggu retry
+    dead_letters.remove_source(name)
+    # Judul, heading, daftar isi & pembuka dokumen untuk tier ringkasan (pertanyaan overview)
+    outline = DocumentOutline(name)
+    writer.open_document(name)
+    try:
+        for i, chunk_data in enumerate(stream):
+            chunk_id = f"{_make_safe_doc_id(name)}_{i}"
+            outline.add(chunk_data)
+            signature = near_duplicates.signature(chunk_data["content"]) if check_duplicates else None
+            match = None
+            if signature is not None:
+                match = near_duplicates.find(signature, exclude_source=name)
+                run.near_duplicate_checked(chunk_data, match, stored=mode != "skip")
+            if match and mode == "skip":
+                duplicates.append({"chunk_id": chunk_id, "signature": signature, "canonical_id": match["chunk_id"]})
                 continue
+            chunk_ids.append(chunk_id)
+
+            # Optimized metadata - only essential fields
+            base_metadata = {
+                "source": name,
+                "prefix": source_prefixes(name),
+                "chunk_index": i,
+                "content_type": chunk_data["type"],
+                "doc_hash": job.get("content_md5"),
+                "token_count": chunk_data["tokens"],
+                "total_chunks": None
+            }
+
+            # Add specific metadata dari chunk
+            base_metadata.update(chunk_data.get("metadata", {}))
+            if match:
+                base_metadata["near_duplicate_of"] = match["chunk_id"]
+            metadatas.append(base_metadata)
+
+            writer.add(chunk_id, chunk_data["content"], base_metadata, chunk_data["tokens"],
+                       embedding_key=match["embedding_key"] if match else None)
+            if signature is not None and match is None:
+                canonical.append({
+                    "chunk_id": chunk_id,
+                    "signature": signature,
+                    "embedding_key": embeddings.cache_key(chunk_data["content"]),
+                })
+    except Exception:
+        stream.cancel()
+        writer.discard_document(name)
+        raise
+
+    if not chunk_ids and not duplicates:
+        writer.discard_document(name)
+        run.skip(name, "No chunks created")
+        return None
+
+    for metadata in metadatas:
+        metadata["total_chunks"] = len(chunk_ids)
+    job["summary"] = outline.record(len(chunk_ids))
+    if check_duplicates:
+        # Langsung didaftarkan supaya dokumen lain di run yang sama sudah bisa match
+        run.requeue_sources(near_duplicates.replace_source(name, canonical, duplicates))
+    # Dicatat sebelum seal: checkpoint dokumen dipicu writer setelah upload terakhir
+    run.done(job, chunk_ids)
+    writer.seal_document(name)
 
-            # Index each chunk dengan cost-efficient metadata
-            for i, chunk_data in enumerate(chunks):
-                chunk_id = f"{_make_safe_doc_id(b.name)}_{i}"
-                
-                # Optimized metadata - only essential fields
-                base_metadata = {
-                    "source": b.name,
-                    "chunk_index": i,
-                    "content_type": chunk_data["type"],
-                    "token_count": chunk_data["tokens"],
-                    "total_chunks": len(chunks)
-                }
-                
-                # Add specific metadata dari chunk
-                base_metadata.update(chunk_data.get("metadata", {}))
-                
-                try:
-                    vectorstore.add_texts(
-                        [chunk_data["content"]], 
-                        metadatas=[base_metadata], 
-                        ids=[chunk_id]
-                    )
-                except Exception as e:
-                    print(f"Error indexing chunk {chunk_id}: {e}")
-                    continue
-            
-            total_chunks += len(chunks)
-            print(f"Indexed {b.name}: {len(chunks)} chunks")
-            indexed += 1
-            
-            # Add small delay untuk avoid rate limiting
-            time.sleep(0.1)
 
+def forget_indexed_document(blob_name: str) -> List[str]:
+    """Lupakan blob di manifest & index near-duplicate (mis. setelah blob dihapus).
+
+    Return dokumen lain yang chunk duplikatnya bergantung pada blob ini; manifest
+    mereka ikut dihapus supaya di-index ulang pada run berikutnya.
+    """
+    index_manifest.remove(blob_name)
+    dead_letters.remove_source(blob_name)
+    doc_summaries.remove(blob_name)
+    table_store.remove(blob_name)
+    dependents = near_duplicates.remove_source(blob_name)
+    for source in dependents:
+        index_manifest.remove(source)
+    return dependents
+
+def remove_indexed_document(blob_name: str) -> Dict[str, Any]:
+    """Hapus chunk blob yang sudah tidak ada dari Azure AI Search (chunk ID dari manifest)
+    lalu lupakan blob tersebut. Manifest dipertahankan jika ada chunk yang gagal dihapus."""
+    entry = index_manifest.get(blob_name)
+    result = _delete_index_chunks(entry["chunk_ids"]) if entry else {"deleted": 0, "failed": []}
+    result["requeued_for_reindex"] = [] if result["failed"] else forget_indexed_document(blob_name)
+    return result
+
+def backfill_document_summaries(prefix: str = "", force: bool = False,
+                                on_progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """Bangun record ringkasan untuk dokumen yang sudah ter-index sebelum tier ringkasan ada,
+    dari chunk yang tersimpan di Azure AI Search (tanpa download/ekstraksi ulang)."""
+    names = index_manifest.list_blobs(prefix)
+    report = {"prefix": prefix, "documents": len(names), "built": 0, "existing": 0, "failed": []}
+    started = time.perf_counter()
+    for done, name in enumerate(names, 1):
+        if not force and doc_summaries.get(name) is not None:
+            report["existing"] += 1
+            continue
+        entry = index_manifest.get(name)
+        try:
+            chunks = []
+            for i in range(0, len(entry["chunk_ids"]), 100):
+                ids = entry["chunk_ids"][i:i + 100]
+                for doc in vectorstore.client.search(search_text="*", filter=f"search.in(id, '{','.join(ids)}', ',')",
+                                                     select=["id", "content", "metadata"], top=len(ids)):
+                    metadata = json.loads(doc.get("metadata") or "{}")
+                    chunks.append({"content": doc.get("content") or "", "type": metadata.get("content_type"),
+                                   "metadata": metadata})
+            chunks.sort(key=lambda chunk: chunk["metadata"].get("chunk_index") or 0)
+            outline = DocumentOutline(name)
+            for chunk in chunks:
+                outline.add(chunk)
+            doc_summaries.upsert(outline.record(len(entry["chunk_ids"])))
+            report["built"] += 1
+        except Exception as e:
+            print(f"Could not build summary for {name}: {e}")
+            report["failed"].append(f"{name}: {e}")
+        if on_progress is not None:
+            on_progress({"phase": "summaries", "blobs_total": len(names), "blobs_done": done,
+                         "elapsed_seconds": round(time.perf_counter() - started, 1)})
+    report["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+    return report
+
+def _stale_chunk_ids(name: str, previous: Optional[Dict[str, Any]], new_ids: List[str]) -> List[str]:
+    """Chunk ID lama milik dokumen yang tidak lagi dihasilkan oleh run ini.
+
+    Pakai chunk ID dari manifest; jika belum ada (index lama), probe ID berurutan
+    `{doc_id}_{i}` mulai dari jumlah chunk baru sampai tidak ditemukan.
+    """
+    current = set(new_ids)
+    if previous is not None:
+        return [cid for cid in previous["chunk_ids"] if cid not in current]
+
+    stale = []
+    doc_id = _make_safe_doc_id(name)
+    i = len(new_ids)
+    while True:
+        chunk_id = f"{doc_id}_{i}"
+        try:
+            vectorstore.client.get_document(key=chunk_id, selected_fields=["id"])
+        except Exception:
+            break
+        stale.append(chunk_id)
+        i += 1
+    return stale
+
+def _delete_index_chunks(chunk_ids: List[str]) -> Dict[str, Any]:
+    """Batch delete chunk dari Azure AI Search (maks 1000 per request)."""
+    deleted, failed = 0, []
+    for i in range(0, len(chunk_ids), SEARCH_MAX_BATCH_DOCS):
+        batch = chunk_ids[i:i + SEARCH_MAX_BATCH_DOCS]
+        try:
+            results = vectorstore.client.delete_documents(documents=[{"id": cid} for cid in batch])
+        except Exception as e:
+            print(f"Error deleting stale chunks: {e}")
+            failed.extend(batch)
+            continue
+        for r in results:
+            if r.succeeded:
+                deleted += 1
+            else:
+                failed.append(r.key)
+    return {"deleted": deleted, "failed": failed}
+
+def _on_document_written(run: _IndexRun, name: str, failed: bool):
+    """Checkpoint satu dokumen begitu semua chunk-nya selesai di-upload (dipanggil IndexWriter).
+
+    Manifest dicatat untuk dokumen yang semua chunk-nya berhasil ditulis, atau yang
+    chunk gagalnya sudah masuk dead-letter store (status `partial`, celahnya diisi
+    retry worker tanpa index ulang seluruh dokumen). Chunk sisa versi sebelumnya
+    (dokumen jadi lebih pendek) langsung dihapus.
+    """
+    with run.lock:
+        entry = run.written.get(name)
+        # Sel tabel bisa besar (XLSX); tidak perlu disimpan selama sisa run
+        tables = entry.pop("tables", None) if entry is not None else None
+    if entry is None:
+        return
+    pending = 0
+    if failed:
+        # Signature chunk yang gagal ditulis tidak boleh jadi canonical
+        run.requeue_sources(near_duplicates.remove_source(name))
+        pending = dead_letters.pending_count(name)
+        if not pending:
+            with run.lock:
+                run.write_failed += 1
+            run.checkpoint_blob(name, "write_failed", len(entry["chunk_ids"]), "some chunks failed to upload")
+            return
+
+    stale_ids = _stale_chunk_ids(name, index_manifest.get(name), entry["chunk_ids"])
+    if stale_ids:
+        orphan_report = _delete_index_chunks(stale_ids)
+        with run.lock:
+            run.orphaned_chunks_deleted += orphan_report["deleted"]
+            run.orphan_delete_failures.extend(orphan_report["failed"])
+    index_manifest.record(name, entry["etag"], entry["content_md5"], entry["chunk_ids"])
+    if entry.get("summary"):
+        try:
+            doc_summaries.upsert(entry["summary"])
+        except Exception as e:
+            print(f"Could not store summary for {name}: {e}")
+    if tables is not None:
+        try:
+            tables.seek(0)
+            table_store.replace_document(name, (json.loads(line) for line in tables))
         except Exception as e:
-            error_msg = f"{b.name}: {str(e)}"
-            errors.append(error_msg)
-            print(f"Error processing {b.name}: {e}")
+            print(f"Could not store tables for {name}: {e}")
+        finally:
+            tables.close()
+    if pending:
+        with run.lock:
+            run.partial += 1
+        run.checkpoint_blob(name, "partial", len(entry["chunk_ids"]), f"{pending} chunks queued for retry")
+        dead_letter_worker.trigger()
+        return
+    run.checkpoint_blob(name, "indexed", len(entry["chunk_ids"]))
+
+def _retry_dead_letter_chunks(items: List[Dict[str, Any]]) -> Dict[str, str]:
+    """Tulis ulang chunk dari dead-letter store (vektor tersimpan dipakai ulang, sisanya
+    di-embed). Return {chunk_id: error} untuk chunk yang masih gagal."""
+    writer = IndexWriter(
+        vectorstore,
+        embeddings,
+        embed_batch_tokens=settings.index_embed_batch_tokens,
+        embed_batch_size=settings.index_embed_batch_size,
+        upload_batch_size=settings.index_upload_batch_size,
+        upload_batch_bytes=settings.index_upload_batch_bytes,
+        flush_seconds=0,
+        upload_limiter=search_upload_limiter,
+        field_names=search_index_field_names,
+    )
+    chunk_counts: Dict[str, Optional[int]] = {}
+    for item in items:
+        metadata = item["metadata"]
+        source = metadata.get("source")
+        if metadata.get("total_chunks") is None and source:
+            # Embedding gagal sebelum dokumen selesai di-stream: total_chunks dari manifest
+            if source not in chunk_counts:
+                chunk_counts[source] = (index_manifest.get(source) or {}).get("chunk_count")
+            metadata["total_chunks"] = chunk_counts[source]
+        writer.add(item["id"], item["content"], metadata, item["tokens"], vector=item["vector"])
+    writer.close()
+    return {failure["chunk_id"]: failure["error"] for failure in writer.failed_chunks}
+
+def _on_dead_letters_exhausted(source: str):
+    """Chunk dokumen kehabisan attempt: lupakan manifest supaya run berikutnya mengindex ulang dokumennya."""
+    print(f"Chunks of {source} failed permanently; it will be fully reindexed on the next run")
+    index_manifest.remove(source)
+
+dead_letter_worker = DeadLetterRetryWorker(
+    dead_letters,
+    _retry_dead_letter_chunks,
+    interval=settings.index_retry_interval_seconds,
+    batch_size=settings.index_retry_batch_size,
+    on_exhausted=_on_dead_letters_exhausted,
+)
 
+def _attempt_counters(run: _IndexRun, writer: IndexWriter) -> Dict[str, float]:
+    """Counter attempt ini yang diakumulasi lintas restart di checkpoint run."""
+    write_stats = writer.stats()
+    counters = {key: write_stats[key] for key in _CUMULATIVE_WRITE_COUNTERS}
+    counters["failed_chunks"] = len(write_stats["failed_chunks"])
+    with run.lock:
+        counters["orphaned_chunks_deleted"] = run.orphaned_chunks_deleted
+        counters.update(run.near_dup)
+    return counters
+
+def _progress_snapshot(run: _IndexRun, stages: List[_IndexStage], writer: IndexWriter, phase: str,
+                       blobs_total: Optional[int], resumed: int, elapsed: float) -> Dict[str, Any]:
+    """Snapshot progress untuk job yang di-poll: blob selesai/total, chunk tertulis, stage aktif, ETA."""
+    with run.lock:
+        done_this_attempt = len(run.finished_blobs)
+    stage_state = {}
+    for stage in stages:
+        with stage._lock:
+            # Job yang ditunda (mis. menunggu Document Intelligence) dihitung aktif
+            active = stage.active + stage.deferred
+        stage_state[stage.name] = {"active": active, "queued": stage.in_queue.qsize()}
+
+    # Stage aktif = stage dengan job terbanyak (aktif + antri); seri -> stage paling hilir
+    current_stage = None
+    busiest = 0
+    for name, state in stage_state.items():
+        load = state["active"] + state["queued"]
+        if load and load >= busiest:
+            current_stage, busiest = name, load
+
+    blobs_done = resumed + done_this_attempt
+    eta = None
+    if blobs_total is not None and done_this_attempt:
+        remaining = max(blobs_total - blobs_done, 0)
+        eta = round(elapsed / done_this_attempt * remaining, 1)
     return {
-        "indexed": indexed, 
-        "skipped": skipped, 
-        "errors": errors,
-        "total_chunks": total_chunks,
-        "avg_chunks_per_doc": total_chunks / max(indexed, 1)
+        "run_id": run.run_id,
+        "phase": phase,
+        "blobs_total": blobs_total,
+        "blobs_done": blobs_done,
+        "chunks_written": writer.chunks_written,
+        "current_stage": current_stage if phase == "processing" else phase,
+        "stages": stage_state,
+        "rate_limits": _rate_limit_stats(),
+        "elapsed_seconds": round(elapsed, 1),
+        "eta_seconds": eta if phase != "completed" else 0,
     }
 
+def _rate_limit_stats() -> Dict[str, Any]:
+    """Throughput sekarang + jumlah throttle limiter bersama (embedding & upload Search)."""
+    limits = {"search_upload": search_upload_limiter.stats()}
+    embed_limiter = getattr(embeddings, "limiter", None)
+    if embed_limiter is not None:
+        limits["embeddings"] = embed_limiter.stats()
+    query_limiter = getattr(embeddings, "query_limiter", None)
+    if query_limiter is not None:
+        limits["embeddings_query"] = query_limiter.stats()
+    return limits
+
+_CUMULATIVE_WRITE_COUNTERS = (
+    "chunks_written", "embedding_requests", "search_write_requests",
+    "embed_seconds", "upload_seconds", "vectors_reused", "tokens_reused",
+)
+
+def process_and_index_docs(prefix: str = "", stage_workers: Optional[Dict[str, int]] = None,
+                           force: bool = False, resume: Optional[str] = None,
+                           on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+                           blobs: Optional[List[Any]] = None) -> Dict[str, Any]:
+    """Process dan index dokumen lewat pipeline bertahap dengan concurrency terbatas.
+
+    Stage: download -> extract -> chunk -> write, masing-masing dengan worker pool
+    sendiri (default dari settings, bisa di-override via `stage_workers`, mis.
+    {"extract": 8}). Antrian antar stage dibatasi `settings.index_queue_size`
+    sehingga memory tetap terkontrol. Support semua prefix termasuk kosong.
+
+    Incremental: blob yang ETag/MD5-nya sama dengan manifest di-skip
+    (dilaporkan sebagai `unchanged`). `force=True` memproses ulang semuanya.
+
+    Resumable: setiap run punya `run_id`; status tiap blob dan counter di-checkpoint
+    setelah setiap blob dan setiap batch upload. `resume` = run ID (atau "latest")
+    melanjutkan run yang terputus dengan prefix/force yang sama, melewati blob yang
+    sudah selesai. Report berisi angka kumulatif seluruh run logis.
+
+    `on_progress(snapshot)` (opsional) menerima progress berkala: fase, blob
+    selesai/total, chunk tertulis, stage yang sedang sibuk, dan estimasi ETA.
+
+    `blobs` (opsional) = item listing yang sudah diambil caller (mis. blob watcher);
+    hanya blob tersebut yang diproses, tanpa listing ulang prefix.
+    """
+    log_run = index_run_log.start(prefix, force, resume)
+    run_id = log_run["run_id"]
+    if log_run["resumed"]:
+        prefix, force = log_run["prefix"], log_run["force"]
+        print(f"Resuming indexing run {run_id} (attempt {log_run['attempts']})")
+    completed = index_run_log.completed_blobs(run_id) if log_run["resumed"] else set()
+
+    run = _IndexRun(index_run_log, run_id)
+    started = time.perf_counter()
+    progress = {"phase": "listing", "blobs_total": None, "resumed": 0}
+    stages: List[_IndexStage] = []
+
+    def report_progress():
+        if on_progress is not None:
+            on_progress(_progress_snapshot(run, stages, writer, progress["phase"], progress["blobs_total"],
+                                           progress["resumed"], time.perf_counter() - started))
+
+    def set_phase(phase: str):
+        progress["phase"] = phase
+        run.notify(force=True)
+
+    run.on_progress = report_progress
+    writer = IndexWriter(
+        vectorstore,
+        embeddings,
+        embed_batch_tokens=settings.index_embed_batch_tokens,
+        embed_batch_size=settings.index_embed_batch_size,
+        upload_batch_size=settings.index_upload_batch_size,
+        upload_batch_bytes=settings.index_upload_batch_bytes,
+        flush_seconds=settings.index_flush_seconds,
+        on_document_done=lambda name, failed: _on_document_written(run, name, failed),
+        on_upload_batch=lambda: (index_run_log.checkpoint(
+            run_id, _attempt_counters(run, writer), time.perf_counter() - started), run.notify()),
+        upload_limiter=search_upload_limiter,
+        field_names=search_index_field_names,
+        dead_letters=dead_letters,
+    )
+    workers = {
+        "download": settings.index_download_workers,
+        "extract": settings.index_extract_workers,
+        # Thread chunk hanya menunggu hasil process pool; minimal satu per process
+        "chunk": max(settings.index_chunk_workers, settings.index_chunk_processes),
+        "write": settings.index_write_workers,
+    }
+    workers.update(stage_workers or {})
+
+    stages += [
+        _IndexStage("download", lambda job: _stage_download(job, run), workers["download"], run, settings.index_queue_size),
+        _IndexStage("extract", lambda job: _stage_extract(job, run, stages[1].defer), workers["extract"], run,
+                    settings.index_queue_size, finish=lambda job: _prime_layouts(job, run)),
+        _IndexStage("chunk", lambda job: _stage_chunk(job, run, stages[2].forward), workers["chunk"], run, settings.index_queue_size),
+        _IndexStage("write", lambda job: _stage_write(job, run, writer), workers["write"], run, settings.index_queue_size),
+    ]
+    for stage, next_stage in zip(stages, stages[1:]):
+        stage.next_stage = next_stage
+
+    set_phase("listing")
+    # Jika prefix kosong, process semua blobs. Listing diambil penuh dulu supaya total blob diketahui (progress/ETA)
+    try:
+        if blobs is not None:
+            blob_list = list(blobs)
+        elif prefix:
+            blob_list = list(blob_container.list_blobs(name_starts_with=prefix))
+        else:
+            blob_list = list(blob_container.list_blobs())
+    except Exception as e:
+        run.error(prefix or "<all>", e)
+        blob_list = []
+    resumed_skips = sum(1 for b in blob_list if b.name in completed)
+    progress.update(blobs_total=len(blob_list), resumed=resumed_skips)
+
+    print(f"Starting to process documents with prefix: '{prefix}' (run {run_id})")
+
+    writer.start()
+    for stage in stages:
+        stage.start()
+
+    set_phase("processing")
+    head = stages[0]
+    try:
+        for b in blob_list:
+            if b.name in completed:
+                continue
+            etag = getattr(b, "etag", None)
+            if not force and index_manifest.is_unchanged(b.name, etag, _blob_md5(b)):
+                run.unchanged_blob(b.name)
+                continue
+            # put() blocking saat antrian penuh -> backpressure ke listing
+            head.in_queue.put({"name": b.name, "blob": b, "etag": etag, "force": force})
+    except Exception as e:
+        run.error(prefix or "<all>", e)
+    finally:
+        for _ in range(head.workers):
+            head.in_queue.put(_STAGE_STOP)
+
+    for stage in stages:
+        stage.join()
+    set_phase("finalizing")
+    write_stats = writer.close()
+
+    # Dokumen lain yang duplikatnya bergantung pada canonical yang berubah: index ulang run berikutnya
+    for source in run.requeue:
+        index_manifest.remove(source)
+
+    attempt_elapsed = time.perf_counter() - started
+    index_run_log.checkpoint(run_id, _attempt_counters(run, writer), attempt_elapsed)
+    index_run_log.finish(run_id)
+    set_phase("completed")
+    summary = index_run_log.summary(run_id)
+    totals = summary["counters"]
+    blobs = summary["blobs"]
+
+    near_dup_report = {key: totals.get(key, 0) for key in run.near_dup}
+    near_dup_report.update({
+        "mode": settings.index_near_dup_mode,
+        "threshold": near_duplicates.threshold,
+        "vectors_reused": totals.get("vectors_reused", 0),
+        "embedding_tokens_avoided": totals.get("tokens_not_embedded", 0) + totals.get("tokens_reused", 0),
+        # Estimasi storage index: teks chunk + vektor float32 yang tidak disimpan
+        "estimated_storage_bytes_avoided": (totals.get("content_bytes_not_stored", 0)
+                                            + totals.get("chunks_not_stored", 0) * 4 * writer.vector_dimensions),
+        "requeued_for_reindex": sorted(run.requeue),
+    })
+    near_dup_report.update(near_duplicates.stats())
+
+    report = {
+        "run_id": run_id,
+        "resumed": log_run["resumed"],
+        "attempts": summary["attempts"],
+        "indexed": blobs.get("indexed", 0),
+        "skipped": blobs.get("skipped", 0),
+        "unchanged": blobs.get("unchanged", 0),
+        "partial": blobs.get("partial", 0),
+        "write_failed": blobs.get("write_failed", 0),
+        "errors": summary["errors"],
+        "total_chunks": summary["total_chunks"],
+        "avg_chunks_per_doc": summary["total_chunks"] / max(blobs.get("indexed", 0) + blobs.get("partial", 0), 1),
+        "elapsed_seconds": summary["elapsed_seconds"],
+        "this_attempt": {
+            "indexed": run.indexed - run.write_failed - run.partial,
+            "partial": run.partial,
+            "skipped": run.skipped,
+            "unchanged": run.unchanged,
+            "errors": len(run.errors),
+            "resumed_from_checkpoint": resumed_skips,
+            "elapsed_seconds": round(attempt_elapsed, 3),
+        },
+        "stages": {stage.name: stage.stats() for stage in stages},
+        "orphaned_chunks_deleted": totals.get("orphaned_chunks_deleted", 0),
+        "orphaned_chunk_delete_failures": run.orphan_delete_failures,
+        "extractors": run.extraction_report(),
+        "layout_cache": layout_cache.stats(),
+        "docint_scheduler": docint_scheduler.stats(),
+        "document_summaries": doc_summaries.stats(),
+        "table_store": table_store.stats(),
+        "dead_letters": {key: value for key, value in dead_letters.summary(limit=0).items() if key != "documents"},
+        "embedding_cache": embeddings.stats(),
+        "near_duplicates": near_dup_report,
+        "rate_limits": _rate_limit_stats(),
+        **write_stats,
+    }
+    # Counter writer dilaporkan kumulatif; failed_chunks tetap daftar attempt ini
+    report.update({key: totals.get(key, 0) for key in _CUMULATIVE_WRITE_COUNTERS})
+    return report
+
 # === Cost-optimized RAG answering dengan nama function yang sama ===
-def rag_answer(query: str, max_docs: int = 10) -> str:
-    """Cost-optimized RAG dengan smart retrieval untuk minimize Azure AI Search costs."""
+def rag_answer(query: str, max_docs: int = 10, prefix: Optional[str] = None) -> str:
+    """Cost-optimized RAG dengan smart retrieval untuk minimize Azure AI Search costs.
+    `prefix` (opsional) membatasi retrieval ke dokumen di folder tersebut."""
     
+    # Pertanyaan overview dijawab dari ringkasan dokumen (jauh lebih sedikit token)
+    if settings.rag_summary_routing and _is_overview_query(query):
+        answer = _answer_from_summaries(query, prefix)
+        if answer is not None:
+            return answer
+
+    # Pertanyaan tabular dijawab dari baris tabel yang relevan, bukan seluruh tabel ter-flatten
+    if settings.rag_table_routing and _is_table_query(query):
+        answer = _answer_from_tables(query, prefix)
+        if answer is not None:
+            return answer
+
     # Single-stage optimized retrieval
-    retrieved_docs = _multi_stage_retrieval(query, max_docs)
+    retrieved_docs = _multi_stage_retrieval(query, max_docs, prefix)
     
     if not retrieved_docs:
         return "Maaf, tidak ada informasi yang relevan di basis dokumen internal."
@@ -500,9 +1332,119 @@ def rag_answer(query: str, max_docs: int = 10) -> str:
     resp = chain.invoke({"q": query, "ctx": context})
     return resp.content
 
-def _multi_stage_retrieval(query: str, max_docs: int) -> List[Any]:
+# Pertanyaan tentang isi/struktur dokumen secara keseluruhan, bukan detail di dalamnya
+_OVERVIEW_PATTERN = re.compile(
+    r"\b(daftar isi|table of contents|tentang apa|membahas apa|berisi apa|isi (dari )?(dokumen|sop|file)"
+    r"|ringkas(an|kan)?|rangkum(an)?|garis besar|gambaran umum|overview|summar(y|ize|ise)"
+    r"|what (is|are) .+ about|what does .+ cover)\b",
+    re.IGNORECASE,
+)
+# Kata yang tidak membantu menemukan dokumennya (termasuk kata-kata pola overview)
+_OVERVIEW_STOPWORDS = {
+    "daftar", "isi", "tentang", "apa", "membahas", "berisi", "dari", "dokumen", "sop", "file", "ringkasan",
+    "ringkas", "ringkaskan", "rangkum", "rangkuman", "garis", "besar", "gambaran", "umum", "yang", "dan", "ini",
+    "itu", "di", "ke", "untuk", "mengenai", "tolong", "berikan", "jelaskan", "saya", "minta", "bisa", "adalah",
+    "table", "of", "contents", "overview", "summary", "summarize", "summarise", "what", "is", "are", "about",
+    "does", "cover", "the", "a", "an", "please", "give", "me", "this", "document", "pdf", "docx",
+}
+
+def _is_overview_query(query: str) -> bool:
+    return bool(_OVERVIEW_PATTERN.search(query))
+
+def _answer_from_summaries(query: str, prefix: Optional[str] = None) -> Optional[str]:
+    """Jawab pertanyaan overview dari record ringkasan (judul, pembuka, heading, daftar isi)
+    dokumen yang cocok. None jika tidak ada dokumen yang cocok -> retrieval chunk biasa."""
+    terms = [t for t in re.findall(r"\w+", query.lower()) if t not in _OVERVIEW_STOPWORDS and len(t) > 1]
+    try:
+        records = doc_summaries.search(terms, k=settings.rag_summary_max_docs, prefix=prefix)
+    except Exception as e:
+        print(f"Summary lookup failed, using chunk retrieval: {e}")
+        return None
+    if not records:
+        return None
+
+    context = "\n\n".join(format_summary(record) for record in records)
+    print(f"Overview query answered from {len(records)} document summaries ({tiktoken_len(context)} context tokens)")
+    sys = SystemMessage(content=_build_advanced_system_prompt("id", query, []))
+    prompt = ChatPromptTemplate.from_messages([
+        sys,
+        ("human", "Question: {q}\n\nContext:\n{ctx}")
+    ])
+    chain = prompt | llm
+    resp = chain.invoke({"q": query, "ctx": context})
+    return resp.content
+
+# Pertanyaan yang jawabannya biasanya berupa nilai di tabel (limit, tarif, level, dst)
+_TABLE_PATTERN = re.compile(
+    r"\b(tabel|table|kolom|column|baris|row|matriks|matrix|tarif|plafon|plafond|golongan|grade|threshold)\b",
+    re.IGNORECASE,
+)
+# Pertanyaan nilai ("berapa limit level 3", "approval limit for level 3"): kata tanya/besaran
+# plus angka atau besaran tabular. Tetap di-gate oleh kecocokan header + sel di table store.
+_TABLE_VALUE_PATTERN = re.compile(
+    r"\b(berapa|how much|how many|what is|limit|batas|level|maksimal|maksimum|minimal|minimum|nominal|rate|amount)\b",
+    re.IGNORECASE,
+)
+_TABLE_QUANTITY_PATTERN = re.compile(
+    r"\d|\b(limit|batas|level|nominal|biaya|rate|amount|persen|percent)\b", re.IGNORECASE,
+)
+_TABLE_STOPWORDS = {
+    "berapa", "apa", "yang", "dan", "untuk", "di", "ke", "dari", "pada", "adalah", "itu", "ini", "dengan",
+    "tabel", "table", "kolom", "baris", "tolong", "berikan", "sebutkan", "jelaskan", "saya", "bisa", "the",
+    "what", "is", "are", "for", "of", "how", "much", "many", "a", "an", "in", "on", "to", "sop", "dokumen",
+}
+
+def _is_table_query(query: str) -> bool:
+    if _TABLE_PATTERN.search(query):
+        return True
+    value = _TABLE_VALUE_PATTERN.search(query)
+    # Kata tanya saja tidak cukup: harus ada angka atau besaran lain di luar kata pemicu
+    rest = query[:value.start()] + " " + query[value.end():] if value else ""
+    return bool(value and _TABLE_QUANTITY_PATTERN.search(rest))
+
+def _answer_from_tables(query: str, prefix: Optional[str] = None) -> Optional[str]:
+    """Jawab pertanyaan tabular dari baris tabel terstruktur yang cocok (header + baris terpilih).
+    None jika tidak ada baris yang cukup cocok -> retrieval chunk biasa."""
+    terms = [t for t in re.findall(r"\w+", query.lower()) if t not in _TABLE_STOPWORDS]
+    try:
+        tables = table_store.search_rows(terms, max_rows=settings.rag_table_max_rows,
+                                         max_tables=settings.rag_table_max_tables, prefix=prefix)
+    except Exception as e:
+        print(f"Table lookup failed, using chunk retrieval: {e}")
+        return None
+    # Retrieval chunk hanya dilewati jika baris terbaik cocok dengan nama kolom *dan* isi sel,
+    # serta memuat minimal dua kata query (atau satu jika query hanya satu kata)
+    needed = min(2, len(set(terms)))
+    if not tables or not any(row["matched_headers"] and row["matched_cells"] and len(row["matched_terms"]) >= needed
+                             for row in tables[0]["rows"]):
+        return None
+
+    context = "\n\n".join(format_table_rows(table) for table in tables)
+    print(f"Table query answered from {sum(len(t['rows']) for t in tables)} rows of {len(tables)} tables "
+          f"({tiktoken_len(context)} context tokens)")
+    sys_prompt = _build_advanced_system_prompt("id", query, []) + (
+        "\n8. Konteks berisi baris tabel yang relevan; baris kedua setiap tabel adalah nama kolom. "
+        "Jawab berdasarkan nilai pada kolom dan baris yang sesuai"
+    )
+    prompt = ChatPromptTemplate.from_messages([
+        SystemMessage(content=sys_prompt),
+        ("human", "Question: {q}\n\nContext:\n{ctx}")
+    ])
+    chain = prompt | llm
+    resp = chain.invoke({"q": query, "ctx": context})
+    return resp.content
+
+def _multi_stage_retrieval(query: str, max_docs: int, prefix: Optional[str] = None) -> List[Any]:
     """Cost-optimized single retrieval call untuk minimize costs."""
     try:
+        if prefix:
+            # Prefix-scoped: filter OData di field `prefix` (index dengan schema terkelola)
+            try:
+                docs = vectorstore.similarity_search(query, k=min(max_docs + 2, 15), filters=prefix_filter(prefix))
+                return _rerank_documents(docs, query, max_docs)
+            except Exception as e:
+                # Index lama (belum dimigrasi) tidak punya field `prefix`
+                print(f"Prefix-scoped retrieval failed, searching all documents: {e}")
         # Single retrieval call dengan slightly higher k untuk better coverage
         docs = retriever.get_relevant_documents(
             query, 
@@ -0,0 +1,182 @@
+# rate_limiter.py - Token-bucket rate limiter adaptif (RPM + TPM) untuk Azure OpenAI & Azure AI Search
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional
+
+# Status yang berarti "kirim ulang nanti" (Azure AI Search memakai 503 untuk throttling juga)
+THROTTLE_STATUS_CODES = (429, 503)
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Delay dari response throttled (`Retry-After`/`retry-after-ms`), 0.0 jika throttled
+    tanpa header, atau None jika exception bukan throttling."""
+    if _status_code(exc) not in THROTTLE_STATUS_CODES:
+        return None
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    for name, scale in (("retry-after-ms", 0.001), ("x-ms-retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(name)
+        if value is None:
+            continue
+        try:
+            return max(0.0, float(value) * scale)
+        except (TypeError, ValueError):
+            pass
+        try:
+            # Retry-After juga boleh berupa HTTP-date
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            pass
+    return 0.0
+
+
+class AdaptiveRateLimiter:
+    """Token bucket untuk requests-per-minute dan tokens-per-minute satu deployment/service.
+
+    Dipakai bersama oleh semua thread (dan semua job indexing). `acquire` menunggu
+    sampai kedua bucket cukup; bucket menampung maksimal `burst_seconds` kapasitas.
+    Saat response 429/503 diterima, semua caller di-pause sesuai `Retry-After`
+    (atau exponential backoff), dan rate efektif dipotong setengah. Setiap request
+    sukses menaikkan rate lagi sedikit demi sedikit sampai batas yang dikonfigurasi.
+    Limit 0 berarti tidak dibatasi (tetap adaptif terhadap pause 429).
+    """
+
+    def __init__(self, name: str, requests_per_minute: float, tokens_per_minute: float = 0,
+                 max_retries: int = 6, max_backoff: float = 60.0, burst_seconds: float = 10.0,
+                 min_rate_fraction: float = 0.1):
+        self.name = name
+        self.requests_per_minute = max(0.0, requests_per_minute)
+        self.tokens_per_minute = max(0.0, tokens_per_minute)
+        self.max_retries = max(0, max_retries)
+        self.max_backoff = max_backoff
+        self.burst_seconds = burst_seconds
+        self.min_rate_fraction = min_rate_fraction
+
+        self._lock = threading.Lock()
+        self._scale = 1.0
+        self._request_level = self._capacity(self.requests_per_minute)
+        self._token_level = self._capacity(self.tokens_per_minute)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._window: "deque" = deque()  # (waktu, requests, tokens) request sukses 60 detik terakhir
+
+        self.requests = 0
+        self.tokens = 0
+        self.throttled = 0
+        self.retries = 0
+        self.retries_exhausted = 0
+        self.wait_seconds = 0.0
+
+    def _capacity(self, per_minute: float) -> float:
+        return per_minute / 60.0 * self.burst_seconds
+
+    def _refill(self, now: float):
+        # Selama pause (setelah 429) bucket tidak diisi ulang
+        elapsed = max(0.0, now - self._refilled_at)
+        self._refilled_at = max(now, self._refilled_at)
+        if self.requests_per_minute:
+            self._request_level = min(self._capacity(self.requests_per_minute),
+                                      self._request_level + elapsed * self.requests_per_minute / 60.0 * self._scale)
+        if self.tokens_per_minute:
+            self._token_level = min(self._capacity(self.tokens_per_minute),
+                                    self._token_level + elapsed * self.tokens_per_minute / 60.0 * self._scale)
+
+    def _wait_for(self, level: float, cost: float, per_minute: float) -> float:
+        # Request yang lebih besar dari kapasitas bucket cukup menunggu bucket penuh (level boleh negatif)
+        need = min(cost, self._capacity(per_minute)) - level
+        return need / (per_minute / 60.0 * self._scale) if need > 0 else 0.0
+
+    def acquire(self, tokens: int = 0, requests: int = 1):
+        """Blok sampai `requests` request dengan total `tokens` token boleh dikirim."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self._paused_until - now
+                if self.requests_per_minute:
+                    wait = max(wait, self._wait_for(self._request_level, requests, self.requests_per_minute))
+                if self.tokens_per_minute and tokens:
+                    wait = max(wait, self._wait_for(self._token_level, tokens, self.tokens_per_minute))
+                if wait <= 0:
+                    self._request_level -= requests
+                    self._token_level -= tokens
+                    return
+                self.wait_seconds += wait
+            time.sleep(wait)
+
+    def on_throttled(self, retry_after: Optional[float], attempt: int):
+        """Catat response 429/503: pause semua caller dan turunkan rate efektif.
+        Pause dibatasi `max_backoff`, termasuk Retry-After dari server."""
+        if not retry_after:
+            retry_after = min(self.max_backoff, 2 ** attempt) * random.uniform(0.5, 1.0)
+        retry_after = min(retry_after, self.max_backoff)
+        with self._lock:
+            now = time.monotonic()
+            self.throttled += 1
+            self._paused_until = max(self._paused_until, now + retry_after)
+            self._scale = max(self.min_rate_fraction, self._scale * 0.5)
+            self._request_level = min(self._request_level, 0.0)
+            self._token_level = min(self._token_level, 0.0)
+            self._refilled_at = max(now, self._paused_until)
+
+    def on_success(self, tokens: int = 0, requests: int = 1):
+        with self._lock:
+            now = time.monotonic()
+            self.requests += requests
+            self.tokens += tokens
+            self._window.append((now, requests, tokens))
+            while self._window and now - self._window[0][0] > 60.0:
+                self._window.popleft()
+            self._scale = min(1.0, self._scale + 0.02 * requests)
+
+    def call(self, func: Callable[[], Any], tokens: int = 0, requests: int = 1) -> Any:
+        """Jalankan `func` di bawah limit; response throttled di-retry (maks `max_retries`)."""
+        attempt = 0
+        while True:
+            self.acquire(tokens, requests)
+            try:
+                result = func()
+            except Exception as e:
+                delay = retry_after_seconds(e)
+                if delay is None:
+                    raise
+                if attempt >= self.max_retries:
+                    with self._lock:
+                        self.retries_exhausted += 1
+                    raise
+                attempt += 1
+                with self._lock:
+                    self.retries += 1
+                print(f"{self.name}: throttled ({_status_code(e)}), retry {attempt}/{self.max_retries}")
+                self.on_throttled(delay, attempt)
+                continue
+            self.on_success(tokens, requests)
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            recent = [(requests, tokens) for t, requests, tokens in self._window if now - t <= 60.0]
+            return {
+                "requests_per_minute_limit": round(self.requests_per_minute * self._scale, 1) or None,
+                "tokens_per_minute_limit": round(self.tokens_per_minute * self._scale, 1) or None,
+                "rate_scale": round(self._scale, 3),
+                "current_requests_per_minute": sum(r for r, _ in recent),
+                "current_tokens_per_minute": sum(t for _, t in recent),
+                "requests": self.requests,
+                "tokens": self.tokens,
+                "throttled": self.throttled,
+                "retries": self.retries,
+                "retries_exhausted": self.retries_exhausted,
+                "wait_seconds": round(self.wait_seconds, 3),
+                "paused_seconds_remaining": round(max(0.0, self._paused_until - now), 3),
+            }
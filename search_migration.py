@@ -0,0 +1,167 @@
+# search_migration.py - Migrasi index lama (schema implisit LangChain) ke schema terkelola
+"""Salin semua chunk dari index lama ke index baru dengan schema terkelola.
+
+Field bertipe (source, prefix, content_type, chunk_index, doc_hash) diisi dari JSON
+`metadata` tiap chunk; vektor disalin apa adanya (tanpa embedding ulang). Dimensi
+vektor mengikuti index sumber. Upload memakai action "upload" sehingga migrasi
+aman dijalankan ulang jika terputus. Setelah selesai, arahkan AZURE_SEARCH_INDEX_NAME
+ke index baru.
+
+    python search_migration.py --target internal-docs-index-v2
+"""
+import argparse
+import json
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from azure.core.credentials import AzureKeyCredential
+from azure.search.documents import SearchClient
+from azure.search.documents.indexes import SearchIndexClient
+from azure.search.documents.indexes.models import SearchIndex
+
+from search_schema import (
+    FIELDS_CHUNK_INDEX, FIELDS_CONTENT_TYPE, FIELDS_CONTENT_VECTOR, FIELDS_DOC_HASH, FIELDS_ID,
+    FIELDS_METADATA, FIELDS_PREFIX, FIELDS_SOURCE, count_documents, index_fields, iter_documents,
+    source_prefixes, vector_search_config,
+)
+
+def to_managed_document(doc: Dict[str, Any],
+                        doc_hash: Optional[Callable[[str], Optional[str]]] = None) -> Dict[str, Any]:
+    """Dokumen index lama -> dokumen schema terkelola (field bertipe dari JSON metadata)."""
+    try:
+        metadata = json.loads(doc.get(FIELDS_METADATA) or "{}")
+    except ValueError:
+        metadata = {}
+    source = metadata.get("source")
+    if source:
+        metadata.setdefault("prefix", source_prefixes(source))
+        if not metadata.get("doc_hash") and doc_hash is not None:
+            metadata["doc_hash"] = doc_hash(source)
+
+    managed = {k: v for k, v in doc.items() if not k.startswith("@search.")}
+    managed[FIELDS_METADATA] = json.dumps(metadata)
+    managed[FIELDS_SOURCE] = source
+    managed[FIELDS_PREFIX] = metadata.get("prefix") or []
+    managed[FIELDS_CONTENT_TYPE] = metadata.get("content_type")
+    chunk_index = metadata.get("chunk_index")
+    managed[FIELDS_CHUNK_INDEX] = chunk_index if isinstance(chunk_index, int) else None
+    managed[FIELDS_DOC_HASH] = metadata.get("doc_hash")
+    return managed
+
+
+def _vector_dimensions(index: SearchIndex) -> int:
+    for field in index.fields:
+        if field.name == FIELDS_CONTENT_VECTOR:
+            return field.vector_search_dimensions
+    raise ValueError(f"Index {index.name} has no {FIELDS_CONTENT_VECTOR} field")
+
+
+def migrate_index(endpoint: str, key: str, source_index: str, target_index: str,
+                  compression: str = "none", oversampling: float = 4.0,
+                  doc_hash: Optional[Callable[[str], Optional[str]]] = None,
+                  batch_size: int = 100, upload: Optional[Callable[[Callable[[], Any]], Any]] = None,
+                  on_progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """Buat `target_index` dengan schema terkelola lalu salin semua chunk dari `source_index`.
+
+    `upload(call)` (opsional) membungkus setiap request upload, mis. rate limiter bersama.
+    `doc_hash(source)` (opsional) mengisi doc_hash chunk lama, mis. MD5 dari manifest.
+    """
+    if source_index == target_index:
+        raise ValueError("Target index must differ from the source index")
+    credential = AzureKeyCredential(key)
+    index_client = SearchIndexClient(endpoint, credential)
+    dimensions = _vector_dimensions(index_client.get_index(source_index))
+    index_client.create_or_update_index(SearchIndex(
+        name=target_index,
+        fields=index_fields(dimensions),
+        vector_search=vector_search_config(compression, oversampling),
+    ))
+    source = SearchClient(endpoint, source_index, credential)
+    target = SearchClient(endpoint, target_index, credential)
+
+    started = time.perf_counter()
+    total = count_documents(source)
+    report = {
+        "source_index": source_index,
+        "target_index": target_index,
+        "dimensions": dimensions,
+        "compression": compression,
+        "source_documents": total,
+        "migrated": 0,
+        "failed": [],
+    }
+    batch: List[Dict[str, Any]] = []
+
+    def flush():
+        send = lambda: target.upload_documents(documents=batch)  # noqa: E731
+        try:
+            results = upload(send) if upload is not None else send()
+        except Exception as e:
+            print(f"Error uploading migration batch: {e}")
+            report["failed"].extend(doc[FIELDS_ID] for doc in batch)
+        else:
+            for r in results:
+                if r.succeeded:
+                    report["migrated"] += 1
+                else:
+                    report["failed"].append(r.key)
+        batch.clear()
+        if on_progress is not None:
+            on_progress({
+                "phase": "copying",
+                "documents_total": total,
+                "documents_done": report["migrated"] + len(report["failed"]),
+                "elapsed_seconds": round(time.perf_counter() - started, 1),
+            })
+
+    for doc in iter_documents(source):
+        batch.append(to_managed_document(doc, doc_hash))
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    report["failed_count"] = len(report["failed"])
+    report["failed"] = report["failed"][:100]
+    report["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+    report["success"] = report["failed_count"] == 0
+    report["message"] = (
+        f"Migrated {report['migrated']}/{total} chunks from {source_index} to {target_index}"
+        + ("" if report["success"] else f", {report['failed_count']} failed (re-run to retry)")
+    )
+    return report
+
+
+def main():
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default=os.getenv("AZURE_SEARCH_INDEX_NAME", "internal-docs-index"))
+    parser.add_argument("--target", required=True)
+    parser.add_argument("--compression", default=os.getenv("SEARCH_VECTOR_COMPRESSION", "none").lower())
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--manifest", default=os.path.join(os.getenv("INDEX_STATE_DIR", ".index_state"), "manifest.sqlite"),
+                        help="manifest incremental indexing untuk mengisi doc_hash chunk lama")
+    args = parser.parse_args()
+
+    doc_hash = None
+    if os.path.exists(args.manifest):
+        from index_manifest import IndexManifest
+
+        manifest = IndexManifest(args.manifest)
+        doc_hash = lambda name: (manifest.get(name) or {}).get("content_md5")  # noqa: E731
+
+    report = migrate_index(
+        os.getenv("AZURE_SEARCH_ENDPOINT", ""), os.getenv("AZURE_SEARCH_KEY", ""), args.source, args.target,
+        compression=args.compression, oversampling=float(os.getenv("SEARCH_VECTOR_OVERSAMPLING", "4")),
+        doc_hash=doc_hash, batch_size=args.batch_size,
+        on_progress=lambda p: print(f"\r{p['documents_done']}/{p['documents_total']} chunks", end="", flush=True),
+    )
+    print()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
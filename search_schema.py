@@ -0,0 +1,156 @@
+# search_schema.py - Definisi field & konfigurasi vector search index Azure AI Search
+from typing import Any, Dict, Iterator, List, Optional
+
+from azure.search.documents.indexes.models import (
+    BinaryQuantizationCompression,
+    HnswAlgorithmConfiguration,
+    RescoringOptions,
+    ScalarQuantizationCompression,
+    SearchableField,
+    SearchField,
+    SearchFieldDataType,
+    SimpleField,
+    VectorSearch,
+    VectorSearchProfile,
+)
+from langchain_community.vectorstores.azuresearch import (
+    FIELDS_CONTENT,
+    FIELDS_CONTENT_VECTOR,
+    FIELDS_ID,
+    FIELDS_METADATA,
+)
+
+VECTOR_COMPRESSIONS = ("none", "scalar", "binary")
+
+# Field bertipe yang diisi IndexWriter dari metadata chunk (selain JSON `metadata` untuk LangChain)
+FIELDS_SOURCE = "source"
+FIELDS_PREFIX = "prefix"
+FIELDS_CONTENT_TYPE = "content_type"
+FIELDS_CHUNK_INDEX = "chunk_index"
+FIELDS_DOC_HASH = "doc_hash"
+MANAGED_FIELDS = (FIELDS_SOURCE, FIELDS_PREFIX, FIELDS_CONTENT_TYPE, FIELDS_CHUNK_INDEX, FIELDS_DOC_HASH)
+
+# Dimensi native model embedding (dipakai jika AZURE_OPENAI_EMBED_DIMENSIONS tidak di-set)
+NATIVE_DIMENSIONS = {
+    "text-embedding-3-large": 3072,
+    "text-embedding-3-small": 1536,
+    "text-embedding-ada-002": 1536,
+}
+
+_ALGORITHM = "hnsw-default"
+_COMPRESSION = "vector-compression"
+PROFILE = "vector-profile"
+
+
+def source_prefixes(blob_name: str) -> List[str]:
+    """Semua folder induk blob ("sop/hr/a.pdf" -> ["sop/", "sop/hr/"]) untuk filter prefix."""
+    parts = blob_name.split("/")[:-1]
+    return ["/".join(parts[:i]) + "/" for i in range(1, len(parts) + 1)]
+
+
+def odata_literal(value: str) -> str:
+    """String literal OData (kutip tunggal di-escape)."""
+    return "'" + value.replace("'", "''") + "'"
+
+
+def source_filter(blob_name: str) -> str:
+    return f"{FIELDS_SOURCE} eq {odata_literal(blob_name)}"
+
+
+def source_prefix_filter(prefix: str) -> str:
+    """Filter chunk yang nama blob-nya diawali `prefix` (aturan sama dengan `name_starts_with`
+    di blob listing, jadi "sop/lap" juga cocok dengan "sop/laporan.pdf"). Range ordinal:
+    prefix <= source < prefix dengan karakter terakhir dinaikkan satu."""
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return f"{FIELDS_SOURCE} ge {odata_literal(prefix)} and {FIELDS_SOURCE} lt {odata_literal(upper)}"
+
+
+def prefix_filter(prefix: str) -> str:
+    """Filter chunk di bawah folder `prefix` (termasuk sub-folder)."""
+    if not prefix.endswith("/"):
+        prefix += "/"
+    return f"{FIELDS_PREFIX}/any(p: p eq {odata_literal(prefix)})"
+
+
+# Search membatasi paging (skip) sampai 100k dokumen per query; partisi ID yang lebih besar dipecah lagi
+_MAX_PARTITION = 100_000
+# Chunk ID adalah base64 urlsafe (+ "_<index>"); '~' lebih besar dari semua karakternya
+_ID_ALPHABET = "-0123456789=ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
+
+
+def count_documents(client: Any, filter_expr: Optional[str] = None) -> int:
+    """Jumlah dokumen index (opsional dengan filter) tanpa mengambil dokumennya."""
+    return client.search(search_text="*", filter=filter_expr, include_total_count=True, top=0).get_count() or 0
+
+
+def iter_documents(client: Any, select: Optional[List[str]] = None,
+                   id_prefix: str = "") -> Iterator[Dict[str, Any]]:
+    """Semua dokumen index (SearchClient), dipartisi per prefix ID supaya tiap query di bawah
+    batas paging 100k; index schema lama maupun terkelola."""
+    filter_expr = None
+    if id_prefix:
+        filter_expr = f"{FIELDS_ID} ge {odata_literal(id_prefix)} and {FIELDS_ID} lt {odata_literal(id_prefix + '~')}"
+    if count_documents(client, filter_expr) <= _MAX_PARTITION:
+        yield from client.search(search_text="*", filter=filter_expr, select=select)
+        return
+    # ID yang sama persis dengan prefix tidak ikut partisi anak
+    if id_prefix:
+        yield from client.search(search_text="*", filter=f"{FIELDS_ID} eq {odata_literal(id_prefix)}", select=select)
+    for char in _ID_ALPHABET:
+        yield from iter_documents(client, select, id_prefix + char)
+
+
+def embedding_dimensions(deployment: str, dimensions: int = 0) -> Optional[int]:
+    """Dimensi vektor yang disimpan: `dimensions` (parameter native text-embedding-3) atau default model."""
+    return dimensions or NATIVE_DIMENSIONS.get(deployment)
+
+
+def vector_search_config(compression: str = "none", oversampling: float = 4.0) -> VectorSearch:
+    """HNSW + (opsional) kuantisasi vektor.
+
+    "scalar" menyimpan vektor sebagai int8 (~4x lebih kecil), "binary" 1 bit per dimensi
+    (~32x). Vektor asli tetap dipertahankan untuk rescoring: kandidat diambil
+    `oversampling` x k dari index terkompresi lalu di-rank ulang dengan vektor float.
+    """
+    if compression not in VECTOR_COMPRESSIONS:
+        raise ValueError(f"Unknown vector compression '{compression}', expected one of {VECTOR_COMPRESSIONS}")
+
+    compressions: List[Any] = []
+    if compression != "none":
+        rescoring = RescoringOptions(enable_rescoring=True, default_oversampling=oversampling)
+        compression_class = ScalarQuantizationCompression if compression == "scalar" else BinaryQuantizationCompression
+        compressions.append(compression_class(compression_name=_COMPRESSION, rescoring_options=rescoring))
+    return VectorSearch(
+        algorithms=[HnswAlgorithmConfiguration(name=_ALGORITHM)],
+        profiles=[VectorSearchProfile(
+            name=PROFILE,
+            algorithm_configuration_name=_ALGORITHM,
+            compression_name=_COMPRESSION if compressions else None,
+        )],
+        compressions=compressions,
+    )
+
+
+def index_fields(dimensions: int) -> List[SearchField]:
+    """Field default LangChain AzureSearch (id, content, content_vector, metadata) dengan dimensi
+    eksplisit, plus field bertipe filterable/facetable supaya delete, retrieval per prefix dan
+    statistik cukup satu filter OData."""
+    return [
+        SimpleField(name=FIELDS_ID, type=SearchFieldDataType.String, key=True, filterable=True),
+        SearchableField(name=FIELDS_CONTENT, type=SearchFieldDataType.String),
+        SearchField(
+            name=FIELDS_CONTENT_VECTOR,
+            type=SearchFieldDataType.Collection(SearchFieldDataType.Single),
+            searchable=True,
+            vector_search_dimensions=dimensions,
+            vector_search_profile_name=PROFILE,
+        ),
+        SearchableField(name=FIELDS_METADATA, type=SearchFieldDataType.String),
+        SimpleField(name=FIELDS_SOURCE, type=SearchFieldDataType.String, filterable=True, facetable=True,
+                    sortable=True),
+        SimpleField(name=FIELDS_PREFIX, type=SearchFieldDataType.Collection(SearchFieldDataType.String),
+                    filterable=True, facetable=True),
+        SimpleField(name=FIELDS_CONTENT_TYPE, type=SearchFieldDataType.String, filterable=True, facetable=True),
+        SimpleField(name=FIELDS_CHUNK_INDEX, type=SearchFieldDataType.Int32, filterable=True, sortable=True),
+        SimpleField(name=FIELDS_DOC_HASH, type=SearchFieldDataType.String, filterable=True),
+    ]
@@ -0,0 +1,233 @@
+# table_store.py - Tabel hasil ekstraksi sebagai baris & kolom (SQLite + FTS5) untuk pertanyaan tabular
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+_TERM_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def structure_table(cells: Iterable[List[Any]]) -> Optional[Dict[str, Any]]:
+    """Sel layout [[row_index, column_index, content], ...] -> header + baris yang kolomnya sejajar.
+
+    Baris pertama dipakai sebagai header (sama dengan chunk tabel); header kosong diberi
+    nama `column_<n>`. Sel yang tidak ada diisi string kosong. Isi sel hanya dirapikan
+    spasinya (tanpa normalisasi penomoran) supaya angka seperti "5.000.000" tetap utuh.
+    """
+    grid: Dict[int, Dict[int, str]] = {}
+    for row_index, column_index, content in cells:
+        grid.setdefault(row_index, {})[column_index] = " ".join((content or "").split())
+    if not grid:
+        return None
+    width = max(column for row in grid.values() for column in row) + 1
+    ordered = [[grid[r].get(c, "") for c in range(width)] for r in sorted(grid)]
+    headers = [header or f"column_{i + 1}" for i, header in enumerate(ordered[0])]
+    return {"headers": headers, "rows": ordered[1:]}
+
+
+def format_table_rows(table: Dict[str, Any]) -> str:
+    """Tabel dengan baris terpilih -> teks konteks ringkas untuk LLM (header + baris)."""
+    lines = [f"[SOURCE: {table['source']} | TABLE: {table['table_id']} | "
+             f"ROWS: {len(table['rows'])} of {table['row_count']}]",
+             " | ".join(table["headers"])]
+    lines.extend(" | ".join(row["cells"]) for row in table["rows"])
+    return "\n".join(lines)
+
+
+class TableStore:
+    """Tabel per dokumen (key: source + table_id, sama dengan `table_id` di metadata chunk)
+    dengan header asli dan baris per kolom. Setiap baris di-index full-text (header +
+    isi sel) supaya baris yang relevan bisa dipilih tanpa membaca seluruh tabel.
+    Jika SQLite tanpa FTS5, pencarian memakai skor overlap kata di Python."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.fts = True
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS doc_tables (
+                    source     TEXT NOT NULL,
+                    table_id   INTEGER NOT NULL,
+                    headers    TEXT NOT NULL,
+                    row_count  INTEGER NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    PRIMARY KEY (source, table_id)
+                );
+                CREATE TABLE IF NOT EXISTS table_rows (
+                    source    TEXT NOT NULL,
+                    table_id  INTEGER NOT NULL,
+                    row_index INTEGER NOT NULL,
+                    cells     TEXT NOT NULL,
+                    PRIMARY KEY (source, table_id, row_index)
+                );
+                """
+            )
+            try:
+                conn.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS table_rows_fts USING fts5("
+                    "source UNINDEXED, table_id UNINDEXED, row_index UNINDEXED, headers, cells)"
+                )
+            except sqlite3.OperationalError:
+                self.fts = False
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _delete(self, conn: sqlite3.Connection, source: str):
+        conn.execute("DELETE FROM doc_tables WHERE source = ?", (source,))
+        conn.execute("DELETE FROM table_rows WHERE source = ?", (source,))
+        if self.fts:
+            conn.execute("DELETE FROM table_rows_fts WHERE source = ?", (source,))
+
+    def replace_document(self, source: str, tables: Iterable[List[List[Any]]]) -> int:
+        """Ganti semua tabel dokumen dengan hasil ekstraksi terbaru (sel layout per tabel,
+        urutan = table_id; boleh iterator sehingga tabel dibaca satu per satu).
+        Return jumlah baris yang disimpan."""
+        now = datetime.now(timezone.utc).isoformat()
+        stored = 0
+        with self._lock:
+            conn = self._connect()
+            self._delete(conn, source)
+            for table_id, cells in enumerate(tables):
+                table = structure_table(cells)
+                if table is None:
+                    continue
+                conn.execute(
+                    "INSERT INTO doc_tables (source, table_id, headers, row_count, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    (source, table_id, json.dumps(table["headers"]), len(table["rows"]), now),
+                )
+                rows = [(source, table_id, i, json.dumps(row)) for i, row in enumerate(table["rows"])]
+                conn.executemany("INSERT INTO table_rows (source, table_id, row_index, cells) VALUES (?, ?, ?, ?)",
+                                 rows)
+                if self.fts:
+                    header_text = " ".join(table["headers"])
+                    conn.executemany(
+                        "INSERT INTO table_rows_fts (source, table_id, row_index, headers, cells) VALUES (?, ?, ?, ?, ?)",
+                        [(source, table_id, i, header_text, " ".join(row)) for i, row in enumerate(table["rows"])],
+                    )
+                stored += len(rows)
+            conn.commit()
+        return stored
+
+    def remove(self, source: str):
+        with self._lock:
+            conn = self._connect()
+            self._delete(conn, source)
+            conn.commit()
+
+    def list_tables(self, source: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT table_id, headers, row_count FROM doc_tables WHERE source = ? ORDER BY table_id", (source,)
+            ).fetchall()
+        return [{"source": source, "table_id": table_id, "headers": json.loads(headers), "row_count": row_count}
+                for table_id, headers, row_count in rows]
+
+    def get_table(self, source: str, table_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            conn = self._connect()
+            meta = conn.execute("SELECT headers, row_count FROM doc_tables WHERE source = ? AND table_id = ?",
+                                (source, table_id)).fetchone()
+            if meta is None:
+                return None
+            rows = conn.execute(
+                "SELECT row_index, cells FROM table_rows WHERE source = ? AND table_id = ? ORDER BY row_index",
+                (source, table_id),
+            ).fetchall()
+        return {
+            "source": source,
+            "table_id": table_id,
+            "headers": json.loads(meta[0]),
+            "row_count": meta[1],
+            "rows": [{"row_index": i, "cells": json.loads(cells)} for i, cells in rows],
+        }
+
+    def search_rows(self, terms: List[str], max_rows: int = 20, max_tables: int = 3,
+                    prefix: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Baris paling relevan untuk `terms`, dikelompokkan per tabel (tabel dengan baris
+        terbaik lebih dulu, baris dalam tabel urut posisi asli). Setiap baris membawa
+        `matched_terms` = kata query yang muncul di header atau selnya, dipecah menjadi
+        `matched_headers` (nama kolom) dan `matched_cells` (isi sel)."""
+        terms = [t for t in dict.fromkeys(t.lower() for t in terms) if t]
+        if not terms:
+            return []
+        with self._lock:
+            conn = self._connect()
+            if self.fts:
+                match = " OR ".join('"' + t.replace('"', '""') + '"' for t in terms)
+                query = ("SELECT source, table_id, row_index, headers, cells FROM table_rows_fts "
+                         "WHERE table_rows_fts MATCH ?")
+                params: List[Any] = [match]
+                if prefix:
+                    query += " AND source LIKE ? ESCAPE '\\'"
+                    params.append(prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+                query += " ORDER BY bm25(table_rows_fts, 1.0, 2.0) LIMIT ?"
+                params.append(max_rows * 5)
+                hits = conn.execute(query, params).fetchall()
+            else:
+                query = ("SELECT r.source, r.table_id, r.row_index, t.headers, r.cells FROM table_rows r "
+                         "JOIN doc_tables t ON t.source = r.source AND t.table_id = r.table_id")
+                hits = []
+                for source, table_id, row_index, headers, cells in conn.execute(query):
+                    if prefix and not source.startswith(prefix):
+                        continue
+                    hits.append((source, table_id, row_index, " ".join(json.loads(headers)),
+                                 " ".join(json.loads(cells))))
+
+            wanted = set(terms)
+            scored = []
+            for rank, (source, table_id, row_index, headers, cells) in enumerate(hits):
+                header_terms = set(_TERM_PATTERN.findall(headers.lower()))
+                cell_terms = set(_TERM_PATTERN.findall(cells.lower()))
+                matched = wanted & (header_terms | cell_terms)
+                if matched:
+                    # Kata yang cocok di sel lebih menentukan baris daripada kata di header
+                    scored.append((len(matched) + len(wanted & cell_terms), -rank, source, table_id, row_index,
+                                   matched, wanted & header_terms, wanted & cell_terms))
+            scored.sort(reverse=True)
+
+            tables: Dict[Any, Dict[str, Any]] = {}
+            for score, _, source, table_id, row_index, matched, headers_hit, cells_hit in scored:
+                key = (source, table_id)
+                if key not in tables:
+                    if len(tables) >= max_tables:
+                        continue
+                    meta = conn.execute("SELECT headers, row_count FROM doc_tables WHERE source = ? AND table_id = ?",
+                                        key).fetchone()
+                    if meta is None:
+                        continue
+                    tables[key] = {"source": source, "table_id": table_id, "headers": json.loads(meta[0]),
+                                   "row_count": meta[1], "score": score, "rows": []}
+                table = tables[key]
+                if sum(len(t["rows"]) for t in tables.values()) >= max_rows:
+                    break
+                cells = conn.execute(
+                    "SELECT cells FROM table_rows WHERE source = ? AND table_id = ? AND row_index = ?",
+                    (source, table_id, row_index),
+                ).fetchone()
+                table["rows"].append({"row_index": row_index, "cells": json.loads(cells[0]) if cells else [],
+                                      "matched_terms": sorted(matched), "matched_headers": sorted(headers_hit),
+                                      "matched_cells": sorted(cells_hit)})
+        result = [t for t in tables.values() if t["rows"]]
+        for table in result:
+            table["rows"].sort(key=lambda row: row["row_index"])
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            conn = self._connect()
+            tables, rows = conn.execute("SELECT COUNT(*), COALESCE(SUM(row_count), 0) FROM doc_tables").fetchone()
+            documents = conn.execute("SELECT COUNT(DISTINCT source) FROM doc_tables").fetchone()[0]
+        return {"documents": documents, "tables": tables, "rows": rows, "full_text_search": self.fts}
@@ -0,0 +1,82 @@
+from table_store import TableStore, format_table_rows, structure_table
+
+APPROVAL_CELLS = [
+    [0, 0, "Level"], [0, 1, "Jabatan"], [0, 2, "Limit Approval"],
+    [1, 0, "Level 1"], [1, 1, "Supervisor"], [1, 2, "Rp 5.000.000"],
+    [2, 0, "Level 2"], [2, 1, "Manager"], [2, 2, "Rp 25.000.000"],
+    [3, 0, "Level 3"], [3, 1, "General  Manager"], [3, 2, "Rp 100.000.000"],
+    [4, 0, "Level 4"], [4, 1, "Direktur"],
+]
+LEAVE_CELLS = [
+    [0, 0, "Jenis Cuti"], [0, 1, "Lama"],
+    [1, 0, "Cuti tahunan"], [1, 1, "12 hari"],
+    [2, 0, "Cuti melahirkan"], [2, 1, "3 bulan"],
+]
+
+
+def test_structure_table_aligns_columns():
+    table = structure_table([[0, 1, "Nilai"], [1, 0, "A"], [1, 1, "1.000.000"], [2, 1, "  2  "]])
+
+    assert table["headers"] == ["column_1", "Nilai"]
+    assert table["rows"] == [["A", "1.000.000"], ["", "2"]]
+    assert structure_table([]) is None
+
+
+def test_replace_document_and_get_table(tmp_path):
+    store = TableStore(str(tmp_path / "tables.sqlite"))
+
+    assert store.replace_document("sop/fin/otorisasi.pdf", iter([APPROVAL_CELLS, LEAVE_CELLS])) == 6
+    assert store.replace_document("sop/fin/otorisasi.pdf", [APPROVAL_CELLS]) == 4
+
+    assert [t["table_id"] for t in store.list_tables("sop/fin/otorisasi.pdf")] == [0]
+    table = store.get_table("sop/fin/otorisasi.pdf", 0)
+    assert table["headers"] == ["Level", "Jabatan", "Limit Approval"]
+    assert table["rows"][2]["cells"] == ["Level 3", "General Manager", "Rp 100.000.000"]
+    assert table["rows"][3]["cells"] == ["Level 4", "Direktur", ""]
+
+
+def test_search_rows_reports_header_and_cell_matches(tmp_path):
+    store = TableStore(str(tmp_path / "tables.sqlite"))
+    store.replace_document("sop/fin/otorisasi.pdf", [APPROVAL_CELLS])
+    store.replace_document("sop/hr/cuti.pdf", [LEAVE_CELLS])
+
+    tables = store.search_rows(["approval", "limit", "level", "3"])
+
+    # "3" juga ada di tabel cuti ("3 bulan"), tapi tabel otorisasi punya baris terbaik
+    assert tables[0]["source"] == "sop/fin/otorisasi.pdf"
+    best = next(row for row in tables[0]["rows"] if row["row_index"] == 2)
+    assert best["matched_headers"] == ["approval", "level", "limit"]
+    assert best["matched_cells"] == ["3", "level"]
+    assert [row["row_index"] for row in tables[0]["rows"]] == sorted(row["row_index"] for row in tables[0]["rows"])
+    assert "Level | Jabatan | Limit Approval" in format_table_rows(tables[0])
+
+
+def test_search_rows_respects_prefix_and_limits(tmp_path):
+    store = TableStore(str(tmp_path / "tables.sqlite"))
+    store.replace_document("sop/fin/otorisasi.pdf", [APPROVAL_CELLS])
+    store.replace_document("sop/hr/cuti.pdf", [LEAVE_CELLS])
+
+    assert store.search_rows(["level"], prefix="sop/hr/") == []
+    assert store.search_rows(["cuti"], prefix="sop/hr/")[0]["source"] == "sop/hr/cuti.pdf"
+    assert sum(len(t["rows"]) for t in store.search_rows(["level"], max_rows=2)) == 2
+
+
+def test_search_rows_without_fts(tmp_path):
+    store = TableStore(str(tmp_path / "tables.sqlite"))
+    store.replace_document("sop/fin/otorisasi.pdf", [APPROVAL_CELLS])
+    store.fts = False
+
+    tables = store.search_rows(["manager", "limit"])
+
+    # "limit" ada di header, jadi semua baris cocok; hanya baris manager yang cocok di sel
+    assert {row["row_index"] for row in tables[0]["rows"] if row["matched_cells"]} == {1, 2}
+    assert all(row["matched_headers"] == ["limit"] for row in tables[0]["rows"])
+
+
+def test_remove_and_stats(tmp_path):
+    store = TableStore(str(tmp_path / "tables.sqlite"))
+    store.replace_document("sop/fin/otorisasi.pdf", [APPROVAL_CELLS, LEAVE_CELLS])
+
+    assert store.stats()["rows"] == 6
+    store.remove("sop/fin/otorisasi.pdf")
+    assert store.stats() == {"documents": 0, "tables": 0, "rows": 0, "full_text_search": store.fts}